@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Base',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, verbose_name='Nome da base')),
+                ('cidade', models.CharField(max_length=255, verbose_name='Cidade')),
+                ('uf', models.CharField(max_length=2, null=True, verbose_name='Estado')),
+                ('logradouro', models.CharField(blank=True, max_length=255, null=True, verbose_name='Logradouro:')),
+                ('bairro', models.CharField(blank=True, max_length=255, null=True, verbose_name='Bairro:')),
+                ('numero', models.CharField(blank=True, max_length=20, null=True, verbose_name='Número:')),
+                ('complemento', models.CharField(blank=True, max_length=255, null=True, verbose_name='Complemento:')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('central', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='base_central', to='base.base', verbose_name='Base Central')),
+                ('criado_por', models.ForeignKey(blank=True, on_delete=django.db.models.deletion.CASCADE, related_name='base_criador', to=settings.AUTH_USER_MODEL, verbose_name='Criado por')),
+                ('responsavel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resposavel_base', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'permissions': (('detail_base', 'Pode ver os detalhes da base'),),
+            },
+        ),
+    ]
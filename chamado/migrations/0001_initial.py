@@ -0,0 +1,139 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:05
+
+import django.db.models.deletion
+import django.db.models.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('base', '0001_initial'),
+        ('pessoa', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnidadeChamado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alocado_em', models.DateTimeField(auto_now=True, verbose_name='unidade_alocado_em')),
+                ('status', models.CharField(default='EM_ANDAMENTO', max_length=20)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Chamado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('solicitante_nome', models.CharField(blank=True, max_length=100, null=True, verbose_name='nome solicitante')),
+                ('relacao_vitima', models.CharField(blank=True, max_length=100, null=True, verbose_name='Relação vítima')),
+                ('achados_clinicos', models.TextField(blank=True, null=True, verbose_name='Achados clínicos / Queixa')),
+                ('conduta_medica', models.TextField(blank=True, null=True, verbose_name='Conduta médica')),
+                ('queixa_principal', models.TextField(blank=True, null=True, verbose_name='Queixa principal')),
+                ('tipo_ocorrencia', models.CharField(blank=True, max_length=100, null=True, verbose_name='Tipo de Ocorrência')),
+                ('gravidade', models.CharField(blank=True, max_length=20, null=True, verbose_name='Tipo de Gravidade')),
+                ('uf', models.CharField(max_length=2, verbose_name='Estado')),
+                ('cidade', models.CharField(max_length=100)),
+                ('logradouro', models.CharField(blank=True, max_length=200, null=True, verbose_name='Endereço')),
+                ('numero', models.CharField(blank=True, max_length=20, null=True, verbose_name='Número')),
+                ('bairro', models.CharField(blank=True, max_length=100, null=True)),
+                ('cep', models.CharField(blank=True, max_length=10, null=True)),
+                ('complemento', models.CharField(blank=True, null=True, verbose_name='Complemento')),
+                ('ponto_referencia', models.TextField(blank=True, null=True, verbose_name='Ponto de referência')),
+                ('apoio_solicitado', models.CharField(blank=True, max_length=100, null=True, verbose_name='Apoio Solicitado')),
+                ('descricao_unidades_desejadas', models.TextField(blank=True, null=True, verbose_name='Observações')),
+                ('numero_vitimas', models.IntegerField(blank=True, null=True, validators=[django.db.models.fields.PositiveIntegerField], verbose_name='Nº de vítimas')),
+                ('observacoes', models.TextField(blank=True, null=True, verbose_name='Observações')),
+                ('origem', models.CharField(blank=True, max_length=20, null=True, verbose_name='Origem')),
+                ('motivo', models.CharField(blank=True, max_length=100, null=True, verbose_name='Motivo')),
+                ('status', models.CharField(default='PENDENTE', max_length=20)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('localizacao_validada', models.BooleanField(default=False, verbose_name='Localização validada no mapa')),
+                ('desfecho', models.CharField(blank=True, null=True, verbose_name='desfecho')),
+                ('orientacao', models.CharField(blank=True, null=True, verbose_name='Orientação')),
+                ('incidente', models.CharField(blank=True, max_length=100, null=True, verbose_name='Incidente')),
+                ('unidade_solicitadas', models.JSONField(blank=True, default=dict, null=True, verbose_name='Unidades solicitadas')),
+                ('nome_vitimas', models.JSONField(blank=True, default=list, null=True, verbose_name='Nome provisório das vitimas')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Data e hora do chamado')),
+                ('finalizado_em', models.DateTimeField(blank=True, null=True, verbose_name='Data e hora de finalização do chamado')),
+                ('base', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='base_chamado', to='base.base')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chamado_criador', to=settings.AUTH_USER_MODEL)),
+                ('finalizado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chamado_finalizador', to=settings.AUTH_USER_MODEL)),
+                ('pessoa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='pessoa.pessoa')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AtendimentoPessoa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('finalizado', models.BooleanField(blank=True, default=False, verbose_name='Atendimento foi finalizado')),
+                ('nome_provisorio', models.CharField(blank=True, max_length=60, null=True, verbose_name='Nome provisório')),
+                ('tipo', models.CharField(blank=True, max_length=50, null=True, verbose_name='Tipo de atendimento')),
+                ('risco', models.CharField(blank=True, max_length=50, null=True, verbose_name='Risco')),
+                ('queixa', models.TextField(blank=True, null=True, verbose_name='Queixa')),
+                ('pulso', models.CharField(blank=True, max_length=50, null=True, verbose_name='Pulso')),
+                ('pa', models.CharField(blank=True, max_length=50, null=True, verbose_name='Pressão arterial')),
+                ('fr', models.CharField(blank=True, max_length=50, null=True, verbose_name='Frequência respiratória')),
+                ('so2', models.CharField(blank=True, max_length=50, null=True, verbose_name='Saturação de oxigênio')),
+                ('temperatura', models.CharField(blank=True, max_length=50, null=True, verbose_name='Temperatura')),
+                ('glicemia', models.CharField(blank=True, max_length=50, null=True, verbose_name='Glicemia')),
+                ('situacaoDoLocal', models.CharField(blank=True, max_length=100, null=True, verbose_name='Situação do local')),
+                ('situacaoVitima', models.CharField(blank=True, max_length=100, null=True, verbose_name='Situação da vítima')),
+                ('usoCinto', models.CharField(blank=True, max_length=50, null=True, verbose_name='Uso de cinto de segurança')),
+                ('usoCapacete', models.CharField(blank=True, max_length=50, null=True, verbose_name='Uso de capacete')),
+                ('acidenteTrabalho', models.BooleanField(default=False, verbose_name='Acidente de trabalho')),
+                ('dataHoraChegada', models.DateTimeField(blank=True, null=True, verbose_name='Data e hora de chegada')),
+                ('dataHoraSaida', models.DateTimeField(blank=True, null=True, verbose_name='Data e hora de saída')),
+                ('dataHoraChegadaDestino', models.DateTimeField(blank=True, null=True, verbose_name='Data e hora de chegada ao destino')),
+                ('dataHoraLiberacaoUnidade', models.DateTimeField(blank=True, null=True, verbose_name='Data e hora de liberação da unidade')),
+                ('observacoes', models.TextField(blank=True, null=True, verbose_name='Observações')),
+                ('lesaoTraumatica', models.BooleanField(default=False)),
+                ('descLesaoTraumatica', models.CharField(blank=True, max_length=255, null=True, verbose_name='Descrição da lesão traumática')),
+                ('choqueHipovolemico', models.BooleanField(default=False)),
+                ('pele', models.CharField(blank=True, max_length=50, null=True, verbose_name='Pele')),
+                ('queimadura', models.BooleanField(default=False)),
+                ('percQueimadura', models.FloatField(blank=True, null=True, verbose_name='Percentual de queimadura')),
+                ('tipoQueimadura', models.CharField(blank=True, max_length=50, null=True, verbose_name='Tipo de queimadura')),
+                ('grauQueimadura', models.CharField(blank=True, max_length=50, null=True, verbose_name='Grau da queimadura')),
+                ('glasgow', models.CharField(blank=True, max_length=10, null=True, verbose_name='Escala de Glasgow')),
+                ('dilacaoPupilar', models.CharField(blank=True, max_length=50, null=True, verbose_name='Dilatação pupilar')),
+                ('intercorreciaTransporte', models.BooleanField(default=False)),
+                ('descrIntercorreciaTransporte', models.CharField(blank=True, max_length=255, null=True, verbose_name='Descrição da intercorrência no transporte')),
+                ('destinoPaciente', models.CharField(blank=True, max_length=100, null=True, verbose_name='Destino do paciente')),
+                ('tipoReceptor', models.CharField(blank=True, max_length=50, null=True, verbose_name='Tipo de receptor')),
+                ('nomeReceptor', models.CharField(blank=True, max_length=100, null=True, verbose_name='Nome do receptor')),
+                ('numRegistroConselho', models.CharField(blank=True, max_length=50, null=True, verbose_name='Número de registro no conselho')),
+                ('tipoEvolucao', models.CharField(blank=True, max_length=50, null=True, verbose_name='Tipo de evolução')),
+                ('evolucao', models.TextField(blank=True, null=True, verbose_name='Evolução')),
+                ('conduta', models.CharField(blank=True, max_length=255, null=True, verbose_name='Conduta')),
+                ('condicaoPaciente', models.CharField(blank=True, max_length=50, null=True, verbose_name='Condição do paciente')),
+                ('diagnosticoMedico', models.TextField(blank=True, null=True, verbose_name='Diagnóstico médico')),
+                ('ginecoObstetrico', models.BooleanField(default=True, verbose_name='Gineco-obstétrico')),
+                ('acompanhante', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='acompanhante', to='pessoa.pessoa')),
+                ('pessoa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pessoa_atendimento', to='pessoa.pessoa')),
+                ('chamado', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='atendimento_chamado', to='chamado.chamado')),
+            ],
+            options={
+                'permissions': (('detail_chamado', 'Pode ver os detalhes do atendimento do chamado'),),
+            },
+        ),
+        migrations.CreateModel(
+            name='TramiteChamado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('aceito_em', models.DateTimeField(blank=True, null=True)),
+                ('aceito_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tramite_receptor', to=settings.AUTH_USER_MODEL)),
+                ('chamado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tramite_chamado', to='chamado.chamado')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tramite_criador', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['criado_em'],
+            },
+        ),
+    ]
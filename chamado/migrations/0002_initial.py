@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('chamado', '0001_initial'),
+        ('setor', '0001_initial'),
+        ('unidade', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tramitechamado',
+            name='setor_destino',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tramite_destino', to='setor.setor'),
+        ),
+        migrations.AddField(
+            model_name='tramitechamado',
+            name='setor_origem',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tramite_origem', to='setor.setor'),
+        ),
+        migrations.AddField(
+            model_name='unidadechamado',
+            name='alocado_por',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='unidade_alocado_por', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='unidadechamado',
+            name='chamado',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unidade_chamado', to='chamado.chamado'),
+        ),
+        migrations.AddField(
+            model_name='unidadechamado',
+            name='unidade',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chamado_unidade', to='unidade.unidade'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0001_initial'),
+        ('chamado', '0002_initial'),
+        ('pessoa', '0001_initial'),
+        ('setor', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['criado_em'], name='chamado_criado_em_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['status', 'criado_em'], name='chamado_status_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['base', 'criado_em'], name='chamado_base_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['cidade', 'bairro'], name='chamado_cidade_bairro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tramitechamado',
+            index=models.Index(fields=['criado_em'], name='tramite_criado_em_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tramitechamado',
+            index=models.Index(fields=['chamado', 'criado_em'], name='tramite_chamado_criado_idx'),
+        ),
+    ]
@@ -70,6 +70,15 @@ class Chamado(models.Model):
     def __str__(self):
         return f"Chamado {self.id} da {self.base} em {self.criado_em.strftime('%d/%m/%Y às %H:%M:%S')}"
 
+    class Meta:
+        # colunas mais usadas nos filtros, agrupamentos e truncamentos de data dos relatórios
+        indexes = [
+            models.Index(fields=['criado_em'], name='chamado_criado_em_idx'),
+            models.Index(fields=['status', 'criado_em'], name='chamado_status_criado_idx'),
+            models.Index(fields=['base', 'criado_em'], name='chamado_base_criado_idx'),
+            models.Index(fields=['cidade', 'bairro'], name='chamado_cidade_bairro_idx'),
+        ]
+
 
 class TramiteChamado(models.Model):
     chamado = models.ForeignKey(Chamado, on_delete=models.CASCADE, null=False, blank=False, related_name="tramite_chamado")
@@ -88,6 +97,11 @@ class TramiteChamado(models.Model):
 
     class Meta:
         ordering = ['criado_em']
+        indexes = [
+            models.Index(fields=['criado_em'], name='tramite_criado_em_idx'),
+            # último trâmite de um chamado (Chamado.ultimo_tramite)
+            models.Index(fields=['chamado', 'criado_em'], name='tramite_chamado_criado_idx'),
+        ]
 
 class UnidadeChamado(models.Model):
     chamado = models.ForeignKey(Chamado, on_delete=models.CASCADE, null=False, blank=False, related_name="unidade_chamado")
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('base', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Pessoa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('imagem_perfil', models.ImageField(blank=True, null=True, upload_to='perfil/')),
+                ('nome', models.CharField(max_length=100)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True, unique=True)),
+                ('rg', models.CharField(blank=True, max_length=20, null=True, unique=True)),
+                ('cpf', models.CharField(blank=True, max_length=14, null=True, unique=True, verbose_name='CPF')),
+                ('dataNascimentoReal', models.DateField(blank=True, null=True, verbose_name='Data nascimento')),
+                ('dataNascimentoEstimada', models.DateField(blank=True, null=True, verbose_name='Data nascimento estimada')),
+                ('sexo', models.CharField(blank=True, max_length=2, null=True)),
+                ('estadoCivil', models.CharField(blank=True, max_length=20, null=True, verbose_name='Estado civil')),
+                ('nacionalidade', models.CharField(default='BR', max_length=2, null=True)),
+                ('naturalidade', models.CharField(blank=True, max_length=200, null=True)),
+                ('telefone', models.CharField(blank=True, max_length=20, null=True)),
+                ('telefoneCelular', models.CharField(blank=True, max_length=20, null=True)),
+                ('uf', models.CharField(max_length=2, null=True, verbose_name='Estado')),
+                ('cidade', models.CharField(blank=True, max_length=100, null=True)),
+                ('logradouro', models.CharField(blank=True, max_length=200, null=True)),
+                ('numero', models.CharField(blank=True, max_length=20, null=True)),
+                ('complemento', models.CharField(blank=True, max_length=100, null=True)),
+                ('bairro', models.CharField(blank=True, max_length=100, null=True)),
+                ('cep', models.CharField(blank=True, max_length=10, null=True)),
+                ('historicoClinico', models.TextField(blank=True, null=True, verbose_name='Histórico clínico')),
+                ('nomeMae', models.CharField(blank=True, max_length=100, null=True, verbose_name='Nome da mãe')),
+                ('nomePai', models.CharField(blank=True, max_length=100, null=True, verbose_name='Nome do pai')),
+                ('telefoneMae', models.CharField(blank=True, max_length=20, null=True, verbose_name='Telefone da mãe')),
+                ('telefonePai', models.CharField(blank=True, max_length=20, null=True, verbose_name='Telefone do pai')),
+                ('telefoneResponsavel', models.CharField(blank=True, max_length=20, null=True, verbose_name='Telefone responsável')),
+                ('telefoneContato', models.CharField(blank=True, max_length=20, null=True, verbose_name='Telefone contato')),
+                ('telefoneRecado', models.CharField(blank=True, max_length=20, null=True, verbose_name='Telefone recado')),
+                ('tipoSanguineo', models.CharField(blank=True, max_length=5, null=True, verbose_name='Tipo sanguineo')),
+                ('alergias', models.TextField(blank=True, null=True)),
+                ('doencasPreExistentes', models.TextField(blank=True, null=True, verbose_name='Doenças pre-existentes')),
+                ('medicamentosEmUso', models.TextField(blank=True, null=True, verbose_name='Medicamentos em uso')),
+                ('deficienciaVisual', models.BooleanField(default=False, verbose_name='Deficiência visual')),
+                ('deficienciaAuditiva', models.BooleanField(default=False, verbose_name='Deficiência auditiva')),
+                ('deficienciaMotora', models.BooleanField(default=False, verbose_name='Deficiência motora')),
+                ('deficienciaIntelectual', models.BooleanField(default=False, verbose_name='Deficiência intelectual')),
+                ('observacoes', models.TextField(blank=True, null=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('base_cadastro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='base_pessoa', to='base.base', verbose_name='Base')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pessoas_criadas', to=settings.AUTH_USER_MODEL)),
+                ('usuario', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'permissions': (('detail_pessoa', 'Pode ver os detalhes da pessoa'),),
+            },
+        ),
+    ]
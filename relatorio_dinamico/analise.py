@@ -0,0 +1,175 @@
+"""
+Análise do plano de execução das consultas geradas.
+
+O plano é obtido com EXPLAIN QUERY PLAN (SQLite) ou EXPLAIN (PostgreSQL) por meio do QuerySet.explain().
+As tabelas lidas por completo (SCAN / Seq Scan) que possuem colunas filtradas ou usadas em junções
+sem índice no banco são apontadas, junto com a sugestão do índice que está faltando.
+"""
+from django.apps import apps
+from django.db import connections
+from django.db.models.lookups import Lookup
+from django.db.models.expressions import Col
+import re
+
+# SQLite: "SCAN chamado_chamado", "SEARCH T4 USING AUTOMATIC COVERING INDEX (status=?)"
+PADRAO_SQLITE = re.compile(r'\b(SCAN|SEARCH)\s+(\S+)(.*)$')
+# PostgreSQL: "Seq Scan on chamado_chamado" ou "Seq Scan on chamado_chamado "T4""
+PADRAO_POSTGRESQL = re.compile(r'Seq Scan on (\S+)(?: ("?[^\s(]+"?))?')
+# custo total estimado no primeiro nó do plano do PostgreSQL
+PADRAO_CUSTO = re.compile(r'cost=[\d.]+\.\.([\d.]+) rows=(\d+)')
+
+
+def analisar_queryset(queryset):
+    """
+    Executa o EXPLAIN do QuerySet e analisa o plano.
+    :return: Dicionário com o banco, o texto do plano, o custo estimado (somente PostgreSQL) e os alertas
+    """
+    conexao = connections[queryset.db]
+    plano = queryset.explain()
+    custo_estimado = None
+
+    if conexao.vendor == 'postgresql':
+        correspondencia = PADRAO_CUSTO.search(plano)
+        if correspondencia:
+            custo_estimado = {'custo': float(correspondencia.group(1)), 'linhas': int(correspondencia.group(2))}
+
+    return {
+        'banco': conexao.vendor,
+        'plano': plano,
+        'custo_estimado': custo_estimado,
+        'alertas': analisar_plano(plano, queryset.query, conexao),
+    }
+
+def analisar_plano(plano, query, conexao):
+    """
+    Retorna os alertas de leituras completas de tabelas em colunas filtradas ou usadas em junções sem índice.
+    :param plano: Texto retornado pelo EXPLAIN
+    :param query: Objeto Query do Django que gerou o plano (para relacionar os apelidos às tabelas)
+    :param conexao: Conexão usada no EXPLAIN
+    """
+    colunas_por_apelido = _obter_colunas_usadas(query)
+    indices = _IndicesExistentes(conexao)
+    alertas = []
+    sugeridos = set()
+
+    for linha in plano.splitlines():
+        leitura = _identificar_leitura_completa(linha, conexao.vendor)
+        if not leitura:
+            continue
+
+        apelido, motivo_leitura = leitura
+        juncao = query.alias_map.get(apelido)
+        if juncao is None:
+            continue
+
+        tabela = juncao.table_name
+
+        for coluna, uso in colunas_por_apelido.get(apelido, []):
+            if indices.possui_indice(tabela, coluna) or (tabela, coluna) in sugeridos:
+                continue
+
+            sugeridos.add((tabela, coluna))
+            alertas.append(_criar_alerta(tabela, coluna, uso, motivo_leitura, linha.strip(), conexao))
+
+    return alertas
+
+def _identificar_leitura_completa(linha, vendor):
+    """Retorna (apelido da tabela, motivo) se a linha do plano for uma leitura sem índice do banco; caso contrário, None"""
+    if vendor == 'postgresql':
+        correspondencia = PADRAO_POSTGRESQL.search(linha)
+        if correspondencia:
+            apelido = correspondencia.group(2) or correspondencia.group(1)
+            return apelido.strip('"'), 'leitura completa da tabela'
+        return None
+
+    correspondencia = PADRAO_SQLITE.search(linha)
+    if not correspondencia:
+        return None
+
+    operacao, apelido, restante = correspondencia.groups()
+
+    if 'AUTOMATIC' in restante:
+        # o SQLite cria um índice temporário a cada execução quando falta um índice permanente
+        return apelido, 'índice temporário criado durante a consulta'
+    if operacao == 'SCAN' and 'INDEX' not in restante:
+        return apelido, 'leitura completa da tabela'
+
+    return None
+
+def _obter_colunas_usadas(query):
+    """Retorna um dicionário {apelido: [(coluna, uso), ...]} com as colunas filtradas e as usadas nas junções"""
+    colunas = {}
+
+    def adicionar(apelido, coluna, uso):
+        if (coluna, uso) not in colunas.setdefault(apelido, []):
+            colunas[apelido].append((coluna, uso))
+
+    for apelido, juncao in query.alias_map.items():
+        for coluna_pai, coluna_filha in getattr(juncao, 'join_cols', ()):
+            adicionar(apelido, coluna_filha, 'junção')
+            adicionar(juncao.parent_alias, coluna_pai, 'junção')
+
+    for lookup in _percorrer_lookups(query.where):
+        # filtros sobre agregações (HAVING) não se beneficiam de índices
+        if getattr(lookup.lhs, 'contains_aggregate', False):
+            continue
+
+        for expressao in lookup.lhs.flatten():
+            if isinstance(expressao, Col):
+                adicionar(expressao.alias, expressao.target.column, 'filtro')
+
+    return colunas
+
+def _percorrer_lookups(no):
+    for filho in getattr(no, 'children', ()):
+        if isinstance(filho, Lookup):
+            yield filho
+        else:
+            yield from _percorrer_lookups(filho)
+
+def _criar_alerta(tabela, coluna, uso, motivo_leitura, linha_plano, conexao):
+    modelo = _obter_modelo_tabela(tabela)
+    campo = _obter_nome_campo(modelo, coluna) if modelo else coluna
+    nome_indice = f'{tabela}_{coluna}_idx'[:conexao.ops.max_name_length() or 63]
+
+    return {
+        'tabela': tabela,
+        'modelo': modelo._meta.label if modelo else None,
+        'coluna': coluna,
+        'uso': uso,
+        'detalhe': f'{motivo_leitura}: {linha_plano}',
+        'sugestao_sql': f'CREATE INDEX {conexao.ops.quote_name(nome_indice)} ON {conexao.ops.quote_name(tabela)} ({conexao.ops.quote_name(coluna)});',
+        'sugestao_django': f"models.Index(fields=['{campo}'], name='{nome_indice}')",
+    }
+
+def _obter_modelo_tabela(tabela):
+    for modelo in apps.get_models():
+        if modelo._meta.db_table == tabela:
+            return modelo
+    return None
+
+def _obter_nome_campo(modelo, coluna):
+    for campo in modelo._meta.concrete_fields:
+        if campo.column == coluna:
+            return campo.name
+    return coluna
+
+
+class _IndicesExistentes:
+    """Consulta (uma vez por tabela) os índices existentes no banco"""
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._colunas_indexadas = {}
+
+    def possui_indice(self, tabela, coluna):
+        """Verifica se a coluna é a primeira coluna de algum índice, chave primária ou restrição de unicidade da tabela"""
+        if tabela not in self._colunas_indexadas:
+            with self._conexao.cursor() as cursor:
+                restricoes = self._conexao.introspection.get_constraints(cursor, tabela)
+
+            self._colunas_indexadas[tabela] = {
+                restricao['columns'][0] for restricao in restricoes.values()
+                if restricao['columns'] and (restricao['index'] or restricao['primary_key'] or restricao['unique'])
+            }
+
+        return coluna in self._colunas_indexadas[tabela]
@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class RelatorioDinamicoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'relatorio_dinamico'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from setup.esquema import esquema_bd
+        from .construtores import obter_indice_esquema
+        from .cache import conectar_sinais_invalidacao, obter_esquema_serializado
+        from .resumos import conectar_sinais_resumos
+        from .conexoes import aplicar_pragmas
+
+        # pré-compila o índice do esquema uma única vez, na inicialização
+        obter_indice_esquema(esquema_bd)
+        # o JSON retornado em /esquema também é serializado e comprimido uma única vez
+        obter_esquema_serializado(esquema_bd)
+        conectar_sinais_invalidacao(esquema_bd)
+        conectar_sinais_resumos()
+        connection_created.connect(aplicar_pragmas, dispatch_uid='relatorio_dinamico_pragmas')
@@ -0,0 +1,80 @@
+"""
+Execução das etapas síncronas (consultas, montagem do HTML e renderização do PDF) a partir das views assíncronas.
+
+executar_em_thread() executa a função com sync_to_async, na thread da requisição (thread_sensitive), onde ficam suas
+conexões com o BD. No máximo EXECUCOES_SIMULTANEAS funções são executadas ao mesmo tempo pelo processo: a vaga é um
+threading.BoundedSemaphore compartilhado por todas as requisições, obtido na própria thread da requisição, então o
+limite vale tanto no servidor ASGI (um único loop) quanto no WSGI (um loop por requisição, criado pelo Django).
+
+Quando o cliente se desconecta, o Django cancela a view: as requisições que esperam por uma vaga desistem dela, as
+próximas etapas não são executadas e a etapa em andamento é avisada pelo cancelamento do contexto, verificado entre as
+consultas (verificar_cancelamento) e durante as instruções do SQLite (protecao.limitar_tempo).
+"""
+from contextvars import ContextVar, copy_context
+from functools import lru_cache
+from threading import BoundedSemaphore, Event
+import asyncio
+from asgiref.sync import sync_to_async
+from .configuracoes import obter_configuracao
+
+_cancelamento = ContextVar('cancelamento_requisicao', default=None)
+
+# intervalo, em segundos, entre as verificações do cancelamento enquanto a requisição espera por uma vaga
+INTERVALO_ESPERA_VAGA = 0.1
+
+class RequisicaoCancelada(Exception):
+    """Lançada na etapa em andamento quando o cliente se desconecta"""
+    pass
+
+def cancelamento_solicitado():
+    cancelamento = _cancelamento.get()
+    return cancelamento is not None and cancelamento.is_set()
+
+def verificar_cancelamento():
+    if cancelamento_solicitado():
+        raise RequisicaoCancelada("A requisição foi cancelada pelo cliente.")
+
+def copiar_contexto_cancelavel(cancelamento):
+    """
+    Retorna uma cópia do contexto atual em que o cancelamento verificado pelas consultas é o evento informado
+    (ex: o de um relatório, que também é avisado quando ele excede o tempo limite)
+    """
+    contexto = copy_context()
+    contexto.run(_cancelamento.set, cancelamento)
+    return contexto
+
+@lru_cache(maxsize=None)
+def obter_vagas():
+    """Retorna o semáforo com as vagas de execução do processo (EXECUCOES_SIMULTANEAS)"""
+    return BoundedSemaphore(obter_configuracao('ASSINCRONO')['EXECUCOES_SIMULTANEAS'])
+
+def _executar_com_vaga(funcao, *args, **kwargs):
+    vagas = obter_vagas()
+
+    while not vagas.acquire(timeout=INTERVALO_ESPERA_VAGA):
+        verificar_cancelamento()
+
+    try:
+        verificar_cancelamento()
+        return funcao(*args, **kwargs)
+    finally:
+        vagas.release()
+
+async def executar_em_thread(funcao, *args, **kwargs):
+    """Executa a função síncrona em uma thread, quando houver uma das vagas do processo, e retorna o seu resultado"""
+    cancelamento = Event()
+    token = _cancelamento.set(cancelamento)
+    try:
+        # a tarefa recebe uma cópia do contexto atual, com o cancelamento e a medição da requisição
+        tarefa = asyncio.ensure_future(sync_to_async(_executar_com_vaga)(funcao, *args, **kwargs))
+    finally:
+        _cancelamento.reset(token)
+
+    try:
+        return await asyncio.shield(tarefa)
+    except asyncio.CancelledError:
+        # a thread desiste da vaga ou, se já estiver executando, é avisada e a libera ao terminar
+        cancelamento.set()
+        # o resultado (ou o erro) da etapa interrompida não é mais usado
+        tarefa.add_done_callback(lambda tarefa: tarefa.cancelled() or tarefa.exception())
+        raise
@@ -0,0 +1,35 @@
+"""
+Benchmarks do motor de relatórios.
+
+Cada benchmark é uma função registrada com @registrar, que recebe o número de repetições e, opcionalmente,
+os tamanhos dos dados (tamanhos=None usa os tamanhos padrão do benchmark), retorna uma lista de resultados
+(dicionários) e é executada pelo comando "python manage.py benchmark".
+"""
+from statistics import median
+import time
+
+BENCHMARKS = {}
+
+def registrar(nome):
+    def decorador(funcao):
+        BENCHMARKS[nome] = funcao
+        return funcao
+    
+    return decorador
+
+def medir(funcao, repeticoes=5):
+    """Executa a função várias vezes e retorna o menor tempo e a mediana, em segundos"""
+    tempos = []
+
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    return {'minimo': min(tempos), 'mediana': median(tempos)}
+
+def carregar_benchmarks():
+    # importa os módulos para que seus benchmarks sejam registrados
+    from . import concorrencia, formatacao, html, indices, motor, otimizacao
+
+    return BENCHMARKS
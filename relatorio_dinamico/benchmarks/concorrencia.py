@@ -0,0 +1,151 @@
+"""
+Vazão de leituras dos relatórios e de gravações de chamados simultâneas no SQLite, com as configurações padrão
+e com os pragmas de RELATORIO_DINAMICO['SQLITE'] (conexoes.py), com as leituras em uma conexão somente leitura.
+
+Cada caso usa um arquivo temporário próprio, com as tabelas criadas a partir dos modelos e preenchida com
+chamados sintéticos; o banco configurado não é usado. LEITORES threads executam uma consulta de relatório
+e GRAVADORES threads gravam um chamado por transação a cada INTERVALO_GRAVACAO, durante `repeticoes` segundos.
+Os tempos mínimo e mediano são os das leituras; os das gravações são informados à parte.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import median
+import tempfile
+import threading
+import time
+from django.apps import apps
+from django.conf import settings
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test.utils import override_settings
+from setup.esquema import esquema_bd
+from ..construtores import ValidadorConsulta, ConstrutorConsulta
+from . import registrar
+
+TAMANHOS = [100000]
+LEITORES = 4
+GRAVADORES = 2
+# intervalo entre as gravações de cada gravador (como chegam os chamados), para que as gravações não disputem a CPU com as leituras
+INTERVALO_GRAVACAO = 0.01
+
+CONSULTA = {
+    "fonte_principal": "Chamado",
+    # sem truncamento de datas: no SQLite, as funções de data do Django são executadas em Python e disputariam o GIL
+    "colunas": [{"campo": "cidade"}, {"campo": "status"}, {"campo": "id", "agregacao": "count"}],
+    "filtros": [{"campo": "numero_vitimas", "operador": "gte", "valor": 2}],
+}
+
+SQL_CHAMADOS = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+    INSERT INTO chamado_chamado (uf, cidade, bairro, status, numero_vitimas, localizacao_validada, criado_em)
+    SELECT
+        'RN',
+        CASE i %% 5 WHEN 0 THEN 'Natal' WHEN 1 THEN 'Mossoró' WHEN 2 THEN 'Parnamirim' WHEN 3 THEN 'Caicó' ELSE 'Macaíba' END,
+        'Centro',
+        CASE i %% 3 WHEN 0 THEN 'PENDENTE' ELSE 'FINALIZADO' END,
+        i %% 4 + 1,
+        0,
+        STRFTIME('%%Y-%%m-%%d %%H:%%M:%%S', '2025-01-01', '+' || (i %% 525600) || ' minutes')
+    FROM n
+"""
+
+SQL_GRAVACAO = (
+    "INSERT INTO chamado_chamado (uf, cidade, bairro, status, localizacao_validada, criado_em) "
+    "VALUES ('RN', 'Natal', 'Centro', 'PENDENTE', 0, %s)"
+)
+
+def _criar_banco(caminho, num_chamados):
+    conexoes = ConnectionHandler({'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(caminho)}})
+    conexao = conexoes['default']
+
+    try:
+        # o esquema completo, para que as chaves estrangeiras dos chamados tenham as suas tabelas
+        with conexao.schema_editor() as editor:
+            for modelo in apps.get_models():
+                editor.create_model(modelo)
+
+        with conexao.cursor() as cursor:
+            cursor.execute(SQL_CHAMADOS, [num_chamados])
+            cursor.execute('ANALYZE')
+    finally:
+        conexao.close()
+
+def _executar_carga(conexoes, sql_leitura, duracao):
+    """Executa os leitores e os gravadores ao mesmo tempo e retorna (latências das leituras, latências das gravações, erros)"""
+    latencias = []
+    gravacoes = []
+    erros = []
+    fim = time.perf_counter() + duracao
+
+    def ler():
+        conexao = conexoes['leitura']
+        try:
+            while time.perf_counter() < fim:
+                inicio = time.perf_counter()
+                try:
+                    with conexao.cursor() as cursor:
+                        cursor.execute(*sql_leitura)
+                        cursor.fetchall()
+                    latencias.append(time.perf_counter() - inicio)
+                except OperationalError:
+                    erros.append('leitura')
+        finally:
+            conexao.close()
+
+    def gravar():
+        conexao = conexoes['default']
+        try:
+            while time.perf_counter() < fim:
+                inicio = time.perf_counter()
+                try:
+                    with conexao.cursor() as cursor:
+                        cursor.execute(SQL_GRAVACAO, [datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')])
+                    gravacoes.append(time.perf_counter() - inicio)
+                except OperationalError:
+                    erros.append('gravacao')
+                time.sleep(INTERVALO_GRAVACAO)
+        finally:
+            conexao.close()
+
+    threads = [threading.Thread(target=ler) for _ in range(LEITORES)] + [threading.Thread(target=gravar) for _ in range(GRAVADORES)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return latencias, gravacoes, len(erros)
+
+@registrar('concorrencia')
+def benchmark_concorrencia(repeticoes=5, tamanhos=None):
+    construtor = ConstrutorConsulta(ValidadorConsulta(esquema_bd).validar(dict(CONSULTA)))
+    duracao = max(1, repeticoes)
+    resultados = []
+
+    for num_chamados in tamanhos or TAMANHOS:
+        for caso, ativo in [('padrao', False), ('ajustado', True)]:
+            sqlite = {**getattr(settings, 'RELATORIO_DINAMICO', {}).get('SQLITE', {}), 'ATIVO': ativo}
+
+            with tempfile.TemporaryDirectory() as diretorio, override_settings(RELATORIO_DINAMICO={**getattr(settings, 'RELATORIO_DINAMICO', {}), 'SQLITE': sqlite}):
+                caminho = Path(diretorio) / 'concorrencia.sqlite3'
+                # com os pragmas, o banco é criado no modo WAL e as leituras usam uma conexão somente leitura
+                _criar_banco(caminho, num_chamados)
+                nome_leitura = f'file:{caminho}?mode=ro' if ativo else str(caminho)
+                conexoes = ConnectionHandler({
+                    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(caminho)},
+                    'leitura': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': nome_leitura},
+                })
+                sql_leitura = construtor._criar_queryset(aplicar_limite=False, tuplas=True).query.get_compiler(connection=conexoes['leitura']).as_sql()
+                latencias, gravacoes, erros = _executar_carga(conexoes, sql_leitura, duracao)
+
+            resultados.append({
+                'benchmark': 'concorrencia', 'caso': caso, 'chamados': num_chamados,
+                'leituras_s': round(len(latencias) / duracao, 1), 'gravacoes_s': round(len(gravacoes) / duracao, 1),
+                'gravacao_mediana_ms': round(median(gravacoes) * 1000, 1) if gravacoes else None,
+                'gravacao_maxima_ms': round(max(gravacoes) * 1000, 1) if gravacoes else None,
+                'erros': erros,
+                'minimo': min(latencias) if latencias else float('nan'),
+                'mediana': median(latencias) if latencias else float('nan'),
+            })
+
+    return resultados
@@ -0,0 +1,109 @@
+"""
+Compara a formatação dos resultados linha a linha (verificando o tipo de cada célula e criando um dicionário por linha)
+com a formatação coluna a coluna, com formatadores escolhidos uma única vez e linhas em tuplas, e a exportação
+de dados com a formatação feita em Python ou pelo próprio banco.
+"""
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from django.db import transaction
+from setup.esquema import esquema_bd
+from ..construtores import ValidadorConsulta, ConstrutorConsulta
+from ..dados_sinteticos import gerar_dados_sinteticos
+from ..formatacao import criar_formatador, formatar_colunas, ResultadoConsulta
+from . import registrar, medir
+
+TAMANHOS = [1000, 100000]
+
+# exportação de chamados com colunas de data e booleanas
+CONSULTA_EXPORTACAO = {
+    "fonte_principal": "Chamado",
+    "colunas": [
+        {"campo": "id"}, {"campo": "criado_em"}, {"campo": "criado_em", "truncamento": "truncmonth"},
+        {"campo": "incidente"}, {"campo": "cidade"},
+    ],
+}
+
+COLUNAS = [
+    {'chave_db': 'id', 'rotulo': 'ID', 'tipo': 'int'},
+    {'chave_db': 'cidade', 'rotulo': 'Cidade', 'tipo': 'string'},
+    {'chave_db': 'criado_em', 'rotulo': 'Data e hora', 'tipo': 'datetime'},
+    {'chave_db': 'criado_em_truncmonth', 'rotulo': 'Mês', 'tipo': 'month'},
+    {'chave_db': 'incidente', 'rotulo': 'Incidente', 'tipo': 'bool'},
+    {'chave_db': 'id_count', 'rotulo': 'Quantidade', 'tipo': 'number'},
+]
+
+def formatar_por_linha(dados, mapa_saida):
+    """Implementação anterior à formatação por coluna, mantida como referência para comparações"""
+    rotulos = [item_mapa['rotulo'] for item_mapa in mapa_saida]
+    resultado = []
+
+    for dado in dados:
+        valores = []
+
+        for item_mapa in mapa_saida:
+            valor = dado.get(item_mapa['chave_db'])
+
+            if item_mapa['tipo'] == 'bool':
+                valor = "Verdadeiro" if valor else "Falso"
+            elif item_mapa['tipo'] == 'date' and valor:
+                valor = valor.strftime("%d/%m/%Y") if hasattr(valor, 'strftime') else valor
+            elif item_mapa['tipo'] == 'datetime' and valor:
+                valor = valor.strftime("%d/%m/%Y %H:%M") if hasattr(valor, 'strftime') else valor
+            elif item_mapa['tipo'] == 'month' and valor:
+                valor = valor.strftime("%m/%Y") if hasattr(valor, 'strftime') else valor
+            elif item_mapa['tipo'] == 'year' and valor:
+                valor = valor.strftime("%Y") if hasattr(valor, 'strftime') else valor
+
+            valores.append(valor)
+
+        resultado.append(dict(zip(rotulos, valores)))
+
+    return resultado
+
+def formatar_por_coluna(linhas, mapa_saida):
+    formatadores = [criar_formatador(item_mapa['tipo']) for item_mapa in mapa_saida]
+    return ResultadoConsulta([item_mapa['rotulo'] for item_mapa in mapa_saida], formatar_colunas(linhas, formatadores))
+
+def criar_linhas(num_linhas):
+    """Linhas do banco como dicionários (values) e como tuplas (values_list), com os mesmos valores"""
+    inicio = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    tuplas = [
+        (
+            i, f'Cidade {i % 50}', inicio + timedelta(minutes=i * 17),
+            (inicio + timedelta(days=i % 365)).replace(day=1), 'Sim' if i % 3 else None, i % 11,
+        )
+        for i in range(num_linhas)
+    ]
+    chaves = [item_mapa['chave_db'] for item_mapa in COLUNAS]
+    return [dict(zip(chaves, linha)) for linha in tuplas], tuplas
+
+@registrar('formatacao')
+def benchmark_formatacao(repeticoes=5, tamanhos=None):
+    resultados = []
+
+    for num_linhas in tamanhos or TAMANHOS:
+        dicionarios, tuplas = criar_linhas(num_linhas)
+
+        for caso, funcao, linhas in [('por_linha', formatar_por_linha, dicionarios), ('por_coluna', formatar_por_coluna, tuplas)]:
+            tempos = medir(lambda: funcao(linhas, COLUNAS), repeticoes)
+            resultados.append({'benchmark': 'formatacao', 'caso': caso, 'linhas': num_linhas, **tempos})
+
+    return resultados
+
+@registrar('exportacao')
+def benchmark_exportacao(repeticoes=5, tamanhos=None):
+    configuracao = ValidadorConsulta(esquema_bd).validar(deepcopy(CONSULTA_EXPORTACAO))
+    resultados = []
+
+    for num_chamados in tamanhos or TAMANHOS:
+        with transaction.atomic():
+            gerar_dados_sinteticos(num_chamados)
+
+            for caso, formatar_no_banco in [('python', False), ('banco', True)]:
+                construtor = ConstrutorConsulta(configuracao, formatar_no_banco=formatar_no_banco)
+                tempos = medir(lambda: sum(1 for _ in construtor.iterar()), repeticoes)
+                resultados.append({'benchmark': 'exportacao', 'caso': caso, 'chamados': num_chamados, **tempos})
+
+            transaction.set_rollback(True)
+
+    return resultados
@@ -0,0 +1,70 @@
+"""
+Compara o preenchimento das tabelas com o BeautifulSoup (um objeto por célula)
+com a renderização a partir do esqueleto do HTML (concatenação de strings).
+"""
+from bs4 import BeautifulSoup
+from django.template.loader import render_to_string
+from ..esqueleto import EsqueletoHTML
+from ..formatacao import ResultadoConsulta
+from . import registrar, medir
+import json
+
+TAMANHOS = [100, 1000, 10000]
+
+def preencher_com_beautifulsoup(html_inicial, caminho_template, resultados):
+    """Implementação anterior ao esqueleto, mantida como referência para comparações"""
+    html = BeautifulSoup(render_to_string(caminho_template), 'html.parser')
+    html.body.append(BeautifulSoup(html_inicial, 'html.parser'))
+
+    for tabela, lista_dados in zip(html.find_all(attrs={'data-config-consulta': True}), resultados):
+        if lista_dados:
+            for th, cabecalho in zip(tabela.find_all('th'), lista_dados[0].keys()):
+                th.string = cabecalho
+
+            tabela.tbody.clear()
+
+            for linha in lista_dados:
+                linha_tabela = html.new_tag('tr')
+                
+                for valor in linha.values():
+                    td = html.new_tag('td')
+                    td.string = str(valor) if valor is not None else "-"
+                    linha_tabela.append(td)
+
+                tabela.tbody.append(linha_tabela)
+
+        del tabela['data-config-consulta']
+
+    return str(html)
+
+def renderizar_com_esqueleto(html_inicial, caminho_template, resultados):
+    documento = BeautifulSoup(render_to_string(caminho_template), 'html.parser')
+    documento.body.append(BeautifulSoup(html_inicial, 'html.parser'))
+    
+    resultados = [ResultadoConsulta.de_dicionarios(lista_dados) for lista_dados in resultados]
+    return ''.join(EsqueletoHTML(documento).renderizar(resultados))
+
+def criar_tabela(num_linhas):
+    config = json.dumps({"fonte_principal": "Chamado", "colunas": []})
+    html = (
+        f"<table data-config-consulta='{config}'><thead><tr><th>{{}}</th><th>{{}}</th><th>{{}}</th></tr></thead>"
+        "<tbody><tr><td>{}</td><td>{}</td><td>{}</td></tr></tbody></table>"
+    )
+    dados = [
+        {'ID': i, 'Cidade': f'Cidade <{i % 50}> & região', 'Data': None if i % 7 == 0 else '01/01/2025'}
+        for i in range(num_linhas)
+    ]
+    return html, dados
+
+@registrar('html')
+def benchmark_html(repeticoes=5, tamanhos=None):
+    resultados = []
+
+    for num_linhas in tamanhos or TAMANHOS:
+        html, dados = criar_tabela(num_linhas)
+
+        for nome, funcao in [('beautifulsoup', preencher_com_beautifulsoup), ('esqueleto', renderizar_com_esqueleto)]:
+            tempos = medir(lambda: funcao(html, '_pdf_dinamico.html', [dados]), repeticoes)
+            resultados.append({'benchmark': 'html', 'caso': nome, 'linhas': num_linhas, **tempos})
+
+    return resultados
@@ -0,0 +1,104 @@
+"""
+Compara painéis típicos de chamados sem e com os índices declarados nos modelos (Meta.indexes).
+Os dados sintéticos e as alterações de índices são feitos dentro de uma transação desfeita ao final,
+de modo que o banco configurado não é modificado.
+"""
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from base.models import Base
+from chamado.models import Chamado, TramiteChamado
+from setup.esquema import esquema_bd
+from ..construtores import ValidadorConsulta, ConstrutorConsulta
+from . import registrar, medir
+
+NUM_CHAMADOS = 20000
+
+STATUS = ['PENDENTE', 'EM_ANDAMENTO', 'FINALIZADO', 'CANCELADO']
+CIDADES = ['Natal', 'Mossoró', 'Parnamirim', 'Caicó', 'Macaíba']
+BAIRROS = ['Centro', 'Alecrim', 'Tirol', 'Lagoa Nova', 'Ponta Negra', 'Planalto']
+
+def criar_paineis():
+    """Configurações de consulta de painéis típicos: filtros por status e período, agrupamentos por local e por mês"""
+    inicio = (timezone.now() - timedelta(days=30)).isoformat()
+
+    return {
+        'status_no_mes': {
+            "fonte_principal": "Chamado",
+            "colunas": [{"campo": "status"}, {"campo": "id", "agregacao": "count"}],
+            "filtros": [{"campo": "criado_em", "operador": "gte", "valor": inicio}],
+        },
+        'pendentes_por_local': {
+            "fonte_principal": "Chamado",
+            "colunas": [{"campo": "cidade"}, {"campo": "bairro"}, {"campo": "id", "agregacao": "count"}],
+            "filtros": [
+                {"campo": "status", "operador": "exact", "valor": "PENDENTE"},
+                {"campo": "criado_em", "operador": "gte", "valor": inicio},
+            ],
+        },
+        'chamados_por_mes': {
+            "fonte_principal": "Chamado",
+            "colunas": [{"campo": "criado_em", "truncamento": "truncmonth"}, {"campo": "id", "agregacao": "count"}],
+            "filtros": [{"campo": "cidade", "operador": "exact", "valor": "Natal"}, {"campo": "bairro", "operador": "exact", "valor": "Centro"}],
+        },
+    }
+
+def criar_dados(num_chamados):
+    usuario = User.objects.create(username='benchmark_indices')
+    bases = [Base.objects.create(nome=f'Base {i}', cidade=CIDADES[i], criado_por=usuario) for i in range(len(CIDADES))]
+    agora = timezone.now()
+
+    chamados = Chamado.objects.bulk_create(
+        Chamado(
+            base=bases[i % len(bases)],
+            uf='RN',
+            cidade=CIDADES[i % len(CIDADES)],
+            bairro=BAIRROS[(i // 3) % len(BAIRROS)],
+            status=STATUS[(i // 7) % len(STATUS)],
+        )
+        for i in range(num_chamados)
+    )
+    # criado_em usa auto_now_add; as datas são distribuídas ao longo de um ano depois da criação
+    for i, chamado in enumerate(chamados):
+        chamado.criado_em = agora - timedelta(minutes=(i * 7919) % (365 * 24 * 60))
+    Chamado.objects.bulk_update(chamados, ['criado_em'], batch_size=1000)
+
+def _alterar_indices(adicionar):
+    """Cria ou remove, no banco, os índices declarados em Meta.indexes dos modelos de chamados"""
+    # o editor é usado apenas para gerar o SQL; o SQLite não permite abri-lo dentro da transação do benchmark
+    editor = connection.schema_editor(atomic=False)
+
+    with connection.cursor() as cursor:
+        for modelo in (Chamado, TramiteChamado):
+            existentes = connection.introspection.get_constraints(cursor, modelo._meta.db_table)
+
+            for indice in modelo._meta.indexes:
+                if adicionar and indice.name not in existentes:
+                    cursor.execute(str(indice.create_sql(modelo, editor)))
+                elif not adicionar and indice.name in existentes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(indice.name)}')
+
+@registrar('indices')
+def benchmark_indices(repeticoes=5, tamanhos=None):
+    validador = ValidadorConsulta(esquema_bd)
+    construtores = {nome: ConstrutorConsulta(validador.validar(config)) for nome, config in criar_paineis().items()}
+    resultados = []
+
+    for num_chamados in tamanhos or [NUM_CHAMADOS]:
+        with transaction.atomic():
+            criar_dados(num_chamados)
+
+            for caso, adicionar in [('sem_indices', False), ('com_indices', True)]:
+                _alterar_indices(adicionar)
+                with connection.cursor() as cursor:
+                    # atualiza as estatísticas usadas pelo planejador de consultas
+                    cursor.execute('ANALYZE')
+
+                for nome, construtor in construtores.items():
+                    tempos = medir(construtor.executar, repeticoes)
+                    resultados.append({'benchmark': 'indices', 'caso': caso, 'painel': nome, 'chamados': num_chamados, **tempos})
+
+            transaction.set_rollback(True)
+
+    return resultados
@@ -0,0 +1,82 @@
+"""
+Mede cada etapa do motor de relatórios (validação, execução das consultas, geração do HTML e renderização do PDF)
+sobre volumes crescentes de dados sintéticos. Os dados de cada tamanho são gerados dentro de uma transação
+desfeita ao final, de modo que o banco configurado não é modificado.
+"""
+from copy import deepcopy
+from django.db import transaction
+from setup.esquema import esquema_bd
+from ..construtores import ValidadorConsulta, ConstrutorConsulta, ConstrutorHTML, PlanoRelatorio
+from ..dados_sinteticos import gerar_dados_sinteticos
+from ..pdf import renderizar_pdf
+from .indices import criar_paineis
+from . import registrar, medir
+import json
+
+TAMANHOS = [1000, 10000]
+
+def criar_consultas():
+    """Painéis agregados sobre chamados, uma listagem detalhada e consultas que seguem as relações do esquema_bd"""
+    consultas = dict(criar_paineis())
+    consultas.update({
+        'listagem_chamados': {
+            "fonte_principal": "Chamado",
+            "colunas": [
+                {"campo": "id"}, {"campo": "criado_em"}, {"campo": "status"}, {"campo": "cidade"},
+                {"campo": "bairro"}, {"campo": "base__nome"}, {"campo": "pessoa__nome"},
+            ],
+            "ordenacoes": [{"campo": "criado_em", "ordem": "desc"}],
+        },
+        'risco_por_base': {
+            "fonte_principal": "Chamado",
+            "colunas": [{"campo": "base__nome"}, {"campo": "atendimento_chamado__risco"}, {"campo": "id", "agregacao": "count"}],
+        },
+        'unidades_por_base': {
+            "fonte_principal": "Chamado",
+            "colunas": [{"campo": "unidade_chamado__unidade__nome"}, {"campo": "id", "agregacao": "count"}],
+        },
+    })
+    return consultas
+
+def criar_html(consultas):
+    """HTML parcial de um relatório com uma tabela para cada consulta"""
+    tabelas = []
+
+    for configuracao in consultas.values():
+        colunas = len(configuracao['colunas'])
+        tabelas.append(
+            f"<table data-config-consulta='{json.dumps(configuracao)}'>"
+            f"<thead><tr>{'<th></th>' * colunas}</tr></thead><tbody><tr>{'<td></td>' * colunas}</tr></tbody></table>"
+        )
+
+    return ''.join(tabelas)
+
+@registrar('motor')
+def benchmark_motor(repeticoes=5, tamanhos=None):
+    validador = ValidadorConsulta(esquema_bd)
+    consultas = criar_consultas()
+    html = criar_html(consultas)
+    resultados = []
+
+    for num_chamados in tamanhos or TAMANHOS:
+        with transaction.atomic():
+            gerar_dados_sinteticos(num_chamados)
+            configuracoes = [validador.validar(deepcopy(configuracao)) for configuracao in consultas.values()]
+            plano = PlanoRelatorio.compilar(html, '_pdf_dinamico.html', validador)
+            # as consultas são executadas em sequência: outras threads não veriam os dados desta transação
+            html_final = ConstrutorHTML.a_partir_do_plano(plano, ConstrutorConsulta(), max_trabalhadores=1).gerar_html()
+
+            etapas = {
+                'validar': lambda: [validador.validar(deepcopy(configuracao)) for configuracao in consultas.values()],
+                'executar': lambda: [ConstrutorConsulta(configuracao).executar() for configuracao in configuracoes],
+                'gerar_html': lambda: ConstrutorHTML(html, '_pdf_dinamico.html', validador, ConstrutorConsulta(), max_trabalhadores=1).gerar_html(),
+                'renderizar_pdf': lambda: renderizar_pdf(html_final, 'http://localhost/'),
+            }
+
+            for etapa, funcao in etapas.items():
+                tempos = medir(funcao, repeticoes)
+                resultados.append({'benchmark': 'motor', 'etapa': etapa, 'chamados': num_chamados, **tempos})
+
+            transaction.set_rollback(True)
+
+    return resultados
@@ -0,0 +1,66 @@
+"""
+Compara as consultas montadas sem e com o otimizador (otimizador.py): DISTINCT e agregações com distinct=True
+apenas quando necessários, filtros sobre relações "para muitos" e agregações sobre relações inversas em subconsultas.
+Os dados sintéticos de cada tamanho são gerados dentro de uma transação desfeita ao final.
+"""
+from copy import deepcopy
+from django.conf import settings
+from django.db import transaction
+from django.test.utils import override_settings
+from setup.esquema import esquema_bd
+from ..construtores import ValidadorConsulta, ConstrutorConsulta
+from ..dados_sinteticos import gerar_dados_sinteticos
+from . import registrar, medir
+
+TAMANHOS = [10000, 100000]
+
+CONSULTAS = {
+    'contagem_por_cidade': {
+        "fonte_principal": "Chamado",
+        "colunas": [{"campo": "cidade"}, {"campo": "id", "agregacao": "count"}],
+    },
+    'risco_vermelho_por_base': {
+        "fonte_principal": "Chamado",
+        "colunas": [{"campo": "base__nome"}, {"campo": "id", "agregacao": "count"}],
+        "filtros": [{"campo": "atendimento_chamado__risco", "operador": "exact", "valor": "Vermelho"}],
+    },
+    # agregações sobre duas relações inversas: sem o otimizador, as junções formam o produto cartesiano das relações
+    'painel_atendimentos_unidades': {
+        "fonte_principal": "Chamado",
+        "colunas": [
+            {"campo": "base__nome"}, {"campo": "atendimento_chamado__id", "agregacao": "count"},
+            {"campo": "unidade_chamado__id", "agregacao": "count"}, {"campo": "unidade_chamado__alocado_em", "agregacao": "max"},
+        ],
+    },
+    'listagem_com_atendimento': {
+        "fonte_principal": "Chamado",
+        "colunas": [{"campo": "id"}, {"campo": "criado_em"}, {"campo": "cidade"}],
+        "filtros": [{"campo": "atendimento_chamado__risco", "operador": "in", "valor": ["Vermelho", "Laranja"]}],
+        "ordenacoes": [{"campo": "criado_em", "ordem": "desc"}],
+    },
+}
+
+@registrar('otimizacao')
+def benchmark_otimizacao(repeticoes=5, tamanhos=None):
+    validador = ValidadorConsulta(esquema_bd)
+    configuracoes = {nome: validador.validar(deepcopy(consulta)) for nome, consulta in CONSULTAS.items()}
+    resultados = []
+
+    for num_chamados in tamanhos or TAMANHOS:
+        with transaction.atomic():
+            gerar_dados_sinteticos(num_chamados)
+
+            for caso, ativo in [('sem_otimizacao', False), ('com_otimizacao', True)]:
+                relatorio_dinamico = {**getattr(settings, 'RELATORIO_DINAMICO', {}), 'OTIMIZACAO': {'ATIVO': ativo}}
+
+                # o plano de otimização é definido ao criar o construtor
+                with override_settings(RELATORIO_DINAMICO=relatorio_dinamico):
+                    construtores = {nome: ConstrutorConsulta(configuracao) for nome, configuracao in configuracoes.items()}
+
+                for nome, construtor in construtores.items():
+                    tempos = medir(lambda: list(construtor.iterar()), repeticoes)
+                    resultados.append({'benchmark': 'otimizacao', 'caso': caso, 'consulta': nome, 'chamados': num_chamados, **tempos})
+
+            transaction.set_rollback(True)
+
+    return resultados
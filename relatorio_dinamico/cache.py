@@ -0,0 +1,221 @@
+"""
+Caches das consultas dinâmicas e dos planos dos relatórios salvos.
+
+A chave de cada resultado é um hash da configuração de consulta validada, combinado com a versão atual
+de cada modelo envolvido na consulta. Quando um desses modelos é salvo ou excluído, sua versão é trocada
+e os resultados antigos deixam de ser encontrados (e acabam removidos pelo TTL ou pela política LRU).
+"""
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import sha256
+from threading import Lock
+from uuid import uuid4
+import gzip
+import json
+import time
+from django.apps import apps
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_save, post_delete
+from django.template.loader import render_to_string
+from .configuracoes import obter_configuracao
+from .construtores import PlanoRelatorio, ValidadorConsulta, obter_indice_esquema
+
+PREFIXO_CHAVE = 'relatorio_dinamico:'
+
+class BackendMemoria:
+    """Cache LRU, com TTL, mantido na memória do processo"""
+    def __init__(self, max_entradas=256):
+        self._max_entradas = max_entradas
+        self._itens = OrderedDict() # chave -> (valor, instante de expiração)
+        self._trava = Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            item = self._itens.get(chave)
+
+            if item is None:
+                return None
+            
+            valor, expira_em = item
+
+            if expira_em is not None and expira_em <= time.monotonic():
+                del self._itens[chave]
+                return None
+            
+            # marca o item como usado recentemente
+            self._itens.move_to_end(chave)
+            return valor
+
+    def definir(self, chave, valor, ttl=None):
+        expira_em = time.monotonic() + ttl if ttl else None
+
+        with self._trava:
+            self._itens[chave] = (valor, expira_em)
+            self._itens.move_to_end(chave)
+
+            # remove os itens usados há mais tempo
+            while len(self._itens) > self._max_entradas:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+
+class BackendCacheDjango:
+    """Usa o framework de cache do Django; a política de remoção é a do backend configurado"""
+    def __init__(self, alias='default'):
+        self._cache = caches[alias]
+
+    def obter(self, chave):
+        return self._cache.get(chave)
+
+    def definir(self, chave, valor, ttl=None):
+        self._cache.set(chave, valor, ttl)
+
+    def limpar(self):
+        self._cache.clear()
+
+
+class CacheResultados:
+    def __init__(self, backend, ttl=300):
+        """
+        :param backend: Backend onde os resultados são armazenados (BackendMemoria ou BackendCacheDjango)
+        :param ttl: Tempo de vida de cada resultado, em segundos
+        """
+        self._backend = backend
+        self._ttl = ttl
+
+    def _obter_versao_modelo(self, app_model):
+        chave = f"{PREFIXO_CHAVE}versao:{app_model}"
+        versao = self._backend.obter(chave)
+
+        if versao is None:
+            # se a versão foi removida do cache, uma nova é criada e nenhum resultado antigo será reaproveitado
+            versao = uuid4().hex
+            self._backend.definir(chave, versao)
+
+        return versao
+
+    def gerar_chave(self, configuracao_consulta, banco=DEFAULT_DB_ALIAS):
+        """
+        Gera a chave do resultado a partir da configuração de consulta validada e do alias do banco onde ela é executada
+        (a mesma consulta pode ter resultados diferentes no banco principal e no banco dos relatórios)
+        """
+        modelos = configuracao_consulta.get('modelos_envolvidos') or [configuracao_consulta['app_model']]
+        versoes = [self._obter_versao_modelo(app_model) for app_model in modelos]
+        configuracao_normalizada = json.dumps(configuracao_consulta, sort_keys=True, default=str)
+        resumo = sha256(configuracao_normalizada.encode('utf-8'))
+        resumo.update(':'.join([banco, *versoes]).encode('utf-8'))
+        
+        return f"{PREFIXO_CHAVE}resultado:{resumo.hexdigest()}"
+
+    def obter_ou_executar(self, configuracao_consulta, funcao_execucao, banco=DEFAULT_DB_ALIAS):
+        """Retorna o resultado armazenado ou executa a consulta e armazena seu resultado"""
+        chave = self.gerar_chave(configuracao_consulta, banco)
+        resultado = self._backend.obter(chave)
+
+        if resultado is None:
+            resultado = funcao_execucao()
+            self._backend.definir(chave, resultado, self._ttl)
+
+        return resultado
+
+    def invalidar_modelo(self, app_model):
+        """Descarta todos os resultados de consultas que envolvem o modelo"""
+        self._backend.definir(f"{PREFIXO_CHAVE}versao:{app_model}", uuid4().hex)
+
+    def limpar(self):
+        self._backend.limpar()
+
+
+@lru_cache(maxsize=None)
+def obter_cache_resultados():
+    """
+    Retorna o cache de resultados definido nas configurações, 
+    ou None se o cache estiver desativado
+    """
+    configuracao = obter_configuracao('CACHE_RESULTADOS')
+
+    if not configuracao['ATIVO']:
+        return None
+
+    return CacheResultados(_criar_backend(configuracao), configuracao['TTL'])
+
+def _criar_backend(configuracao):
+    if configuracao['BACKEND'] == 'django':
+        return BackendCacheDjango(configuracao['ALIAS'])
+    
+    return BackendMemoria(configuracao['MAX_ENTRADAS'])
+
+@lru_cache(maxsize=None)
+def obter_cache_planos():
+    return _criar_backend(obter_configuracao('CACHE_PLANOS'))
+
+@lru_cache(maxsize=None)
+def _obter_assinatura_template(caminho_template):
+    return sha256(render_to_string(caminho_template).encode('utf-8')).hexdigest()
+
+def obter_plano_relatorio(relatorio, esquema, caminho_template):
+    """
+    Retorna o plano (HTML já analisado e consultas já validadas) de um relatório salvo,
+    compilando-o e armazenando-o em cache na primeira vez em que é solicitado.
+    A chave inclui o conteúdo do HTML, o esquema e o template, então alterações em qualquer um deles geram um novo plano.
+    """
+    resumo_html = sha256(relatorio.html.encode('utf-8')).hexdigest()
+    assinatura_esquema = obter_indice_esquema(esquema).assinatura
+    assinatura_template = _obter_assinatura_template(caminho_template)
+    chave = f"{PREFIXO_CHAVE}plano:{relatorio.pk}:{resumo_html}:{assinatura_esquema}:{assinatura_template}"
+    cache_planos = obter_cache_planos()
+    plano = cache_planos.obter(chave)
+
+    if plano is None:
+        plano = PlanoRelatorio.compilar(relatorio.html, caminho_template, ValidadorConsulta(esquema))
+        cache_planos.definir(chave, plano, obter_configuracao('CACHE_PLANOS')['TTL'])
+
+    return plano
+
+class EsquemaSerializado:
+    """JSON do esquema, serializado e comprimido uma única vez, com a versão usada no ETag e no cache do navegador"""
+    def __init__(self, esquema):
+        self.conteudo = json.dumps(esquema, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # mtime=0: a mesma versão do esquema sempre gera os mesmos bytes comprimidos
+        self.conteudo_gzip = gzip.compress(self.conteudo, compresslevel=9, mtime=0)
+        self.versao = sha256(self.conteudo).hexdigest()[:16]
+
+    def etag(self, comprimido=False):
+        # ETags fortes devem ser diferentes para cada codificação do conteúdo
+        return f'"{self.versao}-gzip"' if comprimido else f'"{self.versao}"'
+
+_esquemas_serializados = {} # id do esquema -> (esquema, EsquemaSerializado)
+
+def obter_esquema_serializado(esquema):
+    """Retorna o esquema serializado, serializando-o na primeira chamada"""
+    esquema_serializado, serializado = _esquemas_serializados.get(id(esquema), (None, None))
+
+    if esquema_serializado is not esquema:
+        serializado = EsquemaSerializado(esquema)
+        _esquemas_serializados[id(esquema)] = (esquema, serializado)
+
+    return serializado
+
+def conectar_sinais_invalidacao(esquema):
+    """Invalida os resultados em cache sempre que um modelo do esquema for salvo ou excluído"""
+    for config_entidade in esquema.values():
+        app_model = config_entidade['app_model']
+
+        try:
+            modelo = apps.get_model(app_model)
+        except (LookupError, ValueError):
+            continue
+
+        def invalidar(sender, app_model=app_model, **kwargs):
+            cache_resultados = obter_cache_resultados()
+
+            if cache_resultados:
+                cache_resultados.invalidar_modelo(app_model)
+
+        uid = f"relatorio_dinamico_invalidar_cache:{app_model}"
+        post_save.connect(invalidar, sender=modelo, weak=False, dispatch_uid=uid)
+        post_delete.connect(invalidar, sender=modelo, weak=False, dispatch_uid=uid)
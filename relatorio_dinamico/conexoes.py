@@ -0,0 +1,36 @@
+"""
+Inicialização das conexões com o SQLite.
+
+Com RELATORIO_DINAMICO['SQLITE']['ATIVO'], os PRAGMAS configurados são aplicados a cada nova conexão (sinal
+connection_created): o modo WAL permite que as leituras dos relatórios aconteçam ao mesmo tempo que as gravações dos
+chamados, o mmap e o cache maior reduzem as leituras do arquivo, as tabelas temporárias (GROUP BY, ORDER BY e DISTINCT)
+ficam na memória e o busy_timeout faz a conexão esperar pelo bloqueio em vez de falhar de imediato.
+
+Conexões somente leitura (NAME com "mode=ro", ex: o alias "leitura" das configurações do projeto) também recebem
+query_only; o modo do journal é gravado no próprio arquivo e só é alterado pelas conexões com permissão de escrita.
+"""
+from .configuracoes import obter_configuracao
+
+def conexao_somente_leitura(connection):
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+def obter_pragmas(connection):
+    """Retorna os pragmas aplicados às novas conexões do banco, na ordem em que são executados"""
+    configuracao = obter_configuracao('SQLITE')
+
+    if connection.vendor != 'sqlite' or not configuracao['ATIVO']:
+        return {}
+
+    pragmas = dict(configuracao['PRAGMAS'])
+
+    if conexao_somente_leitura(connection):
+        pragmas.pop('journal_mode', None)
+        pragmas['query_only'] = 'ON'
+
+    return pragmas
+
+def aplicar_pragmas(sender, connection, **kwargs):
+    """Receptor do sinal connection_created"""
+    for nome, valor in obter_pragmas(connection).items():
+        # os nomes e os valores vêm das configurações do projeto, não de dados dos usuários
+        connection.connection.execute(f'PRAGMA {nome} = {valor}')
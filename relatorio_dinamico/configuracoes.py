@@ -0,0 +1,147 @@
+"""
+Configurações do app de relatórios dinâmicos.
+
+Os valores podem ser personalizados no dicionário RELATORIO_DINAMICO do arquivo de configurações do Django,
+usando as mesmas chaves de PADROES. Configurações que são dicionários são mescladas com os valores padrão.
+"""
+from django.conf import settings
+from pathlib import Path
+
+PADROES = {
+    # cache dos resultados de ConstrutorConsulta.executar
+    # BACKEND: 'memoria' (cache LRU local do processo) ou 'django' (framework de cache do Django, definido por ALIAS)
+    # TTL: tempo de vida de cada resultado, em segundos
+    # MAX_ENTRADAS: quantidade máxima de resultados mantidos pelo backend 'memoria'
+    'CACHE_RESULTADOS': {
+        'ATIVO': True,
+        'BACKEND': 'memoria',
+        'ALIAS': 'default',
+        'TTL': 300,
+        'MAX_ENTRADAS': 256,
+    },
+    # cache dos planos dos relatórios salvos (HTML já analisado e consultas já validadas)
+    # TTL None mantém o plano até que seja removido pela política LRU ou o relatório seja alterado
+    'CACHE_PLANOS': {
+        'BACKEND': 'memoria',
+        'ALIAS': 'default',
+        'TTL': None,
+        'MAX_ENTRADAS': 128,
+    },
+    # execução das consultas das tabelas de um relatório em um pool de threads
+    # MAX_TRABALHADORES: threads do executor compartilhado pelos relatórios do processo, isto é, o número máximo de
+    # consultas paralelas simultâneas somadas as de todos os relatórios em andamento (1 executa em sequência)
+    # TEMPO_LIMITE: tempo máximo, em segundos, para executar todas as consultas de um relatório, contado a partir do
+    # início da primeira; a espera por uma thread livre do executor também é limitada a esse tempo
+    'CONSULTAS_PARALELAS': {
+        'MAX_TRABALHADORES': 4,
+        'TEMPO_LIMITE': 60,
+    },
+    # views assíncronas (assincrono.py): etapas síncronas (consultas, HTML e PDF) executadas ao mesmo tempo por processo,
+    # somadas as de todas as requisições; as demais esperam por uma vaga
+    'ASSINCRONO': {
+        'EXECUCOES_SIMULTANEAS': 8,
+    },
+    # fila de geração de PDFs em segundo plano (comando processar_pdfs)
+    # PROCESSOS: número de PDFs renderizados ao mesmo tempo (None usa o número de núcleos)
+    # INTERVALO: espera, em segundos, entre verificações da fila quando não há tarefas
+    # TEMPO_MAXIMO: tarefas em processamento há mais tempo do que isso (segundos) voltam para a fila
+    # RETENCAO: tarefas concluídas ou com erro há mais tempo do que isso (segundos) são removidas, com o PDF; None as mantém
+    'TAREFAS_PDF': {
+        'PROCESSOS': None,
+        'INTERVALO': 1,
+        'TEMPO_MAXIMO': 600,
+        'RETENCAO': 24 * 60 * 60,
+    },
+    # cache em disco dos PDFs gerados, endereçado pelo hash do HTML final
+    # TAMANHO_MAXIMO: soma máxima, em bytes, dos arquivos do cache; os usados há mais tempo são removidos primeiro
+    'CACHE_PDF': {
+        'ATIVO': True,
+        'DIRETORIO': Path(settings.BASE_DIR) / 'cache' / 'pdf',
+        'TAMANHO_MAXIMO': 512 * 1024 * 1024,
+    },
+    # esquema gerado a partir dos modelos (gerador_esquema.py)
+    # ARQUIVO_CACHE: arquivo onde o esquema gerado é armazenado entre as inicializações; None gera a cada inicialização,
+    # o que, com poucas entidades, é mais rápido que conferir a chave e ler o arquivo (ex: BASE_DIR / 'cache' / 'esquema.json')
+    'ESQUEMA': {
+        'ARQUIVO_CACHE': None,
+    },
+    # resumos diários pré-agregados de chamados (ResumoChamado)
+    # ATIVO: mantém os resumos a cada alteração de um chamado e responde as consultas compatíveis a partir deles;
+    # ao ativar, execute "python manage.py atualizar_resumos" para preencher os resumos com os dados existentes
+    'RESUMOS': {
+        'ATIVO': False,
+    },
+    # otimização das consultas (otimizador.py): DISTINCT apenas quando necessário e filtros e agregações sobre
+    # relações "para muitos" em subconsultas; desativar monta as consultas sem as otimizações, para comparação
+    'OTIMIZACAO': {
+        'ATIVO': True,
+    },
+    # banco das consultas dos relatórios (roteamento.py), ex: uma réplica de leitura ou um banco analítico
+    # ALIAS: alias de DATABASES usado por padrão (None usa o banco principal); cada relatório salvo pode definir o seu
+    # FALLBACK: usa o banco principal quando o banco dos relatórios está indisponível ou atrasado (False lança um erro)
+    # ATRASO_MAXIMO: atraso tolerado, em segundos, desde a última sincronização (None não verifica o atraso)
+    # INTERVALO_VERIFICACAO: tempo, em segundos, durante o qual o resultado da verificação de um banco é reaproveitado
+    'BANCO_RELATORIOS': {
+        'ALIAS': None,
+        'FALLBACK': True,
+        'ATRASO_MAXIMO': None,
+        'INTERVALO_VERIFICACAO': 30,
+    },
+    # pragmas aplicados a cada nova conexão com o SQLite (conexoes.py); os valores seguem a sintaxe do PRAGMA
+    # journal_mode 'wal': leituras e gravações simultâneas; synchronous 'normal': seguro no modo WAL, com menos fsyncs
+    # mmap_size: bytes do arquivo mapeados na memória; cache_size negativo: tamanho do cache de páginas em KiB
+    # temp_store 'memory': tabelas temporárias na memória; busy_timeout: espera, em ms, por um bloqueio do banco
+    'SQLITE': {
+        'ATIVO': False,
+        'PRAGMAS': {
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,
+            'temp_store': 'memory',
+            'busy_timeout': 5000,
+        },
+    },
+    # proteção do banco contra consultas caras (protecao.py), aplicada em ConstrutorConsulta.executar e paginar
+    # TEMPO_LIMITE: tempo máximo, em segundos, de cada instrução SQL (SQLite e PostgreSQL; None não limita)
+    # PROFUNDIDADE_MAXIMA / JUNCOES_MAXIMAS: relações seguidas em um mesmo campo / tabelas relacionadas na consulta
+    # CUSTO_MAXIMO: custo estimado pelo EXPLAIN acima do qual a consulta é recusada (custo do planejador no PostgreSQL,
+    # linhas lidas por completo no SQLite); CUSTO_FILA: custo a partir do qual a consulta é considerada pesada
+    # CONSULTAS_PESADAS_SIMULTANEAS: consultas pesadas executadas ao mesmo tempo no processo; as demais esperam na fila
+    # por até ESPERA_MAXIMA segundos
+    'PROTECAO_CONSULTAS': {
+        'ATIVO': True,
+        'TEMPO_LIMITE': 30,
+        'PROFUNDIDADE_MAXIMA': 4,
+        'JUNCOES_MAXIMAS': 8,
+        'CUSTO_MAXIMO': 1e9,
+        'CUSTO_FILA': 1e6,
+        'CONSULTAS_PESADAS_SIMULTANEAS': 2,
+        'ESPERA_MAXIMA': 10,
+    },
+    # medição das etapas da geração dos relatórios (validação, consultas, HTML e PDF)
+    # MAX_AMOSTRAS: quantidade de durações mantidas por relatório e etapa para o cálculo dos percentis em /metricas
+    # FAIXAS_MS: limites, em milissegundos, das faixas do histograma de durações
+    'METRICAS': {
+        'ATIVO': True,
+        'MAX_AMOSTRAS': 1000,
+        'FAIXAS_MS': [10, 50, 100, 250, 500, 1000, 2500, 5000, 10000],
+    },
+    # exportação dos dados de uma consulta em CSV/XLSX, sem o limite de registros
+    # TAMANHO_BLOCO: quantidade de registros buscados no banco de cada vez
+    # FORMATAR_NO_BANCO: datas e booleanos são convertidos em texto pelo próprio banco, sem formatação em Python
+    'EXPORTACAO': {
+        'TAMANHO_BLOCO': 2000,
+        'FORMATAR_NO_BANCO': True,
+    },
+}
+
+def obter_configuracao(chave):
+    """Retorna o valor da configuração, aplicando os valores padrão quando necessário"""
+    valor_padrao = PADROES[chave]
+    valor = getattr(settings, 'RELATORIO_DINAMICO', {}).get(chave)
+
+    if isinstance(valor_padrao, dict):
+        return {**valor_padrao, **(valor or {})}
+    
+    return valor_padrao if valor is None else valor
@@ -1,12 +1,36 @@
 from django.apps import apps
-from django.db.models import Q, Count, Sum, Avg, Min, Max
-from django.db.models.functions import TruncDay, TruncMonth, TruncYear
+from django.db.models import Q, F, Count, Sum, Avg, Min, Max, CharField
+from django.db.models.functions import TruncDay, TruncMonth, TruncYear, Cast
 from django.core.exceptions import ValidationError
-from functools import reduce
+from django.db import connections, close_old_connections
+from django.core.serializers.json import DjangoJSONEncoder
+from functools import reduce, lru_cache
 import operator
+from types import MappingProxyType
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+from hashlib import sha256
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+import binascii
+import os
 import json
 from bs4 import BeautifulSoup
 from django.template.loader import render_to_string
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Event
+from time import monotonic
+from .configuracoes import obter_configuracao
+from .esqueleto import EsqueletoHTML
+from .analise import analisar_queryset
+from .resumos import obter_reescrita_resumo
+from .otimizador import otimizar_consulta, criar_filtro_subconsulta, criar_metrica_subconsulta
+from .metricas import medir_etapa
+from .roteamento import DICA_BANCO
+from .protecao import avaliar_consulta, proteger_execucao
+from .assincrono import cancelamento_solicitado, copiar_contexto_cancelavel, verificar_cancelamento
+from .formatacao import criar_formatador, formatar_colunas, ResultadoConsulta, criar_expressao_formatacao, suporta_formatacao_no_banco, formatacao_sem_perda
+from itertools import islice
 import re
 
 FUNCOES_DE_AGREGACAO = {
@@ -26,67 +50,139 @@ FUNCOES_DE_TRUNCAMENTO_DATA = {
 # limite máximo de registros retornados em uma consulta
 LIMITE_MAXIMO = 1000
 
-class ValidadorConsulta:
+# intervalo, em segundos, entre as verificações do cancelamento da requisição enquanto as consultas paralelas são aguardadas
+INTERVALO_VERIFICACAO_CONSULTAS = 0.1
+
+# tipos dos valores do cursor de paginação sem representação no JSON: nome -> (classe, conversão do texto)
+# datetime vem antes de date, pois é uma subclasse dela
+TIPOS_CURSOR = {
+    'datetime': (datetime, datetime.fromisoformat),
+    'date': (date, date.fromisoformat),
+    'time': (time, time.fromisoformat),
+    'decimal': (Decimal, Decimal),
+    'uuid': (UUID, UUID),
+}
+
+class IndiceEsquema:
+    """
+    Índice imutável e pré-compilado do esquema do BD.
+
+    Converte as listas 'campos' e 'conexoes' de cada entidade em dicionários,
+    permitindo resolver cada parte de um caminho (ex: "base__responsavel__email")
+    com uma única busca. Os caminhos já resolvidos ficam guardados em cache e são
+    reaproveitados entre requisições.
+    """
     def __init__(self, esquema):
         """
         :param esquema: Dicionário representando o esquema do BD
         """
-        self.esquema = esquema
-        self._campos_validados = {} # para evitar validação repetida de campos
+        entidades = {}
+
+        for nome_entidade, config_entidade in esquema.items():
+            campos = {campo['valor']: campo['tipo'] for campo in config_entidade.get('campos', [])}
+            conexoes = {
+                conexao['campo_relacao']: conexao['model_destino']
+                for conexao in config_entidade.get('conexoes', [])
+            }
+            entidades[nome_entidade] = MappingProxyType({
+                'app_model': config_entidade.get('app_model'),
+                'campos': MappingProxyType(campos),
+                'conexoes': MappingProxyType(conexoes),
+            })
 
-    def _buscar_na_lista(self, lista, chave_identificadora, valor_buscado):
-        """
-        Função auxiliar para encontrar um dicionário dentro de uma lista.
-        Ex: Procura em 'conexoes': 'campo_relacao' == 'unidade'
-        """
-        for item in lista:
-            if item.get(chave_identificadora) == valor_buscado:
-                return item
-        return None
+        self._entidades = MappingProxyType(entidades)
+        # identifica a versão do esquema (ex: para invalidar planos de relatórios validados com outro esquema)
+        self.assinatura = sha256(json.dumps(esquema, sort_keys=True).encode('utf-8')).hexdigest()
+        self._caminhos_resolvidos = {} # cache de (entidade raiz, caminho) -> (tipo do campo, entidades percorridas)
 
-    def _validar_caminho(self, nome_entidade_raiz, caminho_str):
+    def __contains__(self, nome_entidade):
+        return nome_entidade in self._entidades
+
+    def obter_app_model(self, nome_entidade):
+        return self._entidades[nome_entidade]['app_model']
+
+    def resolver_caminho(self, nome_entidade_raiz, caminho_str):
         """
         Verifica se o caminho do campo (ex: "solicitante__usuario__email") 
-        é válido dentro do esquema fornecido.
+        é válido a partir da entidade raiz.
         
         Retorna o tipo do campo (ex: "string", "number", "date", etc).
         """
-        if caminho_str in self._campos_validados:
-            return self._campos_validados[caminho_str]
+        tipo_campo, _ = self._resolver(nome_entidade_raiz, caminho_str)
+        return tipo_campo
+
+    def obter_entidades_caminho(self, nome_entidade_raiz, caminho_str):
+        """Retorna as entidades percorridas pelo caminho, a partir da entidade raiz"""
+        _, entidades = self._resolver(nome_entidade_raiz, caminho_str)
+        return entidades
+
+    def _resolver(self, nome_entidade_raiz, caminho_str):
+        chave = (nome_entidade_raiz, caminho_str)
+        resolvido = self._caminhos_resolvidos.get(chave)
+
+        if resolvido is not None:
+            return resolvido
 
         partes = caminho_str.split('__')
         entidade_atual = nome_entidade_raiz
+        entidades = [entidade_atual]
         
         # navega pelas relações (todas as partes exceto a última, que é o nome da coluna no BD)
-        for i in range(len(partes) - 1):
-            campo_relacao = partes[i]
-            config_entidade = self.esquema.get(entidade_atual)
-            # verifica se a conexão existe no esquema
-            lista_conexoes = config_entidade.get('conexoes', [])
-            conexao = self._buscar_na_lista(lista_conexoes, 'campo_relacao', campo_relacao)
-
-            if not conexao:
+        for campo_relacao in partes[:-1]:
+            entidade_destino = self._entidades[entidade_atual]['conexoes'].get(campo_relacao)
+
+            if entidade_destino is None or entidade_destino not in self._entidades:
                 raise ValidationError(
                     f"Relação '{campo_relacao}' não existe ou não é permitida em '{entidade_atual}'."
                 )
             
             # avança para a próxima entidade no caminho
-            entidade_atual = conexao['model_destino']
+            entidade_atual = entidade_destino
+            entidades.append(entidade_atual)
             
         nome_campo = partes[-1]
-        config_entidade_final = self.esquema.get(entidade_atual)
-        lista_campos = config_entidade_final.get('campos', [])
-        config_campo = self._buscar_na_lista(lista_campos, 'valor', nome_campo)
+        tipo_campo = self._entidades[entidade_atual]['campos'].get(nome_campo)
         
-        if not config_campo:
+        if tipo_campo is None:
             raise ValidationError(
                 f"Campo '{nome_campo}' não encontrado na entidade '{entidade_atual}'."
             )
         
-        tipo_campo = config_campo['tipo']
-        self._campos_validados[caminho_str] = tipo_campo
+        resolvido = (tipo_campo, tuple(entidades))
+        self._caminhos_resolvidos[chave] = resolvido
         
-        return tipo_campo
+        return resolvido
+
+
+_indices_esquema = {} # id do esquema -> (esquema, índice), para construir cada índice uma única vez
+
+def obter_indice_esquema(esquema):
+    """Retorna o índice pré-compilado do esquema, construindo-o na primeira chamada"""
+    esquema_indexado, indice = _indices_esquema.get(id(esquema), (None, None))
+
+    if esquema_indexado is not esquema:
+        indice = IndiceEsquema(esquema)
+        _indices_esquema[id(esquema)] = (esquema, indice)
+
+    return indice
+
+
+class ValidadorConsulta:
+    def __init__(self, esquema):
+        """
+        :param esquema: Dicionário representando o esquema do BD
+        """
+        self.esquema = esquema
+        self._indice = obter_indice_esquema(esquema)
+
+    def _validar_caminho(self, nome_entidade_raiz, caminho_str):
+        """
+        Verifica se o caminho do campo (ex: "solicitante__usuario__email") 
+        é válido dentro do esquema fornecido.
+        
+        Retorna o tipo do campo (ex: "string", "number", "date", etc).
+        """
+        return self._indice.resolver_caminho(nome_entidade_raiz, caminho_str)
 
     def _validar_funcao(self, nome_funcao, campo, tipo_campo):
         """Valida se a função de agregação ou truncamento é válida para o campo"""
@@ -150,19 +246,20 @@ class ValidadorConsulta:
 
     def validar(self, configuracao_consulta):
         """Valida todos os campos usados na consulta"""
+        with medir_etapa('validacao'):
+            return self._validar(configuracao_consulta)
+
+    def _validar(self, configuracao_consulta):
         if not isinstance(configuracao_consulta, dict):
             raise ValidationError("Configuração de consulta inválida.")
         
         nome_entidade_raiz = configuracao_consulta.get('fonte_principal')
         
-        if nome_entidade_raiz not in self.esquema:
+        if nome_entidade_raiz not in self._indice:
             raise ValidationError(f"Entidade raiz '{nome_entidade_raiz}' inválida.")
         
         # armazena o nome do app_model no dicionário da consulta
-        configuracao_consulta['app_model'] = self.esquema[nome_entidade_raiz]['app_model']
-        
-        if self._campos_validados:
-            self._campos_validados.clear()
+        configuracao_consulta['app_model'] = self._indice.obter_app_model(nome_entidade_raiz)
 
         colunas = configuracao_consulta.get('colunas', [])
 
@@ -172,15 +269,22 @@ class ValidadorConsulta:
         filtros = configuracao_consulta.get('filtros', [])
         ordenacoes = configuracao_consulta.get('ordenacoes', [])
         lista_elementos = colunas + filtros + ordenacoes
+        entidades_envolvidas = {nome_entidade_raiz}
 
         for elemento in lista_elementos:
             campo = elemento['campo']
             tipo = self._validar_caminho(nome_entidade_raiz, campo)
+            entidades_envolvidas.update(self._indice.obter_entidades_caminho(nome_entidade_raiz, campo))
             elemento['tipo'] = tipo # armazena o tipo do campo validado
             nome_funcao = elemento.get('agregacao') or elemento.get('truncamento')
             nome_funcao = self._validar_funcao(nome_funcao, campo, tipo)
             elemento['apelido'] = self._criar_apelido_campo(campo, nome_funcao) # armazena o apelido do campo
 
+        # armazena os modelos consultados, usados, por exemplo, para invalidar o cache de resultados
+        configuracao_consulta['modelos_envolvidos'] = sorted(
+            self._indice.obter_app_model(entidade) for entidade in entidades_envolvidas
+        )
+
         # tratamento específico para colunas
         self._processar_tipos_exibicao_colunas(colunas)
         # tratamento específico para filtros
@@ -192,12 +296,25 @@ class ValidadorConsulta:
         return configuracao_consulta
 
 class ConstrutorConsulta:
-    def __init__(self, configuracao_consulta: dict=None):
+    def __init__(self, configuracao_consulta: dict=None, cache_resultados=None, formatar_no_banco: bool=False, banco: str=None):
         """
         :param configuracao_consulta: Dicionário especificando os metadados da consulta
+        :param cache_resultados: Instância opcional de CacheResultados para reaproveitar resultados de consultas já executadas
+        :param formatar_no_banco: Se True, as datas e os booleanos de executar() e iterar() são formatados pelo próprio banco,
+        que retorna os textos prontos para exibição (quando o banco é suportado)
+        :param banco: Alias do banco onde as consultas são executadas (ex: uma réplica de leitura); None usa o banco
+        padrão dos relatórios. Se o banco estiver indisponível ou atrasado, o banco principal pode ser usado no lugar
+        (ver roteamento.escolher_banco)
         """
         self._configuracao_consulta = configuracao_consulta
+        self._cache_resultados = cache_resultados
+        self._formatar_no_banco = formatar_no_banco
+        self._banco = banco
         self._mapa_saida = [] # para formatar o resultado final e manter a ordem
+        self._formatadores = [] # formatador de cada coluna, na ordem do _mapa_saida
+        self._saida_banco = None # (posições, formatadores) das colunas do resultado nas tuplas da última consulta montada
+        self._reescrita = None
+        self._otimizacao = None
 
         if configuracao_consulta:
             self._carregar_modelo()
@@ -205,6 +322,10 @@ class ConstrutorConsulta:
     @property
     def configuracao_consulta(self):
         return self._configuracao_consulta
+
+    def nova_instancia(self, configuracao_consulta: dict):
+        """Cria um novo construtor para outra consulta, com as mesmas opções deste (ex: cache de resultados)"""
+        return ConstrutorConsulta(configuracao_consulta, self._cache_resultados, self._formatar_no_banco, self._banco)
     
     @configuracao_consulta.setter
     def configuracao_consulta(self, configuracao_consulta: dict):
@@ -218,15 +339,27 @@ class ConstrutorConsulta:
         except LookupError:
             raise ValidationError(f"Modelo do Django não encontrado: {self._configuracao_consulta['app_model']}")
 
+        # consultas compatíveis são respondidas pela tabela de resumos pré-agregados, no lugar da tabela original
+        self._reescrita = obter_reescrita_resumo(self._configuracao_consulta)
+
+        if self._reescrita:
+            self._modelo_classe = self._reescrita.modelo
+
+        self._otimizacao = otimizar_consulta(self._modelo_classe, self._configuracao_consulta, self._traduzir_campo)
+
+    def _traduzir_campo(self, caminho_orm):
+        return self._reescrita.traduzir_campo(caminho_orm) if self._reescrita else caminho_orm
+
     def _processar_colunas(self):
         """Processa as colunas da configuração"""
         campos_truncados = {} # para campos com truncamento de data (.annotate)
         campos = []   # para o Group By (.values)
         metricas = {}    # para agregações (.annotate)
         colunas = self._configuracao_consulta.get('colunas', [])
+        self._mapa_saida.clear()
 
         for coluna in colunas:
-            caminho_orm = coluna['campo']
+            caminho_orm = self._traduzir_campo(coluna['campo'])
             tipo = coluna['tipo']
             rotulo = coluna.get('rotulo', coluna['campo'])
             nome_func_agregacao = coluna.get('agregacao')
@@ -236,8 +369,14 @@ class ConstrutorConsulta:
             if nome_func_agregacao:
                 func_agregacao = FUNCOES_DE_AGREGACAO[nome_func_agregacao]
                 
-                if nome_func_agregacao in ['min', 'max']:
-                    # as funções Min e Max não recebem o argumento 'distinct'
+                if self._reescrita:
+                    metricas[apelido] = self._reescrita.criar_metrica(nome_func_agregacao, coluna['campo'])
+                elif apelido in self._otimizacao.metricas_subconsulta:
+                    # agregação sobre uma relação inversa, sem a junção (ver otimizador.py)
+                    metricas[apelido] = criar_metrica_subconsulta(self._modelo_classe, nome_func_agregacao, caminho_orm)
+                elif nome_func_agregacao in ['min', 'max'] or apelido in self._otimizacao.metricas_sem_distinct:
+                    # as funções Min e Max não recebem o argumento 'distinct', que também é dispensado
+                    # quando cada registro aparece uma única vez em seu grupo (ver otimizador.py)
                     metricas[apelido] = func_agregacao(caminho_orm)
                 else: 
                     metricas[apelido] = func_agregacao(caminho_orm, distinct=True)
@@ -260,16 +399,21 @@ class ConstrutorConsulta:
                 'rotulo': rotulo,
                 'tipo': tipo
             })
+
+        # o formatador de cada coluna é escolhido uma única vez, e não a cada célula
+        self._formatadores = [criar_formatador(item_mapa['tipo']) for item_mapa in self._mapa_saida]
+        self._saida_banco = None
         
         return campos_truncados, campos, metricas
 
     def _construir_filtro(self):
         """Constrói o objeto Q para os filtros da consulta, combinando-os com AND"""
         lista_q = []
+        condicoes_subconsulta = {} # relação "para muitos" -> condições
         filtros = self._configuracao_consulta.get('filtros', [])
 
-        for filtro in filtros:
-            campo = filtro['campo']
+        for indice, filtro in enumerate(filtros):
+            campo = self._traduzir_campo(filtro['campo'])
             sufixo_operador = filtro['operador']
             valor = filtro['valor']
 
@@ -281,7 +425,16 @@ class ConstrutorConsulta:
             else:
                 consulta_orm = f"{campo}__{sufixo_operador}"
 
-            lista_q.append(Q(**{consulta_orm: valor}))
+            relacao = self._otimizacao.filtros_subconsulta.get(indice)
+
+            if relacao:
+                condicoes_subconsulta.setdefault(relacao, []).append((consulta_orm, valor))
+            else:
+                lista_q.append(Q(**{consulta_orm: valor}))
+
+        for relacao, condicoes in condicoes_subconsulta.items():
+            # sem a junção, a relação "para muitos" não multiplica as linhas da consulta principal
+            lista_q.append(criar_filtro_subconsulta(self._modelo_classe, relacao, condicoes))
         
         if lista_q:
             return reduce(operator.and_, lista_q)
@@ -293,7 +446,7 @@ class ConstrutorConsulta:
         ordenacao_final = []
         ordenacoes = self._configuracao_consulta.get('ordenacoes', [])
         for ordenacao in ordenacoes:
-            campo = ordenacao['campo']
+            campo = self._traduzir_campo(ordenacao['campo'])
             direcao = ordenacao.get('ordem', 'asc').lower()
             nome_funcao = ordenacao.get('agregacao') or ordenacao.get('truncamento')
             
@@ -308,11 +461,22 @@ class ConstrutorConsulta:
         
         return ordenacao_final
 
-    def _criar_queryset(self):
+    def _criar_queryset(self, aplicar_limite=True, tuplas=False):
         """
         Gera o objeto QuerySet do Django sem executar a consulta no banco.
+        :param aplicar_limite: Se False, o limite de registros da configuração é ignorado (ex: exportações)
+        :param tuplas: Se True, as linhas são retornadas como tuplas com os valores de _obter_chaves_selecao(); 
+        caso contrário, como dicionários
         """
-        queryset = self._modelo_classe.objects.all()
+        with medir_etapa('construcao_queryset'):
+            return self._montar_queryset(aplicar_limite, tuplas)
+
+    def _obter_queryset_inicial(self):
+        # o banco de cada leitura é escolhido pelo RoteadorRelatorios, a partir da dica
+        return self._modelo_classe.objects.db_manager(hints={DICA_BANCO: self._banco}).all()
+
+    def _montar_queryset(self, aplicar_limite, tuplas):
+        queryset = self._obter_queryset_inicial()
         # prepara as colunas
         campos_truncados, campos, metricas = self._processar_colunas()
         
@@ -341,11 +505,20 @@ class ConstrutorConsulta:
         # limpa o SELECT final para trazer apenas o solicitado
         chaves_selecao_final = list(campos_truncados.keys()) + campos + list(metricas.keys())
 
-        if chaves_selecao_final:
+        if tuplas:
+            selecao, anotacoes = self._planejar_selecao(queryset.db)
+
+            if anotacoes:
+                queryset = queryset.annotate(**anotacoes)
+
+            queryset = queryset.values_list(*selecao)
+        elif chaves_selecao_final and not (campos_agrupamento and self._otimizacao.ativa):
+            # com agrupamento, o .values() acima já limitou o SELECT aos campos agrupados e às métricas
             queryset = queryset.values(*chaves_selecao_final)
 
-        # remove resultados duplicados
-        queryset = queryset.distinct()
+        if self._otimizacao.usar_distinct:
+            # remove resultados duplicados
+            queryset = queryset.distinct()
         # ordenação
         ordenacao_final = self._construir_ordenacao()
         
@@ -353,8 +526,9 @@ class ConstrutorConsulta:
             queryset = queryset.order_by(*ordenacao_final)
 
         # limite 
-        limite = self._configuracao_consulta.get('limite')
-        queryset = queryset[:limite]
+        if aplicar_limite:
+            limite = self._configuracao_consulta.get('limite')
+            queryset = queryset[:limite]
 
         return queryset
     
@@ -386,107 +560,434 @@ class ConstrutorConsulta:
         else:
             return str(queryset.query)
 
+    def explicar(self):
+        """
+        Retorna o plano de execução da consulta (EXPLAIN QUERY PLAN no SQLite, EXPLAIN no PostgreSQL), 
+        com alertas de leituras completas de tabelas em colunas filtradas ou usadas em junções sem índice.
+        A consulta não é executada.
+        """
+        # consultas somente com agregações são analisadas com o mesmo QuerySet usado em get_sql();
+        # as junções e os filtros são os mesmos da consulta com .aggregate()
+        return analisar_queryset(self._criar_queryset())
+
     def executar(self):
         """
         Executa a consulta no banco de dados e formata o resultado.
+        Se houver um cache de resultados, o resultado armazenado é reaproveitado.
         """
+        if self._cache_resultados:
+            # o alias resolvido pelo roteador (inclusive o banco principal, no fallback) faz parte da chave
+            banco = self._obter_queryset_inicial().db
+            return self._cache_resultados.obter_ou_executar(self._configuracao_consulta, self._executar_no_banco, banco)
+        
+        return self._executar_no_banco()
+
+    def _executar_no_banco(self):
+        # nas views assíncronas, as consultas ainda não iniciadas de uma requisição cancelada não são executadas
+        verificar_cancelamento()
         tem_somente_agregacao = self._verificar_somente_agregacao()
+        # consultas somente com agregações são avaliadas pelo mesmo QuerySet usado em get_sql() e explicar()
+        queryset = self._criar_queryset(tuplas=not tem_somente_agregacao)
 
-        if tem_somente_agregacao:
-            queryset = self._modelo_classe.objects.all()
-            _, _, metricas = self._processar_colunas()
-            filtro = self._construir_filtro()
+        with medir_etapa('avaliacao_custo'):
+            avaliacao = avaliar_consulta(self._configuracao_consulta, queryset)
 
-            if filtro:
-                queryset = queryset.filter(filtro)
-            
-            dados = [queryset.aggregate(**metricas)]
-        else: 
-            dados = self._criar_queryset()
+        with proteger_execucao(avaliacao, queryset.db), medir_etapa('execucao_banco') as etapa:
+            if tem_somente_agregacao:
+                dados = [self._extrair_valores(self._executar_somente_agregacao())]
+            else: 
+                dados = list(queryset)
+
+            etapa.linhas = len(dados)
         
-        dados_formatados = []
+        with medir_etapa('formatacao') as etapa:
+            rotulos = [item_mapa['rotulo'] for item_mapa in self._mapa_saida]
+            resultado = ResultadoConsulta(rotulos, self._formatar_linhas(dados))
+            etapa.linhas = len(resultado)
 
-        for dado in dados:
-            nova_linha = {}
-            for item_mapa in self._mapa_saida:
-                valor = dado.get(item_mapa['chave_db'])
-                
-                # formatações visuais
-                if item_mapa['tipo'] == 'bool':
-                    valor = "Verdadeiro" if valor else "Falso"
-                elif item_mapa['tipo'] == 'date' and valor:
-                    valor = valor.strftime("%d/%m/%Y") if hasattr(valor, 'strftime') else valor
-                elif item_mapa['tipo'] == 'datetime' and valor:
-                    valor = valor.strftime("%d/%m/%Y %H:%M") if hasattr(valor, 'strftime') else valor
-                elif item_mapa['tipo'] == 'month' and valor:
-                    valor = valor.strftime("%m/%Y") if hasattr(valor, 'strftime') else valor
-                elif item_mapa['tipo'] == 'year' and valor:
-                    valor = valor.strftime("%Y") if hasattr(valor, 'strftime') else valor
-
-                nova_linha[item_mapa['rotulo']] = valor
-
-            dados_formatados.append(nova_linha)
+        return resultado
+
+    def _executar_somente_agregacao(self):
+        """Executa uma consulta que contém apenas agregações, retornando um único dicionário"""
+        queryset = self._obter_queryset_inicial()
+        _, _, metricas = self._processar_colunas()
+        filtro = self._construir_filtro()
+
+        if filtro:
+            queryset = queryset.filter(filtro)
+        
+        return queryset.aggregate(**metricas)
+
+    def _obter_chaves_selecao(self):
+        """Retorna as chaves selecionadas no banco, sem repetições, na ordem das colunas"""
+        return list(dict.fromkeys(item_mapa['chave_db'] for item_mapa in self._mapa_saida))
+
+    def _extrair_valores(self, dado):
+        """Converte uma linha do banco em dicionário para uma tupla com os valores de _obter_chaves_selecao()"""
+        return tuple(dado.get(chave_db) for chave_db in self._obter_chaves_selecao())
+
+    def _planejar_selecao(self, alias_banco):
+        """
+        Define as colunas selecionadas como tuplas e a posição, nas tuplas, do valor de cada coluna do resultado.
+        Com formatar_no_banco, datas e booleanos são selecionados já formatados e a coluna original só é mantida,
+        convertida em texto, quando a formatação perde informação (ex: segundos, nulos e falsos), para que o DISTINCT
+        não junte linhas diferentes.
+        :return: Tupla (nomes selecionados, anotações a serem criadas)
+        """
+        chaves = self._obter_chaves_selecao()
+        nomes_saida = [item_mapa['chave_db'] for item_mapa in self._mapa_saida]
+        formatadores = list(self._formatadores)
+        anotacoes = {}
+        selecao = chaves
+
+        if self._formatar_no_banco and suporta_formatacao_no_banco(connections[alias_banco].vendor):
+            formatadas = {}
+
+            for indice, item_mapa in enumerate(self._mapa_saida):
+                expressao = criar_expressao_formatacao(item_mapa['tipo'], item_mapa['chave_db'])
+
+                if expressao is not None:
+                    nomes_saida[indice] = f'_formatado_{indice}'
+                    anotacoes[nomes_saida[indice]] = expressao
+                    formatadores[indice] = None
+                    formatadas[item_mapa['chave_db']] = item_mapa['tipo']
+
+            selecao = []
+
+            for indice, chave_db in enumerate(chaves):
+                if chave_db not in formatadas:
+                    selecao.append(chave_db)
+                elif not formatacao_sem_perda(formatadas[chave_db]):
+                    # o texto é mais barato de converter em Python do que datas e horários
+                    anotacoes[f'_original_{indice}'] = Cast(chave_db, CharField())
+                    selecao.append(f'_original_{indice}')
+
+            selecao += [nome for nome in anotacoes if nome.startswith('_formatado_')]
+
+        self._saida_banco = ([selecao.index(nome) for nome in nomes_saida], formatadores)
+        return selecao, anotacoes
+
+    def _formatar_linhas(self, linhas):
+        """
+        Formata as linhas do banco, retornando uma tupla por linha. As linhas do banco são tuplas com os valores 
+        definidos por _planejar_selecao() ou, se a consulta não foi montada como tuplas, por _obter_chaves_selecao()
+        """
+        if self._saida_banco:
+            posicoes, formatadores = self._saida_banco
+        else:
+            chaves = self._obter_chaves_selecao()
+            posicoes = [chaves.index(item_mapa['chave_db']) for item_mapa in self._mapa_saida]
+            formatadores = self._formatadores
+
+        return formatar_colunas(linhas, formatadores, posicoes)
+
+    def obter_cabecalhos(self):
+        """Retorna os rótulos das colunas da consulta, na ordem em que aparecem no resultado"""
+        return [coluna.get('rotulo', coluna['campo']) for coluna in self._configuracao_consulta.get('colunas', [])]
+
+    def iterar(self, tamanho_bloco=2000):
+        """
+        Executa a consulta sem o limite de registros, buscando os dados no banco em blocos 
+        e retornando um iterador com uma tupla de valores formatados por vez. Usado em exportações.
+        O QuerySet é montado antes do retorno, então erros da consulta (ex: FieldError de um operador inválido) 
+        são lançados aqui, e não durante a resposta já iniciada.
+        """
+        if self._verificar_somente_agregacao():
+            # consultas somente com agregações retornam uma única linha
+            return self._formatar_linhas([self._extrair_valores(self._executar_somente_agregacao())])
+
+        queryset = self._criar_queryset(aplicar_limite=False, tuplas=True)
+        return self._iterar_blocos(queryset, tamanho_bloco)
+
+    def _iterar_blocos(self, queryset, tamanho_bloco):
+        linhas = queryset.iterator(chunk_size=tamanho_bloco)
+
+        # cada bloco lido do banco é formatado de uma só vez, coluna a coluna
+        while bloco := list(islice(linhas, tamanho_bloco)):
+            yield from self._formatar_linhas(bloco)
+
+    def paginar(self, cursor: str=None, tamanho: int=100):
+        """
+        Retorna uma página do resultado usando paginação por chave (keyset), sem OFFSET.
+        As chaves da página são as colunas das ordenações seguidas das demais colunas selecionadas, 
+        que servem de desempate: como a consulta usa DISTINCT, a combinação de todas as colunas é única 
+        e identifica cada linha, assim como a chave primária em uma consulta sem agrupamento.
+        :param cursor: Cursor retornado pela página anterior; None para a primeira página
+        :param tamanho: Quantidade de linhas da página (no máximo LIMITE_MAXIMO)
+        :return: Dicionário com os cabeçalhos, as linhas formatadas e o cursor da próxima página (None na última)
+        """
+        tamanho = max(1, min(int(tamanho), LIMITE_MAXIMO))
+
+        if self._verificar_somente_agregacao():
+            # consultas somente com agregações retornam uma única linha
+            return {
+                'cabecalhos': self.obter_cabecalhos(),
+                'linhas': [list(linha) for linha in self._formatar_linhas([self._extrair_valores(self._executar_somente_agregacao())])],
+                'proximo_cursor': None,
+            }
+
+        queryset = self._criar_queryset(aplicar_limite=False)
+        chaves = self._obter_chaves_paginacao()
+
+        # apelidos para as colunas comuns, de modo que o filtro do cursor reutilize as junções já feitas no SELECT
+        apelidos = {}
+        for indice, (chave_db, _) in enumerate(chaves):
+            if chave_db in queryset.query.annotations:
+                apelidos[chave_db] = chave_db
+            else:
+                apelidos[chave_db] = f'_chave_paginacao_{indice}'
+                queryset = queryset.alias(**{apelidos[chave_db]: F(chave_db)})
+
+        if cursor:
+            queryset = queryset.filter(self._construir_filtro_cursor(chaves, apelidos, self._decodificar_cursor(cursor, len(chaves))))
+
+        ordenacao = [
+            F(apelidos[chave_db]).desc(nulls_last=True) if descendente else F(apelidos[chave_db]).asc(nulls_first=True)
+            for chave_db, descendente in chaves
+        ]
+        # busca uma linha a mais para saber se existe uma próxima página
+        queryset = queryset.order_by(*ordenacao)[:tamanho + 1]
+
+        with proteger_execucao(avaliar_consulta(self._configuracao_consulta, queryset), queryset.db):
+            dados = list(queryset)
+        proximo_cursor = None
+
+        if len(dados) > tamanho:
+            dados = dados[:tamanho]
+            proximo_cursor = self._codificar_cursor([dados[-1][chave_db] for chave_db, _ in chaves])
+
+        return {
+            'cabecalhos': self.obter_cabecalhos(),
+            'linhas': [list(linha) for linha in self._formatar_linhas([self._extrair_valores(dado) for dado in dados])],
+            'proximo_cursor': proximo_cursor,
+        }
+
+    def _obter_chaves_paginacao(self):
+        """Retorna a lista de (chave_db, descendente) usada na paginação: as ordenações e, em seguida, as demais colunas"""
+        chaves_selecionadas = [item_mapa['chave_db'] for item_mapa in self._mapa_saida]
+        chaves = []
+
+        for ordenacao in self._construir_ordenacao():
+            descendente = ordenacao.startswith('-')
+            chave_db = ordenacao.lstrip('-')
+
+            if chave_db not in chaves_selecionadas:
+                raise ValidationError(f"A ordenação por '{chave_db}' exige que o campo também esteja entre as colunas da consulta para paginar o resultado.")
+            
+            if chave_db not in [chave for chave, _ in chaves]:
+                chaves.append((chave_db, descendente))
+
+        for chave_db in chaves_selecionadas:
+            if chave_db not in [chave for chave, _ in chaves]:
+                chaves.append((chave_db, False))
+
+        return chaves
+
+    def _construir_filtro_cursor(self, chaves, apelidos, valores):
+        """
+        Constrói o objeto Q que seleciona as linhas posteriores ao cursor:
+        (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+        Os valores nulos vêm primeiro nas ordenações crescentes e por último nas decrescentes.
+        """
+        condicoes = []
+        iguais = Q()
+
+        for (chave_db, descendente), valor in zip(chaves, valores):
+            apelido = apelidos[chave_db]
+
+            if valor is None:
+                # depois de um nulo, apenas valores não nulos (crescente) ou nada (decrescente, nulos no final)
+                posterior = None if descendente else Q(**{f'{apelido}__isnull': False})
+                igual = Q(**{f'{apelido}__isnull': True})
+            elif descendente:
+                posterior = Q(**{f'{apelido}__lt': valor}) | Q(**{f'{apelido}__isnull': True})
+                igual = Q(**{apelido: valor})
+            else:
+                posterior = Q(**{f'{apelido}__gt': valor})
+                igual = Q(**{apelido: valor})
+
+            if posterior is not None:
+                condicoes.append(iguais & posterior)
             
-        return dados_formatados
+            iguais &= igual
+
+        if not condicoes:
+            # o cursor aponta para a última linha possível
+            return Q(pk__in=[])
+
+        return reduce(operator.or_, condicoes)
+
+    @staticmethod
+    def _codificar_cursor(valores):
+        # os valores sem representação no JSON são gravados sem perda (ex: datas com microssegundos), como [tipo, texto];
+        # os valores das chaves nunca são listas, então uma lista no cursor é sempre um valor codificado
+        codificados = []
+
+        for valor in valores:
+            tipo = next((nome for nome, (classe, _) in TIPOS_CURSOR.items() if isinstance(valor, classe)), None)
+            codificados.append([tipo, str(valor) if tipo in ('decimal', 'uuid') else valor.isoformat()] if tipo else valor)
+
+        conteudo = json.dumps(codificados, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return urlsafe_b64encode(conteudo.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _decodificar_cursor(cursor, quantidade_chaves):
+        try:
+            valores = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+
+            if not isinstance(valores, list) or len(valores) != quantidade_chaves:
+                raise ValueError
+
+            return [
+                TIPOS_CURSOR[valor[0]][1](valor[1]) if isinstance(valor, list) else valor
+                for valor in valores
+            ]
+        except (binascii.Error, ValueError, KeyError, IndexError, TypeError, ArithmeticError):
+            raise ValidationError("Cursor de paginação inválido.")
+
+
+class TempoLimiteExcedido(Exception):
+    """Lançada quando as consultas de um relatório não terminam dentro do tempo limite"""
+    pass
+
+
+class PlanoRelatorio:
+    def __init__(self, esqueleto: EsqueletoHTML, configuracoes: list):
+        """ Resultado da análise e validação do HTML de um relatório, reaproveitável em várias renderizações.
+        :param esqueleto: Esqueleto do HTML final, com as lacunas das tabelas
+        :param configuracoes: Configurações de consulta já validadas, na mesma ordem das tabelas do esqueleto
+        """
+        self.esqueleto = esqueleto
+        self.configuracoes = configuracoes
+
+    @classmethod
+    def compilar(cls, html_inicial: str, caminho_template: str, validador_consulta: ValidadorConsulta):
+        with medir_etapa('analise_html'):
+            template = render_to_string(caminho_template)
+            documento = BeautifulSoup(template, 'html.parser')
+            html_inicial = BeautifulSoup(html_inicial, 'html.parser')
+            documento.body.append(html_inicial) # insere o HTML parcial dentro do corpo do template base
+            # localiza as tabelas a serem preenchidas uma única vez, separando o HTML em trechos prontos
+            esqueleto = EsqueletoHTML(documento)
+        configuracoes = []
+
+        for dados_consulta_str in esqueleto.configuracoes:
+            # a configuração de consulta do atributo data-config-consulta é uma string JSON
+            dados_consulta = json.loads(dados_consulta_str)
+            # valida a consulta e obtém a configuração pronta para execução
+            configuracoes.append(validador_consulta.validar(dados_consulta))
+        
+        return cls(esqueleto, configuracoes)
 
 
 class ConstrutorHTML:
-    def __init__(self, html_inicial: str, caminho_template: str, validador_consulta: ValidadorConsulta, construtor_consulta: ConstrutorConsulta):
+    def __init__(self, html_inicial: str, caminho_template: str, validador_consulta: ValidadorConsulta, construtor_consulta: ConstrutorConsulta, max_trabalhadores: int=None, tempo_limite: float=None, plano: PlanoRelatorio=None):
         """ Classe para construir o HTML final do relatório dinâmico.
         :param html_inicial: HTML parcial contendo os componentes do documento, incluindo as tabelas a serem preenchidas
         :param caminho_template: Caminho do template base do relatório, dentro do qual o HTML parcial será inserido
         :param validador_consulta: Instância de ValidadorConsulta para validar as configurações de consulta encontradas no HTML
         :param construtor_consulta: Instância de ConstrutorConsulta para executar as consultas encontradas no HTML e obter os dados para preenchimento
+        :param max_trabalhadores: Número máximo de consultas executadas ao mesmo tempo; com 1, as consultas são executadas em sequência
+        :param tempo_limite: Tempo máximo, em segundos, para a execução de todas as consultas do relatório, contado a partir
+        do início da primeira delas; a espera por uma thread livre do executor compartilhado também é limitada a esse tempo
+        :param plano: Plano já compilado do relatório; se informado, o HTML não é analisado nem validado novamente
         """
-        template = render_to_string(caminho_template)
-        self._html = BeautifulSoup(template, 'html.parser')
-        html_inicial = BeautifulSoup(html_inicial, 'html.parser')
-        self._html.body.append(html_inicial) # insere o HTML parcial dentro do corpo do template base
-        self._validador_consulta = validador_consulta
+        # todas as consultas são validadas antes que qualquer uma delas seja executada
+        self._plano = plano or PlanoRelatorio.compilar(html_inicial, caminho_template, validador_consulta)
         self._construtor_consulta = construtor_consulta
+        configuracao = obter_configuracao('CONSULTAS_PARALELAS')
+        self._max_trabalhadores = max_trabalhadores or configuracao['MAX_TRABALHADORES']
+        self._tempo_limite = tempo_limite or configuracao['TEMPO_LIMITE']
 
-    def gerar_html(self):
-        self._inserir_dados_no_html()
-
-        return str(self._html)
+    @classmethod
+    def a_partir_do_plano(cls, plano: PlanoRelatorio, construtor_consulta: ConstrutorConsulta, **kwargs):
+        return cls(None, None, None, construtor_consulta, plano=plano, **kwargs)
 
-    def _inserir_dados_no_html(self):
-        # encontra todas as tabelas que possuem o atributo data-config-consulta, que indica que devem ser preenchidas dinamicamente
-        tabelas = self._html.find_all(attrs={'data-config-consulta': True})
-
-        for tab in tabelas:
-            # extrai a configuração de consulta do atributo data-config-consulta, que é uma string JSON
-            dados_consulta_str = tab['data-config-consulta']
-            dados_consulta = json.loads(dados_consulta_str)
-            # valida a consulta e obtém a configuração pronta para execução
-            config_consulta_valida = self._validador_consulta.validar(dados_consulta)
-            self._construtor_consulta.configuracao_consulta = config_consulta_valida
-            # retorna uma lista de dicionários: [{'Nome': 'João', 'Idade': 30}, ...]
-            dados = self._construtor_consulta.executar()
-            
-            if dados:
-                self._preencher_tabela(tab, dados)
+    def gerar_html(self):
+        return ''.join(self.gerar_html_em_partes())
 
-            # remove o atributo de dados para limpar o HTML final
-            del tab['data-config-consulta']
+    def gerar_html_em_partes(self):
+        """Executa as consultas e gera o HTML final em partes (strings)"""
+        with medir_etapa('consultas') as etapa:
+            resultados = self._executar_consultas(self._plano.configuracoes)
+            etapa.linhas = sum(len(resultado) for resultado in resultados)
 
-    def _preencher_tabela(self, tabela, lista_dados):
-        cabecalhos = lista_dados[0].keys()
-        ths = tabela.find_all('th')
-        
-        for th, cabecalho in zip(ths, cabecalhos):
-            th.string = cabecalho
+        with medir_etapa('montagem_html'):
+            yield from self._plano.esqueleto.renderizar(resultados)
 
-        tbody = tabela.tbody
-        tbody.clear()
+    def _executar_consultas(self, configuracoes):
+        """
+        Executa as consultas e retorna uma lista de resultados, na mesma ordem das configurações.
+        Cada resultado é um ResultadoConsulta, com os rótulos das colunas e as linhas formatadas (tuplas)
+        """
+        if self._max_trabalhadores <= 1 or len(configuracoes) <= 1:
+            resultados = []
 
-        for linha in lista_dados:
-            linha_tabela = self._html.new_tag('tr')
+            for config_consulta_valida in configuracoes:
+                self._construtor_consulta.configuracao_consulta = config_consulta_valida
+                resultados.append(self._construtor_consulta.executar())
             
-            for valor in linha.values():
-                td = self._html.new_tag('td')
-                td.string = str(valor) if valor is not None else "-"
-                linha_tabela.append(td)
-
-            tbody.append(linha_tabela)
-
+            return resultados
+        
+        executor = obter_executor_consultas(self._max_trabalhadores)
+        # avisa as consultas do relatório quando ele excede o tempo limite ou a requisição é cancelada
+        cancelamento = Event()
+        inicios = [] # instantes em que as consultas começaram a ser executadas
+        # cada consulta recebe seu próprio construtor, e cada thread usa sua própria conexão com o BD
+        # cada thread recebe uma cópia do contexto atual, para que a medição da requisição inclua suas etapas
+        futuros = [
+            executor.submit(copiar_contexto_cancelavel(cancelamento).run, self._executar_em_thread, config, inicios)
+            for config in configuracoes
+        ]
+        # o executor é compartilhado pelas requisições do processo: o tempo na fila, atrás das consultas de outros 
+        # relatórios, não conta para o tempo limite, que começa com a primeira consulta do relatório
+        prazo_espera = monotonic() + self._tempo_limite
+        pendentes = futuros
+
+        while pendentes and not cancelamento_solicitado():
+            prazo = inicios[0] + self._tempo_limite if inicios else prazo_espera
+            restante = prazo - monotonic()
+
+            if restante <= 0:
+                break
+
+            _, pendentes = wait(pendentes, timeout=min(restante, INTERVALO_VERIFICACAO_CONSULTAS))
+
+        if pendentes:
+            # as consultas que não começaram são canceladas e as que estão em execução são interrompidas (no SQLite), 
+            # liberando as threads compartilhadas
+            cancelamento.set()
+
+            for futuro in pendentes:
+                futuro.cancel()
+
+            verificar_cancelamento()
+            raise TempoLimiteExcedido(
+                f"As consultas do relatório não terminaram em {self._tempo_limite} segundos."
+            )
+        
+        return [futuro.result() for futuro in futuros]
+
+    def _executar_em_thread(self, configuracao_consulta, inicios):
+        inicios.append(monotonic())
+        # as threads do executor são reaproveitadas entre os relatórios, assim como suas conexões com o BD: 
+        # antes e depois de cada consulta, fecha apenas as conexões com erro ou mais antigas que CONN_MAX_AGE 
+        # (com CONN_MAX_AGE = 0, todas; com o pool do PostgreSQL, a conexão é devolvida ao pool)
+        close_old_connections()
+        try:
+            return self._construtor_consulta.nova_instancia(configuracao_consulta).executar()
+        finally:
+            close_old_connections()
+
+
+@lru_cache(maxsize=None)
+def obter_executor_consultas(max_trabalhadores):
+    """
+    Retorna o executor das consultas paralelas dos relatórios, compartilhado pelas requisições do processo. 
+    Suas threads, e as conexões abertas por elas, são mantidas entre as requisições. max_trabalhadores é o limite 
+    de consultas paralelas simultâneas do processo, somadas as de todos os relatórios em andamento
+    """
+    return ThreadPoolExecutor(max_workers=max_trabalhadores, thread_name_prefix='consulta-relatorio')
+
+# as threads não são copiadas para os processos filhos (ex: pool de renderização dos PDFs), que criam seus próprios executores
+os.register_at_fork(after_in_child=obter_executor_consultas.cache_clear)
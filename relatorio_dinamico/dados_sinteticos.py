@@ -0,0 +1,186 @@
+"""
+Geração de dados sintéticos para testes de desempenho do motor de relatórios.
+
+Os registros (bases, setores, unidades, pessoas, chamados, trâmites, atendimentos e unidades dos chamados) seguem
+as relações do esquema_bd e são criados em lotes com bulk_create, de forma determinística a partir de uma semente.
+Todos pertencem ao usuário USUARIO_SINTETICO, o que permite removê-los com limpar_dados_sinteticos().
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+from random import Random
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from base.models import Base
+from setor.models import Setor
+from unidade.models import Unidade
+from pessoa.models import Pessoa
+from chamado.models import Chamado, TramiteChamado, AtendimentoPessoa, UnidadeChamado
+from .configuracoes import obter_configuracao
+from .resumos import atualizar_resumos
+
+USUARIO_SINTETICO = 'dados_sinteticos'
+
+CIDADES = {
+    'Natal': ['Centro', 'Alecrim', 'Tirol', 'Lagoa Nova', 'Ponta Negra', 'Petrópolis', 'Candelária', 'Igapó'],
+    'Mossoró': ['Centro', 'Abolição', 'Nova Betânia', 'Santo Antônio'],
+    'Parnamirim': ['Centro', 'Nova Parnamirim', 'Cohabinal'],
+    'Caicó': ['Centro', 'Paraíba', 'Penedo'],
+    'Macaíba': ['Centro', 'Campo das Mangueiras'],
+}
+STATUS = ['PENDENTE', 'EM_ANDAMENTO', 'FINALIZADO', 'FINALIZADO', 'FINALIZADO', 'CANCELADO']
+MOTIVOS = ['Queda', 'Acidente de trânsito', 'Mal súbito', 'Agressão', 'Queimadura', 'Parto', 'Intoxicação']
+GRAVIDADES = ['Baixa', 'Média', 'Alta', 'Crítica']
+RISCOS = ['Vermelho', 'Laranja', 'Amarelo', 'Verde', 'Azul']
+DESTINOS = ['Hospital Walfredo Gurgel', 'UPA', 'Liberado no local', 'Hospital Regional']
+NOMES = ['Ana', 'João', 'Maria', 'José', 'Francisca', 'Antônio', 'Joana', 'Paulo', 'Luiza', 'Pedro']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Rodrigues']
+
+
+@contextmanager
+def _sem_auto_now_add(*modelos):
+    """Permite definir criado_em nos objetos criados com bulk_create (auto_now_add sobrescreveria o valor)"""
+    campos = [campo for modelo in modelos for campo in modelo._meta.concrete_fields if getattr(campo, 'auto_now_add', False)]
+
+    for campo in campos:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo in campos:
+            campo.auto_now_add = True
+
+def gerar_dados_sinteticos(num_chamados, dias=365, semente=42, tamanho_lote=5000, progresso=None):
+    """
+    Gera num_chamados chamados, com em média 3 trâmites, 1,5 atendimento e 1 unidade cada, e uma pessoa para cada dois chamados.
+    :param dias: Os chamados são distribuídos ao longo dos últimos N dias
+    :param progresso: Função opcional chamada com (chamados gerados, total) após cada lote
+    :return: Dicionário com a quantidade de registros criados por modelo
+    """
+    aleatorio = Random(semente)
+    agora = timezone.now()
+    usuario, _ = User.objects.get_or_create(username=USUARIO_SINTETICO)
+    contagem = {}
+
+    def contar(modelo, objetos):
+        contagem[modelo.__name__] = contagem.get(modelo.__name__, 0) + len(objetos)
+        return objetos
+
+    with transaction.atomic():
+        bases = contar(Base, Base.objects.bulk_create(
+            Base(nome=f'Base {cidade}', cidade=cidade, uf='RN', criado_por=usuario) for cidade in CIDADES
+        ))
+        # Setor herda de Group (herança multi-tabela), que não é suportada pelo bulk_create
+        sufixo = Setor.objects.filter(criado_por=usuario).count()
+        setores = contar(Setor, [
+            Setor.objects.create(name=f'{nome} {base.cidade} {sufixo}', base=base, criado_por=usuario)
+            for base in bases for nome in ('Regulação', 'Despacho', 'Atendimento')
+        ])
+        unidades = contar(Unidade, Unidade.objects.bulk_create(
+            Unidade(nome=f'USA {base.cidade} {i}', base=base, tipo=aleatorio.choice(['USA', 'USB']), criado_por=usuario)
+            for base in bases for i in range(4)
+        ))
+
+    pessoas = []
+    for inicio in range(0, max(1, num_chamados // 2), tamanho_lote):
+        quantidade = min(tamanho_lote, max(1, num_chamados // 2) - inicio)
+        with transaction.atomic():
+            pessoas.extend(pessoa.id for pessoa in contar(Pessoa, Pessoa.objects.bulk_create(
+                _criar_pessoa(aleatorio, usuario, bases) for _ in range(quantidade)
+            )))
+
+    with _sem_auto_now_add(Chamado, TramiteChamado):
+        for inicio in range(0, num_chamados, tamanho_lote):
+            quantidade = min(tamanho_lote, num_chamados - inicio)
+
+            with transaction.atomic():
+                chamados = contar(Chamado, Chamado.objects.bulk_create(
+                    _criar_chamado(aleatorio, usuario, bases, pessoas, agora - timedelta(minutes=aleatorio.randrange(dias * 24 * 60)))
+                    for _ in range(quantidade)
+                ))
+                contar(TramiteChamado, TramiteChamado.objects.bulk_create(
+                    _criar_tramites(aleatorio, usuario, setores, chamados), batch_size=tamanho_lote
+                ))
+                contar(AtendimentoPessoa, AtendimentoPessoa.objects.bulk_create(
+                    _criar_atendimentos(aleatorio, pessoas, chamados), batch_size=tamanho_lote
+                ))
+                contar(UnidadeChamado, UnidadeChamado.objects.bulk_create(
+                    (UnidadeChamado(chamado=chamado, unidade=aleatorio.choice(unidades), alocado_por=usuario, status='FINALIZADO') for chamado in chamados),
+                    batch_size=tamanho_lote
+                ))
+
+            if progresso:
+                progresso(inicio + quantidade, num_chamados)
+
+    # bulk_create não dispara sinais: os resumos pré-agregados são recalculados uma única vez no final
+    if obter_configuracao('RESUMOS')['ATIVO']:
+        atualizar_resumos()
+
+    return contagem
+
+def _criar_pessoa(aleatorio, usuario, bases):
+    return Pessoa(
+        nome=f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}',
+        dataNascimentoReal=timezone.localdate() - timedelta(days=aleatorio.randrange(365, 90 * 365)),
+        sexo=aleatorio.choice(['M', 'F']),
+        cidade=aleatorio.choice(list(CIDADES)),
+        uf='RN',
+        base_cadastro=aleatorio.choice(bases),
+        criado_por=usuario,
+    )
+
+def _criar_chamado(aleatorio, usuario, bases, pessoas, criado_em):
+    base = aleatorio.choice(bases)
+    # a maioria dos chamados é atendida na cidade da própria base
+    cidade = base.cidade if aleatorio.random() < 0.8 else aleatorio.choice(list(CIDADES))
+    status = aleatorio.choice(STATUS)
+
+    return Chamado(
+        base=base,
+        pessoa_id=aleatorio.choice(pessoas) if pessoas and aleatorio.random() < 0.7 else None,
+        uf='RN',
+        cidade=cidade,
+        bairro=aleatorio.choice(CIDADES[cidade]),
+        status=status,
+        motivo=aleatorio.choice(MOTIVOS),
+        gravidade=aleatorio.choice(GRAVIDADES),
+        numero_vitimas=aleatorio.choices([0, 1, 2, 3, 5], weights=[10, 60, 20, 7, 3])[0],
+        incidente=aleatorio.choice(['Sim', 'Não', None]),
+        criado_em=criado_em,
+        criado_por=usuario,
+        finalizado_em=criado_em + timedelta(minutes=aleatorio.randrange(20, 240)) if status == 'FINALIZADO' else None,
+    )
+
+def _criar_tramites(aleatorio, usuario, setores, chamados):
+    for chamado in chamados:
+        criado_em = chamado.criado_em
+        for _ in range(aleatorio.randint(1, 5)):
+            criado_em += timedelta(minutes=aleatorio.randrange(1, 60))
+            yield TramiteChamado(
+                chamado=chamado, criado_por=usuario, setor_origem=aleatorio.choice(setores),
+                setor_destino=aleatorio.choice(setores), criado_em=criado_em,
+            )
+
+def _criar_atendimentos(aleatorio, pessoas, chamados):
+    for chamado in chamados:
+        for _ in range(aleatorio.choices([0, 1, 2, 3], weights=[10, 50, 30, 10])[0]):
+            yield AtendimentoPessoa(
+                chamado=chamado,
+                pessoa_id=aleatorio.choice(pessoas) if pessoas else None,
+                risco=aleatorio.choice(RISCOS),
+                queixa=aleatorio.choice(MOTIVOS),
+                destinoPaciente=aleatorio.choice(DESTINOS),
+                glasgow=str(aleatorio.randint(3, 15)),
+                lesaoTraumatica=aleatorio.random() < 0.3,
+                finalizado=chamado.status == 'FINALIZADO',
+            )
+
+def limpar_dados_sinteticos():
+    """Remove todos os registros criados por gerar_dados_sinteticos"""
+    with transaction.atomic():
+        Pessoa.objects.filter(criado_por__username=USUARIO_SINTETICO).delete()
+        # a exclusão do usuário remove, em cascata, as bases e, com elas, chamados, setores e unidades
+        User.objects.filter(username=USUARIO_SINTETICO).delete()
+
+    if obter_configuracao('RESUMOS')['ATIVO']:
+        atualizar_resumos()
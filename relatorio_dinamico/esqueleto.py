@@ -0,0 +1,128 @@
+"""
+Esqueleto do HTML de um relatório.
+
+O documento é analisado (BeautifulSoup) uma única vez para localizar as tabelas que devem ser preenchidas.
+Cada tabela é convertida em trechos de HTML já prontos, com lacunas para os cabeçalhos e para as linhas,
+de modo que o preenchimento com os dados é feito apenas concatenando strings, sem criar um objeto por célula.
+O HTML final é idêntico ao obtido preenchendo as tabelas diretamente com o BeautifulSoup.
+"""
+from html import escape
+from uuid import uuid4
+import re
+
+# quantidade de linhas de uma tabela agrupadas em cada parte retornada durante a renderização
+LINHAS_POR_PARTE = 500
+
+LACUNA_LINHAS = 'linhas'
+
+def _escapar(texto):
+    # mesmo escape do formatador padrão ("minimal") do BeautifulSoup: apenas &, < e >
+    return escape(texto, quote=False)
+
+def _dividir(html, padrao):
+    """Divide o HTML nos marcadores; retorna os trechos literais e os identificadores das lacunas entre eles"""
+    pedacos = padrao.split(html)
+    return pedacos[0::2], pedacos[1::2]
+
+
+class TabelaEsqueleto:
+    def __init__(self, configuracao, vazia, trechos, lacunas, ths_originais):
+        """
+        :param configuracao: Configuração de consulta da tabela (string JSON do atributo data-config-consulta)
+        :param vazia: HTML da tabela, usado quando a consulta não retorna dados
+        :param trechos: Trechos literais do HTML da tabela preenchida
+        :param lacunas: Identificadores das lacunas entre os trechos ('linhas' ou o índice de um <th>)
+        :param ths_originais: Conteúdo original de cada <th>, mantido quando não há cabeçalho correspondente
+        """
+        self.configuracao = configuracao
+        self.vazia = vazia
+        self.trechos = trechos
+        self.lacunas = lacunas
+        self.ths_originais = ths_originais
+
+    def renderizar(self, lista_dados):
+        """
+        Gera o HTML da tabela em partes.
+        :param lista_dados: ResultadoConsulta, com os rótulos das colunas e as linhas (tuplas de valores)
+        """
+        if not lista_dados:
+            yield self.vazia
+            return
+
+        cabecalhos = lista_dados.cabecalhos
+        yield self.trechos[0]
+
+        for lacuna, trecho in zip(self.lacunas, self.trechos[1:]):
+            if lacuna == LACUNA_LINHAS:
+                yield from self._renderizar_linhas(lista_dados)
+            else:
+                indice = int(lacuna)
+                yield _escapar(cabecalhos[indice]) if indice < len(cabecalhos) else self.ths_originais[indice]
+
+            yield trecho
+
+    def _renderizar_linhas(self, lista_dados):
+        linhas = lista_dados.linhas
+
+        for inicio in range(0, len(linhas), LINHAS_POR_PARTE):
+            yield ''.join(
+                '<tr>' + ''.join(
+                    '<td>' + (_escapar(str(valor)) if valor is not None else '-') + '</td>'
+                    for valor in linha
+                ) + '</tr>'
+                for linha in linhas[inicio:inicio + LINHAS_POR_PARTE]
+            )
+
+
+class EsqueletoHTML:
+    def __init__(self, documento):
+        """
+        Extrai do documento as tabelas que possuem o atributo data-config-consulta.
+        O documento (objeto BeautifulSoup) é modificado durante a extração e não deve ser reutilizado.
+        """
+        marcador = uuid4().hex
+        padrao = re.compile(f'{marcador}:([^:]+):')
+        self.tabelas = []
+
+        for indice, tab in enumerate(documento.find_all(attrs={'data-config-consulta': True})):
+            self.tabelas.append(self._extrair_tabela(documento, tab, marcador, padrao))
+            tab.replace_with(f'{marcador}:{indice}:')
+
+        self.trechos, self.lacunas = _dividir(str(documento), padrao)
+
+    def _extrair_tabela(self, documento, tab, marcador, padrao):
+        configuracao = tab['data-config-consulta']
+        # remove o atributo de dados para limpar o HTML final
+        del tab['data-config-consulta']
+        vazia = str(tab)
+
+        ths = tab.find_all('th')
+        ths_originais = [th.decode_contents() for th in ths]
+
+        for indice, th in enumerate(ths):
+            th.string = f'{marcador}:{indice}:'
+
+        if tab.tbody is None:
+            tab.append(documento.new_tag('tbody'))
+
+        tab.tbody.clear()
+        tab.tbody.append(f'{marcador}:{LACUNA_LINHAS}:')
+        trechos, lacunas = _dividir(str(tab), padrao)
+
+        return TabelaEsqueleto(configuracao, vazia, trechos, lacunas, ths_originais)
+
+    @property
+    def configuracoes(self):
+        return [tabela.configuracao for tabela in self.tabelas]
+
+    def renderizar(self, resultados):
+        """
+        Gera o HTML final em partes.
+        :param resultados: Lista com os dados de cada tabela, na mesma ordem de self.tabelas
+        """
+        yield self.trechos[0]
+
+        for lacuna, trecho in zip(self.lacunas, self.trechos[1:]):
+            indice = int(lacuna)
+            yield from self.tabelas[indice].renderizar(resultados[indice])
+            yield trecho
@@ -0,0 +1,221 @@
+"""
+Formatação visual dos resultados das consultas.
+
+Os formatadores são escolhidos uma única vez por coluna, a partir do tipo de exibição, e aplicados de uma só vez
+a todos os valores da coluna, sem verificar o tipo de cada célula. Colunas com poucos valores diferentes
+(booleanos, datas e truncamentos de data) formatam cada valor distinto uma única vez.
+As linhas formatadas são tuplas, na ordem das colunas.
+
+Opcionalmente, a mesma formatação pode ser feita pelo próprio banco (criar_expressao_formatacao), que então
+retorna os textos prontos: datas com STRFTIME/TO_CHAR/DATE_FORMAT e booleanos com CASE WHEN.
+"""
+from datetime import datetime
+from operator import itemgetter
+from django.db.models import Func, Case, When, Value, F, CharField, TextField, BooleanField, IntegerField, FloatField, DecimalField
+from django.db.models.lookups import Exact, IsNull
+from django.db import NotSupportedError
+
+FORMATOS_DATA = {
+    'date': "%d/%m/%Y",
+    'datetime': "%d/%m/%Y %H:%M",
+    'month': "%m/%Y",
+    'year': "%Y",
+}
+
+def _formatar_bool(valor):
+    return "Verdadeiro" if valor else "Falso"
+
+def _criar_formatador_data(formato):
+    def formatar(valor):
+        return valor.strftime(formato) if valor and hasattr(valor, 'strftime') else valor
+
+    return formatar
+
+def _formatar_data_hora(valor, _formatar=_criar_formatador_data(FORMATOS_DATA['datetime'])):
+    # equivalente ao strftime("%d/%m/%Y %H:%M"), porém mais rápido
+    if isinstance(valor, datetime):
+        return f'{valor.day:02d}/{valor.month:02d}/{valor.year} {valor.hour:02d}:{valor.minute:02d}'
+    return _formatar(valor)
+
+def _por_valor(funcao):
+    def formatar(coluna):
+        return map(funcao, coluna)
+
+    return formatar
+
+def _por_valor_distinto(funcao):
+    def formatar(coluna):
+        try:
+            formatados = {valor: funcao(valor) for valor in set(coluna)}
+        except TypeError:
+            # valores que não podem ser chaves de dicionário
+            return map(funcao, coluna)
+
+        return map(formatados.__getitem__, coluna)
+
+    return formatar
+
+def criar_formatador(tipo):
+    """
+    Retorna a função que formata uma coluna inteira do tipo informado (recebe a sequência de valores e retorna 
+    um iterável com os valores formatados), ou None se os valores são exibidos como estão.
+    """
+    if tipo == 'bool':
+        return _por_valor_distinto(_formatar_bool)
+    if tipo == 'datetime':
+        return _por_valor(_formatar_data_hora)
+    if tipo in FORMATOS_DATA:
+        return _por_valor_distinto(_criar_formatador_data(FORMATOS_DATA[tipo]))
+
+    return None
+
+def formatar_colunas(linhas, formatadores, posicoes=None):
+    """
+    Formata as linhas coluna a coluna.
+    :param linhas: Lista de tuplas com os valores do banco
+    :param formatadores: Formatador de cada coluna do resultado (None para manter os valores)
+    :param posicoes: Posição, nas tuplas do banco, do valor de cada coluna do resultado (padrão: a mesma ordem)
+    :return: Lista de tuplas com os valores formatados, na ordem das colunas do resultado
+    """
+    if not linhas:
+        return []
+
+    if posicoes is None:
+        posicoes = range(len(formatadores))
+
+    if not any(formatadores):
+        # nenhuma coluna precisa ser formatada (ex: já formatadas pelo banco); apenas seleciona os valores
+        posicoes = list(posicoes)
+
+        if posicoes == list(range(len(linhas[0]))):
+            return list(linhas)
+        if len(posicoes) == 1:
+            return [(linha[posicoes[0]],) for linha in linhas]
+        return list(map(itemgetter(*posicoes), linhas))
+
+    colunas = list(zip(*linhas))
+
+    return list(zip(*(
+        formatador(colunas[posicao]) if formatador else colunas[posicao]
+        for formatador, posicao in zip(formatadores, posicoes)
+    )))
+
+
+class FormatarData(Func):
+    """Converte uma data no texto exibido nos relatórios, no próprio banco"""
+    output_field = CharField()
+    # formatos equivalentes aos de FORMATOS_DATA, para cada banco suportado
+    FORMATOS = {
+        'sqlite': {'date': "%d/%m/%Y", 'datetime': "%d/%m/%Y %H:%M", 'month': "%m/%Y", 'year': "%Y"},
+        'postgresql': {'date': "DD/MM/YYYY", 'datetime': "DD/MM/YYYY HH24:MI", 'month': "MM/YYYY", 'year': "YYYY"},
+        'oracle': {'date': "DD/MM/YYYY", 'datetime': "DD/MM/YYYY HH24:MI", 'month': "MM/YYYY", 'year': "YYYY"},
+        'mysql': {'date': "%d/%m/%Y", 'datetime': "%d/%m/%Y %H:%i", 'month': "%m/%Y", 'year': "%Y"},
+    }
+
+    def __init__(self, expressao, tipo, **extra):
+        self.tipo = tipo
+        super().__init__(expressao, **extra)
+
+    def as_sql(self, compiler, connection, **extra):
+        raise NotSupportedError(f"A formatação de datas no banco não é suportada pelo banco '{connection.vendor}'.")
+
+    def _compilar(self, compiler, connection, funcao, formato_primeiro=False):
+        sql, params = compiler.compile(self.get_source_expressions()[0])
+        formato = self.FORMATOS[connection.vendor][self.tipo]
+
+        if formato_primeiro:
+            return f'{funcao}(%s, {sql})', [formato, *params]
+        return f'{funcao}({sql}, %s)', [*params, formato]
+
+    def as_sqlite(self, compiler, connection, **extra):
+        return self._compilar(compiler, connection, 'STRFTIME', formato_primeiro=True)
+
+    def as_postgresql(self, compiler, connection, **extra):
+        return self._compilar(compiler, connection, 'TO_CHAR')
+
+    def as_oracle(self, compiler, connection, **extra):
+        return self._compilar(compiler, connection, 'TO_CHAR')
+
+    def as_mysql(self, compiler, connection, **extra):
+        return self._compilar(compiler, connection, 'DATE_FORMAT')
+
+class RotuloBooleano(Func):
+    """
+    "Verdadeiro" ou "Falso", calculado no banco com o mesmo critério do Python: 
+    nulos, False, 0 e textos vazios são falsos (o esquema_bd pode tratar colunas de texto como 'bool')
+    """
+    output_field = CharField()
+
+    def resolve_expression(self, *args, **kwargs):
+        expressao = self.get_source_expressions()[0].resolve_expression(*args, **kwargs)
+        campo = expressao.output_field
+
+        if isinstance(campo, BooleanField):
+            falsos = [False]
+        elif isinstance(campo, (CharField, TextField)):
+            falsos = ['']
+        elif isinstance(campo, (IntegerField, FloatField, DecimalField)):
+            falsos = [0]
+        else:
+            falsos = []
+
+        falso = Value("Falso")
+        caso = Case(
+            When(IsNull(expressao, True), then=falso),
+            *[When(Exact(expressao, valor), then=falso) for valor in falsos],
+            default=Value("Verdadeiro"),
+            output_field=CharField(),
+        )
+        return caso.resolve_expression(*args, **kwargs)
+
+
+def suporta_formatacao_no_banco(vendor):
+    return vendor in FormatarData.FORMATOS
+
+def formatacao_sem_perda(tipo):
+    """Indica se valores diferentes de uma coluna do tipo informado sempre resultam em textos diferentes"""
+    # horários perdem os segundos e, nos booleanos, nulos, falsos e textos vazios resultam todos em "Falso"
+    return tipo in ('date', 'month', 'year')
+
+def criar_expressao_formatacao(tipo, chave_db):
+    """Retorna a expressão que formata, no banco, a coluna do tipo informado, ou None se ela é exibida como está"""
+    if tipo == 'bool':
+        return RotuloBooleano(F(chave_db))
+    if tipo in FORMATOS_DATA:
+        return FormatarData(F(chave_db), tipo)
+
+    return None
+
+class ResultadoConsulta:
+    """Resultado formatado de uma consulta: os rótulos das colunas e as linhas (tuplas, na ordem das colunas)"""
+    __slots__ = ('cabecalhos', 'linhas')
+
+    def __init__(self, cabecalhos, linhas):
+        self.cabecalhos = list(cabecalhos)
+        self.linhas = linhas
+
+    @classmethod
+    def de_dicionarios(cls, dicionarios):
+        """Cria o resultado a partir de uma lista de dicionários: [{'Nome': 'João', 'Idade': 30}, ...]"""
+        cabecalhos = list(dicionarios[0].keys()) if dicionarios else []
+        return cls(cabecalhos, [tuple(dicionario.values()) for dicionario in dicionarios])
+
+    def como_dicionarios(self):
+        return [dict(zip(self.cabecalhos, linha)) for linha in self.linhas]
+
+    def __len__(self):
+        return len(self.linhas)
+
+    def __iter__(self):
+        return iter(self.linhas)
+
+    def __getitem__(self, indice):
+        return self.linhas[indice]
+
+    def __eq__(self, outro):
+        if not isinstance(outro, ResultadoConsulta):
+            return NotImplemented
+        return self.cabecalhos == outro.cabecalhos and self.linhas == outro.linhas
+
+    def __repr__(self):
+        return f'<ResultadoConsulta: {len(self.linhas)} linhas, colunas {self.cabecalhos}>'
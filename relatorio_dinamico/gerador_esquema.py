@@ -0,0 +1,229 @@
+"""
+Geração do esquema do BD (esquema_bd) a partir dos metadados dos modelos do Django.
+
+A sobreposição (ex: SOBREPOSICAO_ESQUEMA em setup/esquema.py) define, para cada entidade exibida no editor, o modelo,
+os campos e as relações permitidos, na ordem exibida, com seus rótulos:
+
+    "Chamado": {
+        "app_model": "chamado.Chamado",
+        "campos": {"id": "ID", "status": "Status", "criado_em": None},   # None usa o verbose_name do campo
+        "conexoes": {"base": "Base", "atendimento_chamado": "Atendimentos"},
+    }
+
+Os tipos dos campos e os modelos de destino das conexões vêm dos modelos, então não ficam desatualizados. Campos
+e relações da sobreposição que não existem nos modelos, relações com modelos fora da sobreposição e campos de tipos
+sem suporte são divergências: gerar_esquema() deixa esses itens de fora (com um aviso no log, para que a aplicação
+continue iniciando), verificar_sobreposicao() os retorna e o comando verificar_esquema falha com eles.
+
+Com ESQUEMA['ARQUIVO_CACHE'], o esquema gerado é armazenado em disco, com uma chave formada pela sobreposição e pelos
+arquivos dos modelos; enquanto nenhum deles muda, a inicialização apenas lê o arquivo. Com poucas entidades, gerar o
+esquema é mais rápido que conferir a chave, então o arquivo só compensa com esquemas grandes.
+"""
+from hashlib import sha256
+from pathlib import Path
+import json
+import logging
+import os
+import sys
+import tempfile
+import django
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from .configuracoes import obter_configuracao
+
+logger = logging.getLogger(__name__)
+
+# tipo de cada campo no esquema, pelo tipo interno do Django; as chaves primárias automáticas são 'int'
+TIPOS_POR_CAMPO = {
+    'AutoField': 'int',
+    'BigAutoField': 'int',
+    'SmallAutoField': 'int',
+    'IntegerField': 'number',
+    'BigIntegerField': 'number',
+    'SmallIntegerField': 'number',
+    'PositiveIntegerField': 'number',
+    'PositiveBigIntegerField': 'number',
+    'PositiveSmallIntegerField': 'number',
+    'DecimalField': 'number',
+    'FloatField': 'number',
+    'CharField': 'string',
+    'TextField': 'string',
+    'SlugField': 'string',
+    'UUIDField': 'string',
+    'BooleanField': 'bool',
+    'DateField': 'date',
+    'DateTimeField': 'datetime',
+}
+
+def _obter_tipo(campo):
+    # EmailField e URLField têm o tipo interno CharField
+    if isinstance(campo, models.EmailField):
+        return 'email'
+    return TIPOS_POR_CAMPO.get(campo.get_internal_type())
+
+def _obter_modelo(app_model):
+    try:
+        return apps.get_model(app_model)
+    except (LookupError, ValueError):
+        return None
+
+def _verificar_campo(modelo, nome_campo):
+    """Retorna a divergência do campo da sobreposição, ou None"""
+    try:
+        campo = modelo._meta.get_field(nome_campo)
+    except FieldDoesNotExist:
+        return f"campo não encontrado em {modelo._meta.label}"
+
+    if campo.is_relation:
+        return "é uma relação; deve estar em 'conexoes'"
+    if _obter_tipo(campo) is None:
+        return f"tipo sem suporte: {campo.get_internal_type()}"
+
+    return None
+
+def _verificar_relacao(modelo, nome_relacao, entidades_por_modelo):
+    """Retorna a divergência da conexão da sobreposição, ou None"""
+    try:
+        relacao = modelo._meta.get_field(nome_relacao)
+    except FieldDoesNotExist:
+        return f"relação não encontrada em {modelo._meta.label}"
+
+    if not relacao.is_relation:
+        return "não é uma relação; deve estar em 'campos'"
+    if relacao.related_model._meta.label not in entidades_por_modelo:
+        return f"o modelo de destino {relacao.related_model._meta.label} não está na sobreposição"
+
+    return None
+
+def _percorrer_sobreposicao(sobreposicao):
+    """
+    Percorre a sobreposição, gerando (entidade, modelo, campos, conexões, divergências), em que campos e conexões são
+    as listas de (nome, rótulo) válidos e divergências são as mensagens dos itens ignorados
+    """
+    # rótulo do modelo ("app.Modelo") -> nome da entidade
+    entidades_por_modelo = {}
+
+    for nome_entidade, config in sobreposicao.items():
+        modelo = _obter_modelo(config['app_model'])
+
+        if modelo is not None:
+            entidades_por_modelo[modelo._meta.label] = nome_entidade
+
+    for nome_entidade, config in sobreposicao.items():
+        modelo = _obter_modelo(config['app_model'])
+
+        if modelo is None:
+            yield nome_entidade, None, [], [], [f"{nome_entidade}: modelo não encontrado: {config['app_model']}"]
+            continue
+
+        campos, conexoes, divergencias = [], [], []
+
+        for nome_campo, rotulo in config.get('campos', {}).items():
+            divergencia = _verificar_campo(modelo, nome_campo)
+
+            if divergencia:
+                divergencias.append(f"{nome_entidade}.{nome_campo}: {divergencia}")
+            else:
+                campos.append((nome_campo, rotulo))
+
+        for nome_relacao, nome_amigavel in config.get('conexoes', {}).items():
+            divergencia = _verificar_relacao(modelo, nome_relacao, entidades_por_modelo)
+
+            if divergencia:
+                divergencias.append(f"{nome_entidade}.{nome_relacao}: {divergencia}")
+            else:
+                model_destino = entidades_por_modelo[modelo._meta.get_field(nome_relacao).related_model._meta.label]
+                conexoes.append((nome_relacao, nome_amigavel or model_destino, model_destino))
+
+        yield nome_entidade, modelo, campos, conexoes, divergencias
+
+def verificar_sobreposicao(sobreposicao):
+    """Retorna a lista de divergências entre a sobreposição e os modelos (vazia se estiverem de acordo)"""
+    return [divergencia for *_, divergencias in _percorrer_sobreposicao(sobreposicao) for divergencia in divergencias]
+
+def gerar_esquema(sobreposicao):
+    """
+    Gera o esquema a partir dos modelos e da sobreposição, retornando (esquema, divergências).
+    Os itens divergentes são deixados de fora do esquema, para que a aplicação continue iniciando.
+    """
+    esquema = {}
+    todas_divergencias = []
+
+    for nome_entidade, modelo, campos, conexoes, divergencias in _percorrer_sobreposicao(sobreposicao):
+        todas_divergencias.extend(divergencias)
+
+        if modelo is None:
+            continue
+
+        meta = modelo._meta
+        esquema[nome_entidade] = {
+            "app_model": meta.label,
+            "campos": [
+                {
+                    "rotulo": rotulo or str(meta.get_field(nome_campo).verbose_name).capitalize(),
+                    "valor": nome_campo,
+                    "tipo": _obter_tipo(meta.get_field(nome_campo)),
+                }
+                for nome_campo, rotulo in campos
+            ],
+            "conexoes": [
+                {"nome_amigavel": nome_amigavel, "campo_relacao": nome_relacao, "model_destino": model_destino}
+                for nome_relacao, nome_amigavel, model_destino in conexoes
+            ],
+        }
+
+    return esquema, todas_divergencias
+
+def _gerar_chave(sobreposicao):
+    """Chave do esquema gerado: a sobreposição, a versão do Django e os arquivos (caminho, data e tamanho) dos modelos"""
+    arquivos = set()
+
+    for config in sobreposicao.values():
+        modelo = _obter_modelo(config['app_model'])
+
+        if modelo is not None:
+            arquivos.add(sys.modules[modelo.__module__].__file__)
+
+    estado_arquivos = []
+    for arquivo in sorted(arquivos):
+        estado = os.stat(arquivo)
+        estado_arquivos.append([arquivo, estado.st_mtime_ns, estado.st_size])
+
+    conteudo = json.dumps([sobreposicao, django.__version__, estado_arquivos], sort_keys=True, default=str)
+    return sha256(conteudo.encode('utf-8')).hexdigest()
+
+def obter_esquema(sobreposicao):
+    """Retorna o esquema do arquivo de cache, se ainda corresponder à sobreposição e aos modelos, ou o gera e armazena"""
+    arquivo_cache = obter_configuracao('ESQUEMA')['ARQUIVO_CACHE']
+    chave = _gerar_chave(sobreposicao) if arquivo_cache else None
+
+    if arquivo_cache:
+        try:
+            armazenado = json.loads(Path(arquivo_cache).read_text(encoding='utf-8'))
+
+            if armazenado['chave'] == chave:
+                return armazenado['esquema']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    esquema, divergencias = gerar_esquema(sobreposicao)
+
+    if divergencias:
+        # o esquema com divergências não é armazenado, para que o aviso se repita a cada inicialização
+        logger.warning("Itens do esquema ignorados por divergirem dos modelos (verifique com o comando verificar_esquema):\n%s", "\n".join(divergencias))
+    elif arquivo_cache:
+        _armazenar(Path(arquivo_cache), chave, esquema)
+
+    return esquema
+
+def _armazenar(arquivo_cache, chave, esquema):
+    try:
+        arquivo_cache.parent.mkdir(parents=True, exist_ok=True)
+        # grava em um arquivo temporário e o renomeia, para que outro processo nunca leia um arquivo incompleto
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=arquivo_cache.parent, suffix='.tmp', delete=False) as arquivo:
+            json.dump({'chave': chave, 'esquema': esquema}, arquivo, ensure_ascii=False)
+        os.replace(arquivo.name, arquivo_cache)
+    except OSError:
+        # sem permissão de escrita, o esquema é gerado novamente na próxima inicialização
+        pass
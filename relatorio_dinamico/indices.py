@@ -0,0 +1,201 @@
+"""
+Proposta de índices a partir do uso real dos relatórios salvos.
+
+As configurações de consulta dos relatórios (atributo data-config-consulta) são validadas com o esquema_bd
+e convertidas em QuerySets; para cada tabela envolvida são coletadas as colunas filtradas por igualdade,
+as filtradas por intervalo e as agrupadas (inclusive com truncamento de data), nessa ordem, formando um índice
+composto candidato. As demais colunas selecionadas da tabela podem ser incluídas no índice (índice de cobertura)
+quando o banco suporta INCLUDE (PostgreSQL). Candidatos já atendidos por um índice existente não são propostos.
+"""
+from collections import Counter
+from django.db import connections, models, migrations
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.db.models.expressions import Col
+from django.core.exceptions import FieldError, ValidationError
+from bs4 import BeautifulSoup
+from .analise import _obter_modelo_tabela, _obter_nome_campo, _percorrer_lookups
+from .construtores import ValidadorConsulta, ConstrutorConsulta
+import json
+
+# lookups que comparam por igualdade; as colunas desses filtros vêm primeiro no índice composto
+LOOKUPS_IGUALDADE = {'exact', 'iexact', 'in', 'isnull'}
+# quantidade máxima de colunas-chave de um índice proposto
+MAX_COLUNAS = 3
+
+
+def extrair_configuracoes(html):
+    """Retorna as configurações de consulta (dicionários) das tabelas de um HTML de relatório"""
+    configuracoes = []
+
+    for tabela in BeautifulSoup(html or '', 'html.parser').find_all(attrs={'data-config-consulta': True}):
+        try:
+            configuracoes.append(json.loads(tabela['data-config-consulta']))
+        except ValueError:
+            continue
+
+    return configuracoes
+
+def coletar_usos(relatorios, esquema):
+    """
+    Conta quantas consultas dos relatórios usariam cada índice candidato.
+    :return: Tupla (Counter {(tabela, colunas): usos}, {(tabela, colunas): colunas de cobertura})
+    """
+    validador = ValidadorConsulta(esquema)
+    usos = Counter()
+    cobertura = {}
+
+    for relatorio in relatorios:
+        for configuracao in extrair_configuracoes(relatorio.html):
+            try:
+                queryset = ConstrutorConsulta(validador.validar(configuracao))._criar_queryset()
+            except (FieldError, ValidationError, KeyError, TypeError):
+                # relatórios com consultas que não são mais válidas são ignorados
+                continue
+
+            for tabela, colunas, colunas_cobertura in _obter_candidatos(queryset.query):
+                usos[(tabela, colunas)] += 1
+                cobertura.setdefault((tabela, colunas), set()).update(colunas_cobertura)
+
+    return usos, cobertura
+
+def _obter_candidatos(query):
+    """Retorna, para cada tabela da consulta, a tupla (tabela, colunas do índice candidato, colunas de cobertura)"""
+    igualdade, intervalo, agrupamento, selecionadas = {}, {}, {}, {}
+
+    def adicionar(destino, expressao):
+        for col in expressao.flatten():
+            if isinstance(col, Col) and col.alias in query.alias_map:
+                colunas = destino.setdefault(col.alias, [])
+                if col.target.column not in colunas:
+                    colunas.append(col.target.column)
+
+    for lookup in _percorrer_lookups(query.where):
+        if getattr(lookup.lhs, 'contains_aggregate', False):
+            continue
+        adicionar(igualdade if lookup.lookup_name in LOOKUPS_IGUALDADE else intervalo, lookup.lhs)
+
+    for expressao in query.select:
+        adicionar(agrupamento, expressao)
+
+    for anotacao in query.annotations.values():
+        # truncamentos de data são agrupados; as colunas das agregações só precisam estar no índice para cobri-lo
+        adicionar(selecionadas if anotacao.contains_aggregate else agrupamento, anotacao)
+
+    for apelido, juncao in query.alias_map.items():
+        colunas = []
+        for coluna in igualdade.get(apelido, []) + intervalo.get(apelido, []) + agrupamento.get(apelido, []):
+            if coluna not in colunas:
+                colunas.append(coluna)
+
+        colunas = tuple(colunas[:MAX_COLUNAS])
+        chave_primaria = _obter_chave_primaria(juncao.table_name)
+
+        # a chave primária já identifica a linha; um índice que começa por ela não acrescenta nada
+        if not colunas or colunas[0] == chave_primaria:
+            continue
+
+        colunas_cobertura = [
+            coluna for coluna in agrupamento.get(apelido, []) + selecionadas.get(apelido, [])
+            if coluna not in colunas and coluna != chave_primaria
+        ]
+        yield juncao.table_name, colunas, colunas_cobertura
+
+def _obter_chave_primaria(tabela):
+    modelo = _obter_modelo_tabela(tabela)
+    return modelo._meta.pk.column if modelo else None
+
+def _obter_indices_existentes(modelo, conexao):
+    """Retorna as listas de colunas dos índices existentes no banco e dos declarados no Meta do modelo"""
+    with conexao.cursor() as cursor:
+        restricoes = conexao.introspection.get_constraints(cursor, modelo._meta.db_table)
+
+    existentes = [
+        tuple(restricao['columns']) for restricao in restricoes.values()
+        if restricao['columns'] and (restricao['index'] or restricao['primary_key'] or restricao['unique'])
+    ]
+    for indice in modelo._meta.indexes:
+        existentes.append(tuple(modelo._meta.get_field(campo.lstrip('-')).column for campo in indice.fields))
+
+    return existentes
+
+def propor_indices(relatorios, esquema, minimo_usos=1, using='default'):
+    """
+    Propõe os índices para as consultas dos relatórios.
+    :param relatorios: Relatórios salvos (objetos com o atributo html)
+    :param minimo_usos: Quantidade mínima de consultas que usariam o índice para que ele seja proposto
+    :return: Lista de dicionários com o modelo, o objeto models.Index proposto e a quantidade de usos
+    """
+    conexao = connections[using]
+    usos, cobertura = coletar_usos(relatorios, esquema)
+
+    # um candidato que é prefixo de outro da mesma tabela é atendido pelo índice maior
+    for tabela, colunas in list(usos):
+        quantidade = usos[(tabela, colunas)]
+        for (outra_tabela, outras_colunas) in usos:
+            if outra_tabela == tabela and len(outras_colunas) > len(colunas) and outras_colunas[:len(colunas)] == colunas:
+                usos[(outra_tabela, outras_colunas)] += quantidade
+                cobertura[(outra_tabela, outras_colunas)].update(cobertura.pop((tabela, colunas), ()))
+                del usos[(tabela, colunas)]
+                break
+
+    propostas = []
+
+    for (tabela, colunas), quantidade in usos.most_common():
+        modelo = _obter_modelo_tabela(tabela)
+
+        if modelo is None or quantidade < minimo_usos:
+            continue
+        if any(existente[:len(colunas)] == colunas for existente in _obter_indices_existentes(modelo, conexao)):
+            continue
+
+        campos = [_obter_nome_campo(modelo, coluna) for coluna in colunas]
+        incluir = []
+        if conexao.features.supports_covering_indexes:
+            incluir = sorted(_obter_nome_campo(modelo, coluna) for coluna in cobertura.get((tabela, colunas), ()))
+
+        # o nome é gerado como o do makemigrations; um índice com INCLUDE precisa ser criado já com o nome
+        indice = models.Index(fields=campos)
+        indice.set_name_with_model(modelo)
+        if incluir:
+            indice = models.Index(fields=campos, include=incluir, name=indice.name)
+
+        propostas.append({'modelo': modelo, 'indice': indice, 'usos': quantidade})
+
+    return propostas
+
+def gerar_migracoes(propostas, nome='indices_relatorios'):
+    """
+    Grava uma migração com as operações AddIndex das propostas para cada app envolvido.
+    :return: Lista com os caminhos dos arquivos gravados
+    """
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    operacoes_por_app = {}
+
+    for proposta in propostas:
+        modelo = proposta['modelo']
+        operacoes_por_app.setdefault(modelo._meta.app_label, []).append(
+            migrations.AddIndex(model_name=modelo._meta.model_name, index=proposta['indice'])
+        )
+
+    caminhos = []
+
+    for app_label, operacoes in operacoes_por_app.items():
+        folhas = loader.graph.leaf_nodes(app_label)
+
+        if not folhas:
+            raise ValueError(f"O app '{app_label}' não possui migrações; execute o makemigrations antes de gerar as migrações dos índices.")
+
+        numero = (MigrationAutodetector.parse_number(folhas[0][1]) or 0) + 1
+        migracao = migrations.Migration(f'{numero:04d}_{nome}', app_label)
+        migracao.dependencies = folhas
+        migracao.operations = operacoes
+
+        escritor = MigrationWriter(migracao)
+        with open(escritor.path, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(escritor.as_string())
+
+        caminhos.append(escritor.path)
+
+    return caminhos
@@ -0,0 +1,19 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from relatorio_dinamico.resumos import atualizar_resumos
+
+class Command(BaseCommand):
+    help = "Recalcula os resumos diários pré-agregados de chamados (ResumoChamado)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, help="Recalcula apenas os últimos N dias (padrão: todos)")
+
+    def handle(self, *args, **options):
+        desde = None
+
+        if options['dias']:
+            desde = timezone.localdate() - timedelta(days=options['dias'] - 1)
+
+        quantidade = atualizar_resumos(desde)
+        self.stdout.write(self.style.SUCCESS(f"{quantidade} linhas de resumo gravadas."))
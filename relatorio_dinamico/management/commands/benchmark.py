@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from relatorio_dinamico.benchmarks import carregar_benchmarks
+import django
+import json
+import platform
+import subprocess
+
+class Command(BaseCommand):
+    help = "Executa os benchmarks do motor de relatórios"
+
+    def add_arguments(self, parser):
+        parser.add_argument('nomes', nargs='*', help="Benchmarks a executar (padrão: todos)")
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument('--tamanhos', type=int, nargs='+', help="Tamanhos dos dados (linhas ou chamados) usados pelos benchmarks")
+        parser.add_argument('--saida', choices=['texto', 'json'], default='texto', help="Formato dos resultados")
+        parser.add_argument('--arquivo', help="Grava os resultados neste arquivo, em vez da saída padrão")
+
+    def handle(self, *args, **options):
+        benchmarks = carregar_benchmarks()
+        nomes = options['nomes'] or list(benchmarks)
+
+        for nome in nomes:
+            if nome not in benchmarks:
+                raise CommandError(f"Benchmark desconhecido: {nome}. Opções: {', '.join(benchmarks)}")
+
+        resultados = []
+        for nome in nomes:
+            resultados.extend(benchmarks[nome](options['repeticoes'], tamanhos=options['tamanhos']))
+
+        if options['saida'] == 'json':
+            saida = json.dumps({'metadados': self._obter_metadados(options), 'resultados': resultados}, ensure_ascii=False, indent=2)
+        else:
+            saida = '\n'.join(self._formatar_texto(resultado) for resultado in resultados)
+
+        if options['arquivo']:
+            with open(options['arquivo'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(saida + '\n')
+        else:
+            self.stdout.write(saida)
+
+    def _formatar_texto(self, resultado):
+        detalhes = ' '.join(
+            f"{chave}={valor}" for chave, valor in resultado.items()
+            if chave not in ('benchmark', 'minimo', 'mediana')
+        )
+        return (
+            f"{resultado['benchmark']:<12} {detalhes:<40} "
+            f"mínimo={resultado['minimo'] * 1000:9.2f} ms  mediana={resultado['mediana'] * 1000:9.2f} ms"
+        )
+
+    def _obter_metadados(self, options):
+        """Informações do ambiente, para que resultados de execuções diferentes possam ser comparados"""
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, timeout=5
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+
+        return {
+            'data': datetime.now(timezone.utc).isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'banco': connection.vendor,
+            'versao_banco': '.'.join(map(str, connection.get_database_version())),
+            'plataforma': platform.platform(),
+            'repeticoes': options['repeticoes'],
+            'tamanhos': options['tamanhos'],
+        }
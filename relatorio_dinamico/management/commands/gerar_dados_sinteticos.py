@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from relatorio_dinamico.dados_sinteticos import gerar_dados_sinteticos, limpar_dados_sinteticos
+
+class Command(BaseCommand):
+    help = "Gera chamados, trâmites, atendimentos e pessoas sintéticos para testes de desempenho dos relatórios"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chamados', type=int, default=100000, help="Quantidade de chamados (padrão: 100000)")
+        parser.add_argument('--dias', type=int, default=365, help="Distribui os chamados ao longo dos últimos N dias")
+        parser.add_argument('--semente', type=int, default=42, help="Semente do gerador, para repetir os mesmos dados")
+        parser.add_argument('--lote', type=int, default=5000, help="Quantidade de chamados inseridos por transação")
+        parser.add_argument('--limpar', action='store_true', help="Remove os dados sintéticos gerados anteriormente antes de gerar os novos")
+
+    def handle(self, *args, **options):
+        if options['limpar']:
+            limpar_dados_sinteticos()
+            self.stdout.write("Dados sintéticos anteriores removidos.")
+
+        def progresso(gerados, total):
+            self.stdout.write(f"{gerados}/{total} chamados gerados")
+
+        contagem = gerar_dados_sinteticos(
+            options['chamados'], dias=options['dias'], semente=options['semente'],
+            tamanho_lote=options['lote'], progresso=progresso,
+        )
+
+        for modelo, quantidade in contagem.items():
+            self.stdout.write(f"{modelo:<20} {quantidade}")
+        self.stdout.write(self.style.SUCCESS("Dados sintéticos gerados."))
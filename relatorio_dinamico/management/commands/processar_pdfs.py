@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from relatorio_dinamico.tarefas import processar_tarefas
+
+class Command(BaseCommand):
+    help = "Processa a fila de geração de PDFs, renderizando-os em um pool de processos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, help="Número de PDFs renderizados ao mesmo tempo (padrão: número de núcleos)")
+        parser.add_argument('--intervalo', type=float, help="Espera, em segundos, quando a fila está vazia")
+        parser.add_argument('--uma-vez', action='store_true', help="Termina quando não houver mais tarefas pendentes")
+
+    def handle(self, *args, **options):
+        processar_tarefas(options['processos'], options['intervalo'], options['uma_vez'])
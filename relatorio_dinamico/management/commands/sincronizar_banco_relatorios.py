@@ -0,0 +1,46 @@
+import sqlite3
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+from relatorio_dinamico.configuracoes import obter_configuracao
+from relatorio_dinamico.roteamento import registrar_sincronizacao
+
+class Command(BaseCommand):
+    help = (
+        "Registra o horário da sincronização do banco dos relatórios e, se os dois bancos forem SQLite, "
+        "copia o banco principal para o banco dos relatórios"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--banco', help="Alias do banco dos relatórios (padrão: BANCO_RELATORIOS['ALIAS'])")
+        parser.add_argument(
+            '--somente-marco', action='store_true',
+            help="Apenas grava o horário no banco principal, quando a cópia dos dados é feita pela replicação do próprio banco",
+        )
+
+    def handle(self, *args, **options):
+        alias = options['banco'] or obter_configuracao('BANCO_RELATORIOS')['ALIAS']
+
+        if not alias or alias == DEFAULT_DB_ALIAS:
+            raise CommandError("Informe o banco dos relatórios com --banco ou BANCO_RELATORIOS['ALIAS'].")
+        if alias not in connections.settings:
+            raise CommandError(f"Banco não definido em DATABASES: {alias}")
+
+        # o marco é gravado antes da cópia, para que o atraso medido no banco dos relatórios nunca seja menor que o real
+        registrar_sincronizacao(DEFAULT_DB_ALIAS)
+
+        if options['somente_marco']:
+            self.stdout.write(self.style.SUCCESS("Horário da sincronização registrado."))
+            return
+
+        origem, destino = connections[DEFAULT_DB_ALIAS], connections[alias]
+
+        if origem.vendor != 'sqlite' or destino.vendor != 'sqlite':
+            raise CommandError("A cópia só é feita entre bancos SQLite; nos demais, use a replicação do banco com --somente-marco.")
+
+        origem.ensure_connection()
+        # a API de backup do SQLite copia o banco de forma consistente, mesmo com gravações em andamento
+        with sqlite3.connect(destino.settings_dict['NAME']) as conexao_destino:
+            origem.connection.backup(conexao_destino)
+
+        conexao_destino.close()
+        self.stdout.write(self.style.SUCCESS(f"Banco principal copiado para '{alias}'."))
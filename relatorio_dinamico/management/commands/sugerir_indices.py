@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from relatorio_dinamico.indices import propor_indices, gerar_migracoes
+from relatorio_dinamico.models import Relatorio
+from setup.esquema import esquema_bd
+
+class Command(BaseCommand):
+    help = "Propõe índices compostos a partir das consultas dos relatórios salvos e, opcionalmente, gera as migrações"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minimo-usos', type=int, default=1, help="Quantidade mínima de consultas que usariam o índice")
+        parser.add_argument('--gerar-migracoes', action='store_true', help="Grava as migrações com as operações AddIndex")
+
+    def handle(self, *args, **options):
+        propostas = propor_indices(Relatorio.objects.all(), esquema_bd, options['minimo_usos'])
+
+        if not propostas:
+            self.stdout.write("Nenhum índice a propor: as consultas dos relatórios já são atendidas pelos índices existentes.")
+            return
+
+        for proposta in propostas:
+            indice = proposta['indice']
+            _, _, kwargs = indice.deconstruct()
+            argumentos = ', '.join(f"{chave}={valor!r}" for chave, valor in kwargs.items())
+            self.stdout.write(f"{proposta['modelo']._meta.label:<28} usos={proposta['usos']:<4} models.Index({argumentos})")
+
+        if options['gerar_migracoes']:
+            try:
+                caminhos = gerar_migracoes(propostas)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            for caminho in caminhos:
+                self.stdout.write(self.style.SUCCESS(f"Migração gravada: {caminho}"))
+
+            # sem a declaração no Meta, o makemigrations proporia a remoção dos índices
+            self.stdout.write("Adicione os mesmos índices ao Meta.indexes dos modelos para manter o estado das migrações consistente.")
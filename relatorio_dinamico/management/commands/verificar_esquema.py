@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from relatorio_dinamico.gerador_esquema import verificar_sobreposicao
+from setup.esquema import SOBREPOSICAO_ESQUEMA
+
+class Command(BaseCommand):
+    help = "Verifica se os campos e as conexões de SOBREPOSICAO_ESQUEMA (setup/esquema.py) existem nos modelos"
+
+    def handle(self, *args, **options):
+        divergencias = verificar_sobreposicao(SOBREPOSICAO_ESQUEMA)
+
+        if divergencias:
+            for divergencia in divergencias:
+                self.stderr.write(divergencia)
+
+            raise CommandError(f"{len(divergencias)} divergência(s) entre o esquema e os modelos.")
+
+        self.stdout.write(self.style.SUCCESS("O esquema corresponde aos modelos."))
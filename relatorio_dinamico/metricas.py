@@ -0,0 +1,253 @@
+"""
+Medição do tempo gasto em cada etapa da geração de um relatório.
+
+Uma medição é iniciada por requisição com medir_requisicao() e fica disponível no contexto atual (contextvars),
+inclusive nas threads das consultas paralelas, que recebem uma cópia do contexto. Cada trecho instrumentado com
+medir_etapa() registra a duração, a quantidade de linhas e as instruções SQL executadas (capturadas com
+connection.execute_wrapper). Em etapas aninhadas, a duração da externa inclui a da interna, mas cada instrução SQL
+é registrada apenas na etapa mais interna. Sem uma medição ativa, medir_etapa() não registra nada.
+
+Ao final da requisição, as etapas são enviadas ao log "relatorio_dinamico.metricas" (JSON) e acumuladas, por relatório,
+no registro do processo, que calcula os percentis e o histograma de duração exibidos em /metricas.
+"""
+from asgiref.sync import iscoroutinefunction
+from collections import deque
+from contextlib import contextmanager, ExitStack
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from threading import Lock
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from .configuracoes import obter_configuracao
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_medicao_atual = ContextVar('medicao_relatorio', default=None)
+# etapa mais interna em andamento; somente ela registra as instruções SQL
+_etapa_atual = ContextVar('etapa_relatorio', default=None)
+
+# chave usada para relatórios gerados a partir do editor, sem um Relatorio salvo
+CHAVE_EDITOR = 'editor'
+
+
+class Etapa:
+    def __init__(self, nome):
+        self.nome = nome
+        self.duracao = 0.0
+        self.linhas = None
+        self.consultas = []
+
+    def registrar_sql(self, execute, sql, params, many, context):
+        if _etapa_atual.get() is not self:
+            return execute(sql, params, many, context)
+
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append({'sql': sql, 'duracao': time.perf_counter() - inicio})
+
+    def como_dicionario(self, incluir_sql=True):
+        dados = {'etapa': self.nome, 'duracao_ms': round(self.duracao * 1000, 3), 'consultas': len(self.consultas)}
+
+        if self.linhas is not None:
+            dados['linhas'] = self.linhas
+        if incluir_sql and self.consultas:
+            dados['sql'] = [consulta['sql'] for consulta in self.consultas]
+
+        return dados
+
+
+class Medicao:
+    """Etapas medidas durante a geração de um relatório"""
+    def __init__(self, chave=CHAVE_EDITOR):
+        self.chave = chave
+        self.etapas = []
+        self.duracao = 0.0
+        self._lock = Lock()
+
+    def adicionar(self, etapa):
+        # as etapas das consultas paralelas são adicionadas por várias threads
+        with self._lock:
+            self.etapas.append(etapa)
+
+    def totais(self):
+        """Retorna a duração total, em segundos, de cada etapa (somando as repetições, como uma validação por tabela)"""
+        totais = {}
+        for etapa in self.etapas:
+            totais[etapa.nome] = totais.get(etapa.nome, 0.0) + etapa.duracao
+        return totais
+
+    def server_timing(self):
+        """Valor do cabeçalho Server-Timing, com a duração total de cada etapa em milissegundos"""
+        itens = [f'{nome};dur={duracao * 1000:.1f}' for nome, duracao in self.totais().items()]
+        itens.append(f'total;dur={self.duracao * 1000:.1f}')
+        return ', '.join(itens)
+
+    def como_dicionario(self, incluir_sql=True):
+        return {
+            'relatorio': self.chave,
+            'duracao_ms': round(self.duracao * 1000, 3),
+            'consultas': sum(len(etapa.consultas) for etapa in self.etapas),
+            'etapas': [etapa.como_dicionario(incluir_sql) for etapa in self.etapas],
+        }
+
+
+def obter_medicao():
+    """Retorna a medição ativa no contexto atual, ou None"""
+    return _medicao_atual.get()
+
+@contextmanager
+def medir_etapa(nome):
+    """
+    Mede um trecho da geração do relatório. O objeto Etapa retornado pode receber a quantidade de linhas (etapa.linhas).
+    Sem uma medição ativa, apenas executa o trecho.
+    """
+    medicao = _medicao_atual.get()
+    etapa = Etapa(nome)
+
+    if medicao is None:
+        yield etapa
+        return
+
+    with ExitStack() as pilha:
+        for conexao in connections.all():
+            pilha.enter_context(conexao.execute_wrapper(etapa.registrar_sql))
+
+        token = _etapa_atual.set(etapa)
+        inicio = time.perf_counter()
+        try:
+            yield etapa
+        finally:
+            etapa.duracao = time.perf_counter() - inicio
+            _etapa_atual.reset(token)
+            medicao.adicionar(etapa)
+
+@contextmanager
+def medir_requisicao(chave=CHAVE_EDITOR):
+    """Inicia a medição de um relatório; ao final, registra as etapas no log e no registro de métricas do processo"""
+    if not obter_configuracao('METRICAS')['ATIVO']:
+        yield None
+        return
+
+    medicao = Medicao(str(chave))
+    token = _medicao_atual.set(medicao)
+    inicio = time.perf_counter()
+
+    try:
+        yield medicao
+    finally:
+        medicao.duracao = time.perf_counter() - inicio
+        _medicao_atual.reset(token)
+        obter_registro_metricas().registrar(medicao)
+        logger.info(json.dumps(medicao.como_dicionario(incluir_sql=False), ensure_ascii=False))
+
+def medir_view(parametro_id=None):
+    """
+    Decorador que mede a geração do relatório feita por uma view (síncrona ou assíncrona) e adiciona o cabeçalho
+    Server-Timing à resposta. Com DEBUG ativo, o parâmetro ?metricas=1 retorna as etapas medidas (com as instruções SQL)
+    no lugar da resposta.
+    :param parametro_id: Nome do parâmetro da URL com o id do Relatorio salvo; sem ele, as métricas são do editor
+    """
+    def decorador(view):
+        def finalizar(request, medicao, resposta):
+            if medicao is None:
+                return resposta
+            if settings.DEBUG and request.GET.get('metricas'):
+                return JsonResponse(medicao.como_dicionario())
+
+            resposta['Server-Timing'] = medicao.server_timing()
+            return resposta
+
+        def obter_chave(kwargs):
+            return kwargs.get(parametro_id, CHAVE_EDITOR) if parametro_id else CHAVE_EDITOR
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def view_medida(request, *args, **kwargs):
+                # as etapas executadas nas threads (sync_to_async) recebem uma cópia do contexto, com a medição
+                with medir_requisicao(obter_chave(kwargs)) as medicao:
+                    resposta = await view(request, *args, **kwargs)
+
+                return finalizar(request, medicao, resposta)
+
+            return view_medida
+
+        @wraps(view)
+        def view_medida(request, *args, **kwargs):
+            with medir_requisicao(obter_chave(kwargs)) as medicao:
+                resposta = view(request, *args, **kwargs)
+
+            return finalizar(request, medicao, resposta)
+
+        return view_medida
+
+    return decorador
+
+
+class RegistroMetricas:
+    """Duração das etapas de cada relatório, mantida em memória pelo processo (as últimas N amostras por etapa)"""
+    def __init__(self, max_amostras, faixas_ms):
+        self._max_amostras = max_amostras
+        self._faixas_ms = sorted(faixas_ms)
+        self._amostras = {}  # {chave: {etapa: deque de durações em ms}}
+        self._lock = Lock()
+
+    def registrar(self, medicao):
+        duracoes = {nome: duracao * 1000 for nome, duracao in medicao.totais().items()}
+        duracoes['total'] = medicao.duracao * 1000
+
+        with self._lock:
+            etapas = self._amostras.setdefault(medicao.chave, {})
+            for nome, duracao in duracoes.items():
+                etapas.setdefault(nome, deque(maxlen=self._max_amostras)).append(duracao)
+
+    def resumo(self):
+        """Retorna, por relatório e etapa, a quantidade de amostras, os percentis e o histograma das durações (ms)"""
+        with self._lock:
+            copia = {chave: {nome: sorted(amostras) for nome, amostras in etapas.items()} for chave, etapas in self._amostras.items()}
+
+        return {
+            chave: {nome: self._resumir(amostras) for nome, amostras in etapas.items()}
+            for chave, etapas in copia.items()
+        }
+
+    def _resumir(self, amostras):
+        histograma = {f'<={faixa}': 0 for faixa in self._faixas_ms}
+        histograma[f'>{self._faixas_ms[-1]}'] = 0
+
+        for amostra in amostras:
+            for faixa in self._faixas_ms:
+                if amostra <= faixa:
+                    histograma[f'<={faixa}'] += 1
+                    break
+            else:
+                histograma[f'>{self._faixas_ms[-1]}'] += 1
+
+        return {
+            'amostras': len(amostras),
+            'p50': _percentil(amostras, 50),
+            'p90': _percentil(amostras, 90),
+            'p99': _percentil(amostras, 99),
+            'maximo': round(amostras[-1], 3),
+            'histograma': histograma,
+        }
+
+    def limpar(self):
+        with self._lock:
+            self._amostras.clear()
+
+
+def _percentil(amostras_ordenadas, percentil):
+    # método do posto mais próximo
+    indice = max(0, -(-len(amostras_ordenadas) * percentil // 100) - 1)
+    return round(amostras_ordenadas[indice], 3)
+
+@lru_cache(maxsize=None)
+def obter_registro_metricas():
+    conf = obter_configuracao('METRICAS')
+    return RegistroMetricas(conf['MAX_AMOSTRAS'], conf['FAIXAS_MS'])
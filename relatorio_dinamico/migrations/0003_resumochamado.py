@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0001_initial'),
+        ('relatorio_dinamico', '0002_tarefapdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoChamado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('cidade', models.CharField(max_length=100)),
+                ('bairro', models.CharField(max_length=100, null=True)),
+                ('status', models.CharField(max_length=20)),
+                ('quantidade', models.PositiveIntegerField()),
+                ('minimo_vitimas', models.IntegerField(null=True)),
+                ('maximo_vitimas', models.IntegerField(null=True)),
+                ('base', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumos_chamados', to='base.base')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dia'], name='resumo_chamado_dia_idx')],
+            },
+        ),
+    ]
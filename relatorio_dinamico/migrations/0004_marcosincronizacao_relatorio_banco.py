@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relatorio_dinamico', '0003_resumochamado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcoSincronizacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sincronizado_em', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='relatorio',
+            name='banco',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -1,6 +1,60 @@
 from django.db import models
+import uuid
 
 class Relatorio(models.Model):
     nome = models.CharField(max_length=255)
     html = models.TextField()
-    criado_em = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    criado_em = models.DateTimeField(auto_now_add=True)
+    # alias de DATABASES onde as consultas do relatório são executadas; vazio usa o banco padrão dos relatórios
+    banco = models.CharField(max_length=100, blank=True, default='')
+
+class TarefaPDF(models.Model):
+    """Geração de um PDF em segundo plano, executada pelo comando processar_pdfs"""
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+    OPCOES_STATUS = [
+        (PENDENTE, 'Pendente'),
+        (PROCESSANDO, 'Processando'),
+        (CONCLUIDA, 'Concluída'),
+        (ERRO, 'Erro'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # a tarefa gera o PDF de um relatório salvo ou do HTML enviado pelo editor
+    relatorio = models.ForeignKey(Relatorio, null=True, blank=True, on_delete=models.SET_NULL, related_name='tarefas_pdf')
+    html = models.TextField(blank=True)
+    base_url = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=OPCOES_STATUS, default=PENDENTE, db_index=True)
+    pdf = models.BinaryField(null=True, editable=False)
+    erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+class ResumoChamado(models.Model):
+    """
+    Contagem diária de chamados por base, cidade, bairro e status, mantida pelo módulo resumos.
+    Consultas compatíveis sobre Chamado são respondidas a partir desta tabela (ver resumos.obter_reescrita_resumo).
+    """
+    dia = models.DateField()
+    base = models.ForeignKey('base.Base', null=True, on_delete=models.CASCADE, related_name='resumos_chamados')
+    cidade = models.CharField(max_length=100)
+    bairro = models.CharField(max_length=100, null=True)
+    status = models.CharField(max_length=20)
+    quantidade = models.PositiveIntegerField()
+    minimo_vitimas = models.IntegerField(null=True)
+    maximo_vitimas = models.IntegerField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dia'], name='resumo_chamado_dia_idx'),
+        ]
+
+class MarcoSincronizacao(models.Model):
+    """
+    Horário da última sincronização do banco dos relatórios, com um único registro. Gravado no banco principal e
+    copiado junto com os dados, indica o atraso do banco dos relatórios (ver roteamento.medir_atraso)
+    """
+    sincronizado_em = models.DateTimeField()
@@ -0,0 +1,289 @@
+"""
+Otimização das consultas montadas pelo ConstrutorConsulta.
+
+A configuração validada é analisada a partir dos modelos do Django (o esquema_bd não informa a cardinalidade
+das conexões) para montar o QuerySet mínimo, com o mesmo resultado:
+
+- filtros sobre relações "para muitos" (ex: atendimento_chamado__risco) que não são usadas pelas colunas nem pelas
+  ordenações viram subconsultas sobre a tabela relacionada (id IN (SELECT chamado_id ...)), em vez de junções que
+  multiplicam as linhas da consulta principal. A subconsulta não é correlacionada: no SQLite, um EXISTS 
+  seria executado uma vez para cada linha e fica mais lento do que a própria junção. Filtros que aceitam nulos
+  (ex: isnull=True) continuam na junção: o LEFT JOIN também os atende com registros sem nenhum relacionado,
+  que a subconsulta deixaria de fora;
+- agregações sobre relações inversas do modelo raiz (ex: count de atendimento_chamado__id) são calculadas por
+  registro do modelo raiz em subconsultas correlacionadas e somadas (ou comparadas, no min/max) por grupo, quando
+  as junções multiplicariam as linhas das demais agregações. Assim, agregações sobre duas relações não formam
+  o produto cartesiano das duas junções e sum/avg não precisam do distinct=True;
+- o DISTINCT só é usado quando linhas repetidas são possíveis: consultas com agregações já retornam uma linha por
+  grupo e consultas que selecionam um campo único e não nulo do modelo raiz, sem junções "para muitos",
+  não repetem linhas;
+- sem junções "para muitos" na consulta principal, cada registro do modelo raiz aparece uma única vez em seu grupo:
+  sum e avg dispensam o distinct=True (que somaria apenas os valores diferentes) e count também o dispensa
+  quando o campo contado é único no modelo raiz.
+
+Assim, sum e avg consideram cada valor uma vez por registro. Sem as otimizações, ou quando a consulta principal
+ainda multiplica as linhas, elas consideram apenas os valores diferentes.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q, ManyToOneRel, OuterRef, Subquery, Count, Sum, Min, Max, FloatField
+from django.db.models.functions import Cast, Coalesce, NullIf
+from .configuracoes import obter_configuracao
+
+
+class OtimizacaoConsulta:
+    """
+    Decisões tomadas para uma consulta: uso do DISTINCT, agregações sem DISTINCT ou calculadas em subconsultas
+    e filtros movidos para subconsultas
+    """
+    def __init__(self, usar_distinct=True, metricas_sem_distinct=(), filtros_subconsulta=None, metricas_subconsulta=(), ativa=True):
+        self.ativa = ativa
+        self.usar_distinct = usar_distinct
+        self.metricas_sem_distinct = frozenset(metricas_sem_distinct) # apelidos das agregações
+        self.filtros_subconsulta = filtros_subconsulta or {} # índice do filtro na configuração -> relação "para muitos"
+        self.metricas_subconsulta = frozenset(metricas_subconsulta) # apelidos das agregações
+
+    def __repr__(self):
+        return (
+            f'<OtimizacaoConsulta: ativa={self.ativa}, distinct={self.usar_distinct}, metricas_sem_distinct={sorted(self.metricas_sem_distinct)}, '
+            f'filtros_subconsulta={self.filtros_subconsulta}, metricas_subconsulta={sorted(self.metricas_subconsulta)}>'
+        )
+
+# sem otimizações: DISTINCT, agregações com distinct=True e filtros com junções
+SEM_OTIMIZACAO = OtimizacaoConsulta(ativa=False)
+
+
+def otimizar_consulta(modelo, configuracao_consulta, traduzir_campo=lambda caminho: caminho):
+    """
+    Analisa a configuração (já validada) de uma consulta sobre o modelo informado.
+    :param traduzir_campo: Converte os caminhos da configuração para os do modelo (ex: tabela de resumos)
+    :return: OtimizacaoConsulta
+    """
+    if not obter_configuracao('OTIMIZACAO')['ATIVO']:
+        return SEM_OTIMIZACAO
+
+    metricas_subconsulta = []
+
+    if _subconsultas_necessarias(modelo, configuracao_consulta, traduzir_campo):
+        metricas_subconsulta = [
+            coluna['apelido'] for coluna in configuracao_consulta.get('colunas', [])
+            if coluna.get('agregacao') and _agregavel_em_subconsulta(modelo, coluna['agregacao'], traduzir_campo(coluna['campo']))
+        ]
+
+    otimizacao = _analisar(modelo, configuracao_consulta, traduzir_campo, metricas_subconsulta)
+
+    if otimizacao is None:
+        # as demais colunas ainda multiplicam as linhas: cada registro do modelo raiz seria considerado mais de uma vez
+        otimizacao = _analisar(modelo, configuracao_consulta, traduzir_campo, [])
+
+    return otimizacao
+
+def _analisar(modelo, configuracao_consulta, traduzir_campo, metricas_subconsulta):
+    """
+    Retorna a OtimizacaoConsulta com as agregações informadas calculadas em subconsultas, ou None se, ainda assim,
+    a consulta principal tiver junções "para muitos"
+    """
+    colunas = configuracao_consulta.get('colunas', [])
+    filtros = configuracao_consulta.get('filtros', [])
+    ordenacoes = configuracao_consulta.get('ordenacoes', [])
+    # as colunas e as ordenações são obtidas com junções, exceto as agregações calculadas em subconsultas
+    caminhos_juncoes = [
+        traduzir_campo(item['campo']) for item in colunas + ordenacoes
+        if not (item.get('agregacao') and item['apelido'] in metricas_subconsulta)
+    ]
+    # os filtros que aceitam nulos continuam na junção (também selecionam os registros sem nenhum relacionado) e,
+    # como as colunas, repetem o registro para cada relacionado que os atende
+    caminhos_juncoes += [
+        traduzir_campo(filtro['campo']) for filtro in filtros
+        if not filtro.get('agregacao') and _aceita_nulo(filtro)
+    ]
+    juncoes_para_muitos = {_obter_prefixo_para_muitos(modelo, caminho) for caminho in caminhos_juncoes} - {None}
+    filtros_subconsulta = {}
+
+    for indice, filtro in enumerate(filtros):
+        if filtro.get('agregacao') or _aceita_nulo(filtro):
+            continue
+
+        prefixo = _obter_prefixo_para_muitos(modelo, traduzir_campo(filtro['campo']))
+
+        if prefixo is None:
+            continue
+
+        if any(caminho == prefixo or caminho.startswith(f'{prefixo}__') for caminho in caminhos_juncoes):
+            # a relação também é usada pelas colunas ou ordenações: o filtro faz uma segunda junção com a mesma tabela,
+            # que o SELECT final (values/values_list) reaproveita no lugar da primeira; a consulta é mantida como está
+            return None if metricas_subconsulta else SEM_OTIMIZACAO
+
+        filtros_subconsulta[indice] = prefixo
+
+    multiplica_linhas = bool(juncoes_para_muitos)
+
+    if multiplica_linhas and metricas_subconsulta:
+        return None
+
+    metricas_sem_distinct = []
+
+    if not multiplica_linhas:
+        for coluna in colunas:
+            agregacao = coluna.get('agregacao')
+
+            if not agregacao or coluna['apelido'] in metricas_subconsulta:
+                continue
+
+            if agregacao in ('sum', 'avg') or (agregacao == 'count' and _campo_unico(modelo, traduzir_campo(coluna['campo']))):
+                metricas_sem_distinct.append(coluna['apelido'])
+
+    if any(coluna.get('agregacao') for coluna in colunas):
+        # o GROUP BY já retorna uma única linha por grupo
+        usar_distinct = False
+    else:
+        usar_distinct = multiplica_linhas or not any(
+            not coluna.get('truncamento') and _campo_unico(modelo, traduzir_campo(coluna['campo'])) for coluna in colunas
+        )
+
+    return OtimizacaoConsulta(usar_distinct, metricas_sem_distinct, filtros_subconsulta, metricas_subconsulta)
+
+def _aceita_nulo(filtro):
+    """Verifica se o filtro é atendido por um valor nulo (o Django trata exact=None e iexact=None como isnull=True)"""
+    operador = filtro['operador']
+    valor = filtro['valor']
+    return (operador == 'isnull' and bool(valor)) or (operador in ('exact', 'iexact') and valor is None)
+
+def criar_filtro_subconsulta(modelo, relacao, condicoes):
+    """
+    Cria o filtro equivalente às condições sobre uma relação "para muitos" do modelo, usando uma subconsulta.
+    As condições ficam em um mesmo filter(), como na junção, para que sejam atendidas pelo mesmo registro relacionado.
+    :param relacao: Caminho até a relação "para muitos" (ex: "atendimento_chamado" ou "base__unidades_operacionais")
+    :param condicoes: Lista de (consulta do ORM a partir do modelo, valor), ex: [("atendimento_chamado__risco__exact", "Azul")]
+    :return: Objeto Q
+    """
+    *caminho, nome_relacao = relacao.split('__')
+    modelo_relacao = modelo
+
+    for parte in caminho:
+        modelo_relacao = modelo_relacao._meta.get_field(parte).related_model
+
+    campo = modelo_relacao._meta.get_field(nome_relacao)
+
+    if not isinstance(campo, ManyToOneRel):
+        # demais relações (ex: muitos para muitos): subconsulta sobre o próprio modelo, com a junção
+        subconsulta = modelo._base_manager.filter(**dict(condicoes)).values('pk')
+        return Q(pk__in=subconsulta)
+
+    # chave estrangeira da tabela relacionada, sem passar pela tabela do modelo
+    inicio = len(relacao) + 2
+    subconsulta = campo.related_model._base_manager.filter(
+        **{consulta[inicio:]: valor for consulta, valor in condicoes}
+    ).values(campo.field.attname)
+    alvo = '__'.join([*caminho, campo.field.target_field.name])
+
+    return Q(**{f'{alvo}__in': subconsulta})
+
+def criar_metrica_subconsulta(modelo, nome_funcao, caminho):
+    """
+    Cria a agregação sobre uma relação inversa do modelo (ex: count de "atendimento_chamado__id"): uma subconsulta
+    correlacionada agrega os registros relacionados a cada registro do modelo e os valores são combinados por grupo
+    """
+    nome_relacao, _, campo_relacionado = caminho.partition('__')
+    relacao = modelo._meta.get_field(nome_relacao)
+    chave_estrangeira = relacao.field
+
+    def agregar_por_registro(funcao):
+        subconsulta = (
+            relacao.related_model._base_manager
+            .filter(**{chave_estrangeira.name: OuterRef(chave_estrangeira.target_field.name)})
+            .order_by()
+            .values(chave_estrangeira.name)
+            .annotate(valor=funcao(campo_relacionado))
+            .values('valor')
+        )
+        return Subquery(subconsulta)
+
+    if nome_funcao == 'count':
+        return Coalesce(Sum(agregar_por_registro(Count)), 0)
+    if nome_funcao == 'avg':
+        # a média de todos os registros relacionados do grupo, e não a média das médias de cada registro
+        soma = Cast(Sum(agregar_por_registro(Sum)), FloatField())
+        quantidade = Cast(NullIf(Sum(agregar_por_registro(Count)), 0), FloatField())
+        return soma / quantidade
+
+    funcao = {'sum': Sum, 'min': Min, 'max': Max}[nome_funcao]
+    return funcao(agregar_por_registro(funcao))
+
+def _subconsultas_necessarias(modelo, configuracao_consulta, traduzir_campo):
+    """
+    Verifica se as junções das agregações sobre relações "para muitos" multiplicam as linhas de outras agregações:
+    agregações sobre duas ou mais relações (produto cartesiano) ou sum/avg junto com uma dessas junções, que exigiriam
+    o distinct=True. Com uma única relação e apenas count/min/max, a junção dá o mesmo resultado e é mais rápida
+    do que uma subconsulta por registro
+    """
+    relacoes = set()
+    soma_ou_media = False
+
+    for coluna in configuracao_consulta.get('colunas', []):
+        if coluna.get('agregacao'):
+            relacao = _obter_prefixo_para_muitos(modelo, traduzir_campo(coluna['campo']))
+            relacoes.add(relacao)
+            soma_ou_media = soma_ou_media or coluna['agregacao'] in ('sum', 'avg')
+
+    relacoes_para_muitos = relacoes - {None}
+    return len(relacoes_para_muitos) > 1 or bool(relacoes_para_muitos and soma_ou_media)
+
+def _agregavel_em_subconsulta(modelo, nome_funcao, caminho):
+    """
+    Verifica se a agregação pode ser calculada com criar_metrica_subconsulta(): o caminho segue uma relação inversa
+    (chave estrangeira de outra tabela para o modelo) e, a partir dela, apenas relações "para um". O count só é
+    calculado assim sobre campos únicos da tabela relacionada, para que continue contando os valores diferentes
+    """
+    nome_relacao, _, campo_relacionado = caminho.partition('__')
+
+    if not campo_relacionado:
+        return False
+
+    try:
+        relacao = modelo._meta.get_field(nome_relacao)
+    except FieldDoesNotExist:
+        return False
+
+    if not (isinstance(relacao, ManyToOneRel) and relacao.one_to_many):
+        return False
+
+    if _obter_prefixo_para_muitos(relacao.related_model, campo_relacionado) is not None:
+        return False
+
+    return nome_funcao != 'count' or _campo_unico(relacao.related_model, campo_relacionado)
+
+def _obter_prefixo_para_muitos(modelo, caminho):
+    """
+    Retorna o trecho do caminho até a primeira relação "para muitos" (ex: "atendimento_chamado" em
+    "atendimento_chamado__risco"), ou None se o caminho só segue relações "para um"
+    """
+    partes = caminho.split('__')
+
+    for posicao, parte in enumerate(partes):
+        try:
+            campo = modelo._meta.get_field(parte)
+        except FieldDoesNotExist:
+            # campo desconhecido (ex: nome de consulta diferente do nome da relação): considera que multiplica as linhas
+            return '__'.join(partes[:posicao + 1])
+
+        if not campo.is_relation:
+            return None
+
+        if campo.one_to_many or campo.many_to_many:
+            return '__'.join(partes[:posicao + 1])
+
+        modelo = campo.related_model
+
+    return None
+
+def _campo_unico(modelo, caminho):
+    """Verifica se o caminho é um campo do próprio modelo com valores únicos e não nulos (ex: a chave primária)"""
+    if '__' in caminho:
+        return False
+
+    try:
+        campo = modelo._meta.get_field(caminho)
+    except FieldDoesNotExist:
+        return False
+
+    return campo.concrete and not campo.is_relation and campo.unique and not campo.null
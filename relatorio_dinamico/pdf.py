@@ -0,0 +1,122 @@
+"""
+Renderização do HTML final dos relatórios em PDF, via WeasyPrint.
+
+Como o mesmo HTML sempre gera o mesmo PDF, os arquivos gerados são guardados em um cache em disco,
+endereçado pelo conteúdo: o nome de cada arquivo é o hash do HTML, das folhas de estilo e da base_url.
+Quando o tamanho total do cache ultrapassa o limite, os arquivos usados há mais tempo são removidos.
+"""
+from functools import lru_cache
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+import os
+import tempfile
+import weasyprint
+from weasyprint import HTML, CSS
+from .configuracoes import obter_configuracao
+from .metricas import medir_etapa
+
+def gerar_chave_pdf(html_final, base_url, folhas_estilo=()):
+    """Retorna o hash que identifica o PDF gerado a partir do HTML, das folhas de estilo e da base_url"""
+    resumo = sha256()
+
+    # a versão do WeasyPrint também faz parte da chave, pois pode alterar o PDF gerado
+    for parte in (weasyprint.__version__, base_url, *folhas_estilo, html_final):
+        resumo.update(parte.encode('utf-8'))
+        resumo.update(b'\0')
+
+    return resumo.hexdigest()
+
+def renderizar_pdf(html_final, base_url, folhas_estilo=()):
+    """Converte o HTML final em PDF, retornando os bytes do arquivo"""
+    with medir_etapa('renderizacao_pdf'):
+        estilos = [CSS(string=folha) for folha in folhas_estilo]
+        return HTML(string=html_final, base_url=base_url).write_pdf(stylesheets=estilos)
+
+
+class CachePDF:
+    def __init__(self, diretorio, tamanho_maximo):
+        """
+        :param diretorio: Diretório onde os PDFs são armazenados
+        :param tamanho_maximo: Tamanho máximo, em bytes, da soma dos arquivos do cache
+        """
+        self._diretorio = Path(diretorio)
+        self._tamanho_maximo = tamanho_maximo
+        self._trava = Lock()
+
+    def _caminho(self, chave):
+        return self._diretorio / chave[:2] / f"{chave}.pdf"
+
+    def obter(self, chave):
+        caminho = self._caminho(chave)
+
+        try:
+            pdf = caminho.read_bytes()
+            # atualiza a data de modificação, usada para remover primeiro os arquivos usados há mais tempo
+            os.utime(caminho)
+        except FileNotFoundError:
+            return None
+        
+        return pdf
+
+    def armazenar(self, chave, pdf):
+        caminho = self._caminho(chave)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        # grava em um arquivo temporário e o renomeia, para que nenhum leitor encontre um arquivo incompleto
+        descritor, caminho_temporario = tempfile.mkstemp(dir=caminho.parent, suffix='.tmp')
+
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(pdf)
+
+        os.replace(caminho_temporario, caminho)
+        self._aplicar_limite()
+
+    def _aplicar_limite(self):
+        with self._trava:
+            arquivos = []
+
+            for caminho in self._diretorio.glob('*/*.pdf'):
+                try:
+                    info = caminho.stat()
+                except FileNotFoundError:
+                    continue
+
+                arquivos.append((info.st_mtime, info.st_size, caminho))
+
+            tamanho_total = sum(tamanho for _, tamanho, _ in arquivos)
+
+            for _, tamanho, caminho in sorted(arquivos):
+                if tamanho_total <= self._tamanho_maximo:
+                    break
+
+                caminho.unlink(missing_ok=True)
+                tamanho_total -= tamanho
+
+
+@lru_cache(maxsize=None)
+def obter_cache_pdf():
+    """Retorna o cache de PDFs definido nas configurações, ou None se estiver desativado"""
+    configuracao = obter_configuracao('CACHE_PDF')
+
+    if not configuracao['ATIVO']:
+        return None
+    
+    return CachePDF(configuracao['DIRETORIO'], configuracao['TAMANHO_MAXIMO'])
+
+def obter_pdf(html_final, base_url, folhas_estilo=(), chave=None):
+    """Retorna o PDF do cache ou o renderiza, armazenando o resultado"""
+    cache_pdf = obter_cache_pdf()
+
+    if cache_pdf is None:
+        return renderizar_pdf(html_final, base_url, folhas_estilo)
+
+    chave = chave or gerar_chave_pdf(html_final, base_url, folhas_estilo)
+
+    with medir_etapa('cache_pdf'):
+        pdf = cache_pdf.obter(chave)
+
+    if pdf is None:
+        pdf = renderizar_pdf(html_final, base_url, folhas_estilo)
+        cache_pdf.armazenar(chave, pdf)
+
+    return pdf
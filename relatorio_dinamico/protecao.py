@@ -0,0 +1,351 @@
+"""
+Proteção do banco contra consultas caras montadas no editor.
+
+Antes da execução, cada consulta é avaliada (avaliar_consulta):
+- pelos caminhos validados: a profundidade das junções (relações seguidas em um mesmo caminho) e a quantidade de
+  junções distintas, sendo as relações "para muitos" as que podem multiplicar as linhas;
+- pelo plano de execução (EXPLAIN): o custo total estimado pelo planejador no PostgreSQL; no SQLite, que não estima
+  custos, as linhas das tabelas lidas por completo (SCAN), multiplicadas pelas da primeira tabela quando a leitura completa
+  acontece dentro da junção ou de uma subconsulta correlacionada (a tabela é lida uma vez por linha externa).
+
+Consultas acima dos limites são recusadas com ConsultaRecusada. Consultas pesadas (acima de CUSTO_FILA ou com mais de uma
+relação "para muitos") esperam na fila por uma das vagas de CONSULTAS_PESADAS_SIMULTANEAS do processo e são recusadas
+com ConsultasOcupadas se a vaga não surgir em ESPERA_MAXIMA segundos. Durante a execução, cada instrução tem o tempo
+limitado (limitar_tempo): progress handler no SQLite e statement_timeout no PostgreSQL. No SQLite, o progress handler
+também interrompe as instruções das requisições canceladas pelo cliente (assincrono.py).
+"""
+from contextlib import contextmanager
+from functools import lru_cache
+from threading import BoundedSemaphore, Lock
+import re
+import time
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, OperationalError
+from django.db.models.lookups import Lookup
+from .analise import PADRAO_SQLITE, PADRAO_CUSTO
+from .configuracoes import obter_configuracao
+from .assincrono import RequisicaoCancelada, cancelamento_solicitado
+
+# linha do EXPLAIN QUERY PLAN retornada pelo QuerySet.explain(): "id pai não_usado detalhe"
+PADRAO_NO_SQLITE = re.compile(r'^(\d+) (\d+) \d+ (.*)$')
+# quantidade de instruções da máquina virtual do SQLite entre as verificações do tempo limite
+INSTRUCOES_POR_VERIFICACAO = 10000
+# tempo, em segundos, durante o qual a quantidade estimada de linhas de uma tabela é reaproveitada
+VALIDADE_LINHAS_TABELA = 60
+
+_linhas_tabelas = {} # (alias, tabela) -> (linhas, instante de expiração)
+_trava_linhas = Lock()
+
+class ConsultaRecusada(Exception):
+    """Lançada quando a consulta excede os limites de custo definidos em PROTECAO_CONSULTAS"""
+    pass
+
+class ConsultasOcupadas(Exception):
+    """Lançada quando uma consulta pesada não consegue uma vaga para ser executada dentro da espera máxima"""
+    pass
+
+class TempoConsultaExcedido(Exception):
+    """Lançada quando uma instrução da consulta é interrompida por exceder o tempo limite"""
+    pass
+
+
+class AvaliacaoConsulta:
+    """Estimativa do custo de uma consulta, a partir dos caminhos validados e do plano de execução"""
+    def __init__(self, profundidade=0, juncoes=0, relacoes_para_muitos=0, custo=None):
+        self.profundidade = profundidade
+        self.juncoes = juncoes
+        self.relacoes_para_muitos = relacoes_para_muitos
+        # custo estimado a partir do plano (None se o banco não permite estimá-lo)
+        self.custo = custo
+
+    def e_pesada(self, configuracao):
+        if self.relacoes_para_muitos > 1:
+            return True
+        return self.custo is not None and configuracao['CUSTO_FILA'] is not None and self.custo > configuracao['CUSTO_FILA']
+
+    def como_dicionario(self):
+        return {
+            'profundidade': self.profundidade,
+            'juncoes': self.juncoes,
+            'relacoes_para_muitos': self.relacoes_para_muitos,
+            'custo': self.custo,
+        }
+
+    def __repr__(self):
+        return f'<AvaliacaoConsulta: {self.como_dicionario()}>'
+
+
+def avaliar_caminhos(configuracao_consulta):
+    """Avalia as junções exigidas pelos caminhos das colunas, dos filtros e das ordenações de uma consulta validada"""
+    modelo_raiz = apps.get_model(configuracao_consulta['app_model'])
+    elementos = configuracao_consulta.get('colunas', []) + configuracao_consulta.get('filtros', []) + configuracao_consulta.get('ordenacoes', [])
+    juncoes = set()
+    para_muitos = set()
+    profundidade = 0
+
+    for elemento in elementos:
+        modelo = modelo_raiz
+        partes = elemento['campo'].split('__')
+
+        for posicao, parte in enumerate(partes):
+            try:
+                campo = modelo._meta.get_field(parte)
+            except FieldDoesNotExist:
+                break
+
+            if not campo.is_relation or posicao == len(partes) - 1:
+                # o último trecho é lido na própria tabela (ex: "base" em "base" é a coluna base_id)
+                break
+
+            prefixo = '__'.join(partes[:posicao + 1])
+            juncoes.add(prefixo)
+
+            if campo.one_to_many or campo.many_to_many:
+                para_muitos.add(prefixo)
+
+            profundidade = max(profundidade, posicao + 1)
+            modelo = campo.related_model
+
+    return AvaliacaoConsulta(profundidade, len(juncoes), len(para_muitos))
+
+def estimar_custo_plano(queryset):
+    """Retorna o custo estimado da consulta a partir do EXPLAIN, ou None se o banco não é suportado"""
+    conexao = connections[queryset.db]
+
+    if conexao.vendor == 'postgresql':
+        correspondencia = PADRAO_CUSTO.search(queryset.explain())
+        return float(correspondencia.group(1)) if correspondencia else None
+
+    if conexao.vendor != 'sqlite':
+        return None
+
+    tabelas = _mapear_apelidos(queryset.query)
+    nos = {} # id do nó do plano -> (id do nó pai, detalhe)
+    custo = 0
+    linhas_externas = None # linhas do laço mais externo da consulta principal
+
+    for linha in queryset.explain().splitlines():
+        no = PADRAO_NO_SQLITE.match(linha)
+        if not no:
+            continue
+
+        id_no, id_pai, detalhe = no.groups()
+        nos[id_no] = (id_pai, detalhe)
+        correspondencia = PADRAO_SQLITE.search(detalhe)
+
+        if not correspondencia:
+            continue
+
+        operacao, apelido, restante = correspondencia.groups()
+        subconsulta = _obter_subconsulta(nos, id_pai)
+
+        if operacao == 'SEARCH' and 'AUTOMATIC' not in restante:
+            if subconsulta is None and linhas_externas is None:
+                linhas_externas = 1
+            continue
+        if apelido not in tabelas:
+            continue
+
+        # apelidos repetidos em subconsultas diferentes (ex: U0) são estimados pela maior tabela
+        linhas = max(_estimar_linhas_tabela(conexao, tabela) for tabela in tabelas[apelido])
+
+        if 'AUTOMATIC' in restante:
+            # o índice temporário é criado com uma leitura completa da tabela
+            custo += linhas
+        elif subconsulta is None:
+            # SCAN percorre a tabela, ou um de seus índices, por completo; dentro da junção, uma vez por linha externa
+            if linhas_externas is None:
+                linhas_externas = linhas
+                custo += linhas
+            else:
+                custo += linhas_externas * linhas
+        elif subconsulta.startswith('CORRELATED'):
+            # subconsultas correlacionadas são executadas uma vez por linha da consulta principal
+            custo += (linhas_externas or 1) * linhas
+        else:
+            custo += linhas
+
+    return float(custo)
+
+def _obter_subconsulta(nos, id_no):
+    """Retorna o detalhe do nó de subconsulta que contém o nó do plano, ou None se ele pertence à consulta principal"""
+    while id_no in nos:
+        id_pai, detalhe = nos[id_no]
+
+        if 'SUBQUERY' in detalhe:
+            return detalhe
+
+        id_no = id_pai
+
+    return None
+
+def _mapear_apelidos(query, tabelas=None):
+    """Retorna um dicionário {apelido: {tabelas}} com os apelidos da consulta e de suas subconsultas"""
+    tabelas = {} if tabelas is None else tabelas
+
+    for apelido, juncao in query.alias_map.items():
+        tabelas.setdefault(apelido, set()).add(juncao.table_name)
+
+    expressoes = [query.where, *query.annotations.values()]
+
+    while expressoes:
+        expressao = expressoes.pop()
+        interna = expressao if hasattr(expressao, 'alias_map') else getattr(expressao, 'query', None)
+
+        if hasattr(interna, 'alias_map'):
+            _mapear_apelidos(interna, tabelas)
+        elif isinstance(expressao, Lookup):
+            expressoes.extend([expressao.lhs, expressao.rhs])
+        elif hasattr(expressao, 'children'):
+            expressoes.extend(expressao.children)
+        elif hasattr(expressao, 'get_source_expressions'):
+            expressoes.extend(expressao.get_source_expressions())
+
+    return tabelas
+
+def _estimar_linhas_tabela(conexao, tabela):
+    """Estima as linhas da tabela pelo maior rowid, sem percorrê-la (exclusões fazem a estimativa exceder o real)"""
+    chave = (conexao.alias, tabela)
+    agora = time.monotonic()
+
+    with _trava_linhas:
+        item = _linhas_tabelas.get(chave)
+
+    if item and item[1] > agora:
+        return item[0]
+
+    with conexao.cursor() as cursor:
+        cursor.execute(f'SELECT MAX(rowid) FROM {conexao.ops.quote_name(tabela)}')
+        linhas = cursor.fetchone()[0] or 0
+
+    with _trava_linhas:
+        _linhas_tabelas[chave] = (linhas, agora + VALIDADE_LINHAS_TABELA)
+
+    return linhas
+
+def limpar_estimativas():
+    """Descarta as quantidades de linhas das tabelas estimadas anteriormente"""
+    with _trava_linhas:
+        _linhas_tabelas.clear()
+
+def avaliar_consulta(configuracao_consulta, queryset):
+    """
+    Avalia a consulta e a recusa se ela exceder os limites de PROTECAO_CONSULTAS.
+    :param configuracao_consulta: Configuração de consulta validada
+    :param queryset: QuerySet montado para a consulta, usado no EXPLAIN
+    :return: AvaliacaoConsulta, ou None se a proteção está desativada
+    :raises ConsultaRecusada: Se a consulta excede a profundidade, as junções ou o custo máximos
+    """
+    configuracao = obter_configuracao('PROTECAO_CONSULTAS')
+
+    if not configuracao['ATIVO']:
+        return None
+
+    avaliacao = avaliar_caminhos(configuracao_consulta)
+
+    if configuracao['PROFUNDIDADE_MAXIMA'] is not None and avaliacao.profundidade > configuracao['PROFUNDIDADE_MAXIMA']:
+        raise ConsultaRecusada(
+            f"A consulta segue {avaliacao.profundidade} relações em um mesmo campo (máximo: {configuracao['PROFUNDIDADE_MAXIMA']})."
+        )
+    if configuracao['JUNCOES_MAXIMAS'] is not None and avaliacao.juncoes > configuracao['JUNCOES_MAXIMAS']:
+        raise ConsultaRecusada(
+            f"A consulta usa {avaliacao.juncoes} tabelas relacionadas (máximo: {configuracao['JUNCOES_MAXIMAS']})."
+        )
+
+    # o EXPLAIN só é executado quando o custo é usado
+    if configuracao['CUSTO_MAXIMO'] is not None or configuracao['CUSTO_FILA'] is not None:
+        avaliacao.custo = estimar_custo_plano(queryset)
+
+    if avaliacao.custo is not None and configuracao['CUSTO_MAXIMO'] is not None and avaliacao.custo > configuracao['CUSTO_MAXIMO']:
+        raise ConsultaRecusada(
+            f"O custo estimado da consulta ({avaliacao.custo:.0f}) excede o máximo permitido ({configuracao['CUSTO_MAXIMO']:.0f}). "
+            "Adicione filtros ou agrupamentos, ou remova colunas de tabelas relacionadas."
+        )
+
+    return avaliacao
+
+@lru_cache(maxsize=None)
+def _obter_vagas(quantidade):
+    return BoundedSemaphore(quantidade)
+
+@contextmanager
+def aguardar_vaga(configuracao=None):
+    """Ocupa uma das vagas de consultas pesadas do processo durante o bloco, esperando no máximo ESPERA_MAXIMA segundos"""
+    configuracao = configuracao or obter_configuracao('PROTECAO_CONSULTAS')
+    vagas = _obter_vagas(configuracao['CONSULTAS_PESADAS_SIMULTANEAS'])
+
+    if not vagas.acquire(timeout=configuracao['ESPERA_MAXIMA']):
+        raise ConsultasOcupadas(
+            f"Há muitas consultas pesadas em execução; tente novamente em instantes "
+            f"(espera máxima de {configuracao['ESPERA_MAXIMA']} segundos excedida)."
+        )
+
+    try:
+        yield
+    finally:
+        vagas.release()
+
+@contextmanager
+def limitar_tempo(alias, segundos):
+    """Interrompe as instruções executadas na conexão do banco durante o bloco que ultrapassarem o tempo limite"""
+    conexao = connections[alias]
+
+    if not segundos or conexao.vendor not in ('sqlite', 'postgresql'):
+        yield
+        return
+
+    conexao.ensure_connection()
+    # dentro de uma transação, o limite do PostgreSQL vale apenas até o seu fim (e não pode ser desfeito após um erro)
+    somente_transacao = conexao.in_atomic_block
+
+    if conexao.vendor == 'sqlite':
+        limite = time.monotonic() + segundos
+        # um valor verdadeiro retornado pelo progress handler interrompe a instrução em execução;
+        # a instrução também é interrompida quando o cliente da view assíncrona se desconecta
+        conexao.connection.set_progress_handler(lambda: time.monotonic() > limite or cancelamento_solicitado(), INSTRUCOES_POR_VERIFICACAO)
+    else:
+        with conexao.cursor() as cursor:
+            cursor.execute('SELECT set_config(%s, %s, %s)', ['statement_timeout', str(int(segundos * 1000)), somente_transacao])
+
+    try:
+        yield
+    except OperationalError as e:
+        if _foi_interrompida(e, conexao.vendor) and cancelamento_solicitado():
+            raise RequisicaoCancelada("A consulta foi interrompida pelo cancelamento da requisição.") from e
+        if _foi_interrompida(e, conexao.vendor):
+            raise TempoConsultaExcedido(f"A consulta foi interrompida por exceder o tempo limite de {segundos} segundos.") from e
+        raise
+    finally:
+        if conexao.vendor == 'sqlite':
+            conexao.connection.set_progress_handler(None, 0)
+        elif not somente_transacao:
+            with conexao.cursor() as cursor:
+                cursor.execute('RESET statement_timeout')
+
+def _foi_interrompida(erro, vendor):
+    if vendor == 'sqlite':
+        return 'interrupted' in str(erro)
+    # 57014: query_canceled
+    return getattr(erro.__cause__, 'pgcode', None) == '57014' or getattr(erro.__cause__, 'sqlstate', None) == '57014'
+
+@contextmanager
+def proteger_execucao(avaliacao, alias):
+    """
+    Executa o bloco com as proteções de PROTECAO_CONSULTAS: consultas pesadas esperam por uma vaga e cada instrução
+    tem o tempo limitado.
+    :param avaliacao: AvaliacaoConsulta retornada por avaliar_consulta() (None não aplica as proteções)
+    :param alias: Banco onde a consulta é executada
+    """
+    if avaliacao is None:
+        yield
+        return
+
+    configuracao = obter_configuracao('PROTECAO_CONSULTAS')
+
+    if avaliacao.e_pesada(configuracao):
+        with aguardar_vaga(configuracao), limitar_tempo(alias, configuracao['TEMPO_LIMITE']):
+            yield
+    else:
+        with limitar_tempo(alias, configuracao['TEMPO_LIMITE']):
+            yield
@@ -0,0 +1,194 @@
+"""
+Resumos diários pré-agregados de chamados.
+
+A tabela ResumoChamado guarda, para cada dia de criado_em, a quantidade de chamados e o mínimo/máximo do número
+de vítimas por base, cidade, bairro e status. Os resumos do dia de um chamado são recalculados sempre que ele é
+salvo ou excluído (e também os do dia anterior, se criado_em mudou de dia); o comando "atualizar_resumos" recalcula
+todos (ou os últimos dias), cobrindo alterações feitas sem sinais, como QuerySet.update(), e invalida os resultados
+de Chamado no cache de resultados.
+
+Consultas sobre Chamado que usam apenas essas dimensões, truncamentos de criado_em e as métricas disponíveis
+são respondidas a partir dos resumos. Os truncamentos por mês e ano são calculados sobre o dia do resumo.
+As demais agregações (sum e avg) não podem ser obtidas dos resumos.
+"""
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum, Min, Max
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.utils import timezone
+from .configuracoes import obter_configuracao
+from .models import ResumoChamado
+
+APP_MODEL_CHAMADO = 'chamado.Chamado'
+CAMPO_DATA = 'criado_em'
+DIMENSOES = ('status', 'cidade', 'bairro', 'base')
+TRUNCAMENTOS = ('truncday', 'truncmonth', 'truncyear')
+
+# (agregação, campo em Chamado) -> expressão equivalente sobre ResumoChamado
+METRICAS = {
+    ('count', 'id'): lambda: Coalesce(Sum('quantidade'), 0),
+    ('min', 'numero_vitimas'): lambda: Min('minimo_vitimas'),
+    ('max', 'numero_vitimas'): lambda: Max('maximo_vitimas'),
+}
+
+
+class ReescritaResumo:
+    """Traduz os campos e as métricas de uma consulta sobre Chamado para a tabela de resumos"""
+    modelo = ResumoChamado
+
+    def traduzir_campo(self, caminho):
+        return 'dia' if caminho == CAMPO_DATA else caminho
+
+    def criar_metrica(self, nome_funcao, caminho):
+        return METRICAS[(nome_funcao, caminho)]()
+
+
+def obter_reescrita_resumo(configuracao_consulta):
+    """Retorna uma ReescritaResumo se a consulta (já validada) puder ser respondida pelos resumos; caso contrário, None"""
+    if not obter_configuracao('RESUMOS')['ATIVO'] or configuracao_consulta.get('app_model') != APP_MODEL_CHAMADO:
+        return None
+
+    colunas = configuracao_consulta.get('colunas', [])
+
+    if not any(coluna.get('agregacao') for coluna in colunas):
+        return None
+
+    itens = colunas + configuracao_consulta.get('filtros', []) + configuracao_consulta.get('ordenacoes', [])
+
+    for item in itens:
+        if not _item_compativel(item):
+            return None
+
+    return ReescritaResumo()
+
+def _item_compativel(item):
+    """Verifica se uma coluna, filtro ou ordenação usa apenas dimensões, truncamentos de criado_em ou métricas dos resumos"""
+    campo = item['campo']
+
+    if item.get('agregacao'):
+        return (item['agregacao'], campo) in METRICAS
+    if item.get('truncamento'):
+        return campo == CAMPO_DATA and item['truncamento'] in TRUNCAMENTOS
+
+    return _campo_dimensao(campo)
+
+def _campo_dimensao(campo):
+    if campo in DIMENSOES:
+        return True
+
+    # campos da própria base (ex: base__nome), sem seguir outras relações
+    prefixo, _, resto = campo.partition('__')
+    return prefixo == 'base' and bool(resto) and '__' not in resto
+
+def _agregar_chamados(queryset):
+    return (
+        queryset
+        .annotate(dia=TruncDate(CAMPO_DATA))
+        .values('dia', 'base', 'cidade', 'bairro', 'status')
+        .annotate(quantidade=Count('id'), minimo_vitimas=Min('numero_vitimas'), maximo_vitimas=Max('numero_vitimas'))
+        .order_by()
+    )
+
+def _criar_resumos(linhas):
+    resumos = (
+        ResumoChamado(
+            dia=linha['dia'], base_id=linha['base'], cidade=linha['cidade'], bairro=linha['bairro'], status=linha['status'],
+            quantidade=linha['quantidade'], minimo_vitimas=linha['minimo_vitimas'], maximo_vitimas=linha['maximo_vitimas'],
+        )
+        for linha in linhas
+    )
+    return len(ResumoChamado.objects.bulk_create(resumos, batch_size=1000))
+
+def _inicio_dia(dia):
+    inicio = datetime.combine(dia, time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+def _obter_modelo_chamado():
+    from django.apps import apps
+    return apps.get_model(APP_MODEL_CHAMADO)
+
+def _travar_chamados(chamados):
+    """
+    Bloqueia (SELECT ... FOR UPDATE, em ordem de chave primária) os chamados cujos resumos serão recalculados, até o fim
+    da transação. Dois recálculos do mesmo dia são executados um após o outro: sem isso, cada um apagaria os resumos
+    antes de o outro gravar os seus e o dia ficaria com as linhas duplicadas. No SQLite, que não tem FOR UPDATE,
+    as gravações já são serializadas pelo próprio banco.
+    """
+    list(chamados.select_for_update().order_by('pk').values_list('pk', flat=True))
+
+def atualizar_dia(dia):
+    """Recalcula os resumos de um dia (no fuso horário atual, o mesmo usado pelos truncamentos de data)"""
+    inicio = _inicio_dia(dia)
+    chamados = _obter_modelo_chamado().objects.filter(criado_em__gte=inicio, criado_em__lt=_inicio_dia(dia + timedelta(days=1)))
+
+    with transaction.atomic():
+        _travar_chamados(chamados)
+        ResumoChamado.objects.filter(dia=dia).delete()
+        return _criar_resumos(_agregar_chamados(chamados))
+
+def atualizar_resumos(desde=None):
+    """
+    Recalcula os resumos a partir de uma data (inclusive) ou, se desde for None, todos eles.
+    :return: Quantidade de linhas de resumo gravadas
+    """
+    chamados = _obter_modelo_chamado().objects.all()
+    resumos = ResumoChamado.objects.all()
+
+    if desde:
+        chamados = chamados.filter(criado_em__gte=_inicio_dia(desde))
+        resumos = resumos.filter(dia__gte=desde)
+
+    with transaction.atomic():
+        _travar_chamados(chamados)
+        resumos.delete()
+        quantidade = _criar_resumos(_agregar_chamados(chamados).iterator())
+
+    # os resultados em cache das consultas respondidas pelos resumos ficam associados a Chamado
+    from .cache import obter_cache_resultados
+    cache_resultados = obter_cache_resultados()
+
+    if cache_resultados:
+        cache_resultados.invalidar_modelo(APP_MODEL_CHAMADO)
+
+    return quantidade
+
+def _obter_dia(data):
+    return timezone.localdate(data) if settings.USE_TZ else data.date()
+
+def _registrar_dia_anterior(sender, instance, **kwargs):
+    """Guarda o dia de criado_em gravado no banco antes da alteração, para que o resumo desse dia também seja recalculado"""
+    instance._dia_resumo_anterior = None
+
+    if not obter_configuracao('RESUMOS')['ATIVO'] or instance.pk is None:
+        return
+
+    criado_em = sender._default_manager.filter(pk=instance.pk).values_list(CAMPO_DATA, flat=True).first()
+
+    if criado_em is not None:
+        instance._dia_resumo_anterior = _obter_dia(criado_em)
+
+def _atualizar_resumo_chamado(sender, instance, **kwargs):
+    if not obter_configuracao('RESUMOS')['ATIVO']:
+        return
+
+    dias = {getattr(instance, '_dia_resumo_anterior', None)}
+
+    if instance.criado_em is not None:
+        dias.add(_obter_dia(instance.criado_em))
+
+    for dia in dias - {None}:
+        atualizar_dia(dia)
+
+def conectar_sinais_resumos():
+    """Mantém os resumos atualizados a cada chamado salvo ou excluído"""
+    try:
+        modelo = _obter_modelo_chamado()
+    except LookupError:
+        return
+
+    uid = 'relatorio_dinamico_atualizar_resumos'
+    pre_save.connect(_registrar_dia_anterior, sender=modelo, dispatch_uid=uid)
+    post_save.connect(_atualizar_resumo_chamado, sender=modelo, dispatch_uid=uid)
+    post_delete.connect(_atualizar_resumo_chamado, sender=modelo, dispatch_uid=uid)
@@ -0,0 +1,122 @@
+"""
+Banco de dados das consultas dos relatórios.
+
+As consultas dos relatórios podem ser executadas em outro banco (uma réplica de leitura ou um banco analítico),
+para não competir com as gravações dos chamados no banco principal. O ConstrutorConsulta marca seus QuerySets
+com a dica DICA_BANCO e o RoteadorRelatorios (DATABASE_ROUTERS) escolhe o banco de cada leitura marcada:
+o banco solicitado, se estiver disponível e suficientemente atualizado, ou o banco principal (fallback).
+
+O atraso de um banco é medido pelo MarcoSincronizacao, um registro com o horário da última sincronização que é
+gravado no banco principal e chega ao banco dos relatórios junto com os dados (comando sincronizar_banco_relatorios).
+O resultado de cada verificação é reaproveitado por INTERVALO_VERIFICACAO segundos.
+"""
+from threading import Lock
+import logging
+import time
+from django.db import connections, DEFAULT_DB_ALIAS, DatabaseError
+from django.utils import timezone
+from .configuracoes import obter_configuracao
+
+# dica dos QuerySets cujas leituras podem ser feitas no banco dos relatórios; o valor é o alias solicitado
+# (None usa o alias das configurações)
+DICA_BANCO = 'banco_relatorio'
+
+logger = logging.getLogger(__name__)
+
+_verificacoes = {} # alias -> (alias escolhido, instante de expiração)
+_trava = Lock()
+
+class BancoIndisponivel(Exception):
+    """Lançada quando o banco dos relatórios não pode ser usado e o fallback para o banco principal está desativado"""
+    pass
+
+
+def medir_atraso(alias):
+    """Retorna o atraso, em segundos, do banco em relação ao banco principal, ou None se ele nunca foi sincronizado"""
+    from .models import MarcoSincronizacao
+
+    sincronizado_em = MarcoSincronizacao.objects.using(alias).values_list('sincronizado_em', flat=True).first()
+
+    if sincronizado_em is None:
+        return None
+
+    return max(0.0, (timezone.now() - sincronizado_em).total_seconds())
+
+def registrar_sincronizacao(alias=DEFAULT_DB_ALIAS):
+    """Grava o horário atual como o da última sincronização"""
+    from .models import MarcoSincronizacao
+
+    MarcoSincronizacao.objects.using(alias).update_or_create(pk=1, defaults={'sincronizado_em': timezone.now()})
+
+def _verificar_banco(alias, atraso_maximo):
+    """Retorna None se o banco pode ser usado ou o motivo pelo qual não pode"""
+    if alias not in connections.settings:
+        return "não está definido em DATABASES"
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+        if atraso_maximo is not None:
+            atraso = medir_atraso(alias)
+
+            if atraso is None:
+                return "nunca foi sincronizado"
+            if atraso > atraso_maximo:
+                return f"está {atraso:.0f} segundos atrasado (máximo: {atraso_maximo})"
+    except DatabaseError as e:
+        return f"está indisponível ({e})"
+
+    return None
+
+def escolher_banco(alias=None):
+    """
+    Retorna o alias do banco onde as consultas dos relatórios devem ser executadas.
+    :param alias: Banco solicitado; None usa o ALIAS das configurações (BANCO_RELATORIOS)
+    :raises BancoIndisponivel: Se o banco solicitado não pode ser usado e o FALLBACK está desativado
+    """
+    configuracao = obter_configuracao('BANCO_RELATORIOS')
+    alias = alias or configuracao['ALIAS']
+
+    if not alias or alias == DEFAULT_DB_ALIAS:
+        return DEFAULT_DB_ALIAS
+
+    agora = time.monotonic()
+
+    with _trava:
+        verificacao = _verificacoes.get(alias)
+
+    if verificacao and verificacao[1] > agora:
+        return verificacao[0]
+
+    motivo = _verificar_banco(alias, configuracao['ATRASO_MAXIMO'])
+
+    if motivo is None:
+        escolhido = alias
+    elif configuracao['FALLBACK']:
+        logger.warning("O banco '%s' %s; as consultas dos relatórios serão executadas no banco principal.", alias, motivo)
+        escolhido = DEFAULT_DB_ALIAS
+    else:
+        raise BancoIndisponivel(f"O banco '{alias}' {motivo}.")
+
+    with _trava:
+        _verificacoes[alias] = (escolhido, agora + configuracao['INTERVALO_VERIFICACAO'])
+
+    return escolhido
+
+def limpar_verificacoes():
+    """Descarta as verificações armazenadas; o próximo uso de cada banco o verifica novamente"""
+    with _trava:
+        _verificacoes.clear()
+
+
+class RoteadorRelatorios:
+    """
+    Roteador de bancos de dados (DATABASE_ROUTERS): as leituras marcadas com DICA_BANCO vão para o banco escolhido
+    por escolher_banco(); as demais leituras e todas as gravações seguem os outros roteadores ou o banco principal.
+    """
+    def db_for_read(self, model, **hints):
+        if DICA_BANCO in hints:
+            return escolher_banco(hints[DICA_BANCO])
+
+        return None
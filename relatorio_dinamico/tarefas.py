@@ -0,0 +1,170 @@
+"""
+Fila de geração de PDFs em segundo plano.
+
+As tarefas ficam na tabela de TarefaPDF. O comando "python manage.py processar_pdfs" reserva as tarefas pendentes,
+executa as consultas e monta o HTML no próprio processo e envia a renderização com o WeasyPrint para um pool de processos,
+de modo que vários PDFs são renderizados ao mesmo tempo, um por núcleo.
+"""
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+import logging
+import os
+import time
+from django.core.exceptions import FieldError, ValidationError
+from django.db import close_old_connections
+from django.utils import timezone
+from setup.esquema import esquema_bd
+from .cache import obter_cache_resultados, obter_plano_relatorio
+from .configuracoes import obter_configuracao
+from .construtores import ConstrutorHTML, ConstrutorConsulta, ValidadorConsulta, TempoLimiteExcedido
+from .models import TarefaPDF
+from .protecao import ConsultaRecusada, ConsultasOcupadas, TempoConsultaExcedido
+from .roteamento import BancoIndisponivel
+from .pdf import renderizar_pdf, gerar_chave_pdf, obter_cache_pdf
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_TEMPLATE = "_pdf_dinamico.html"
+
+def enfileirar_tarefa(base_url, html='', relatorio=None):
+    """Cria uma tarefa pendente para gerar o PDF de um relatório salvo ou de um HTML do editor"""
+    return TarefaPDF.objects.create(relatorio=relatorio, html=html, base_url=base_url)
+
+def reservar_tarefas(quantidade):
+    """
+    Marca até 'quantidade' tarefas pendentes como 'processando' e as retorna.
+    Cada tarefa é reservada com um UPDATE condicional, então vários processos podem consumir a mesma fila.
+    """
+    reservadas = []
+    candidatas = (
+        TarefaPDF.objects.filter(status=TarefaPDF.PENDENTE)
+        .order_by('criado_em')
+        .values_list('id', flat=True)[:quantidade]
+    )
+
+    for id_tarefa in candidatas:
+        atualizadas = TarefaPDF.objects.filter(id=id_tarefa, status=TarefaPDF.PENDENTE).update(
+            status=TarefaPDF.PROCESSANDO, iniciado_em=timezone.now()
+        )
+
+        if atualizadas:
+            reservadas.append(TarefaPDF.objects.select_related('relatorio').get(id=id_tarefa))
+
+    return reservadas
+
+def liberar_tarefas_presas(tempo_maximo):
+    """Devolve à fila as tarefas que estão em processamento há mais tempo do que o permitido (ex: o processo foi encerrado)"""
+    limite = timezone.now() - timedelta(seconds=tempo_maximo)
+    return TarefaPDF.objects.filter(status=TarefaPDF.PROCESSANDO, iniciado_em__lt=limite).update(
+        status=TarefaPDF.PENDENTE, iniciado_em=None
+    )
+
+def remover_tarefas_antigas(retencao):
+    """Remove as tarefas concluídas ou com erro há mais de 'retencao' segundos, junto com os PDFs gravados na tabela"""
+    limite = timezone.now() - timedelta(seconds=retencao)
+    removidas, _ = TarefaPDF.objects.filter(
+        status__in=[TarefaPDF.CONCLUIDA, TarefaPDF.ERRO], concluido_em__lt=limite
+    ).delete()
+    return removidas
+
+def gerar_html_tarefa(tarefa):
+    """Executa as consultas do relatório da tarefa e retorna o HTML final"""
+    banco = tarefa.relatorio.banco if tarefa.relatorio else None
+    construtor_consulta = ConstrutorConsulta(cache_resultados=obter_cache_resultados(), banco=banco or None)
+
+    if tarefa.relatorio:
+        plano = obter_plano_relatorio(tarefa.relatorio, esquema_bd, CAMINHO_TEMPLATE)
+        construtor_html = ConstrutorHTML.a_partir_do_plano(plano, construtor_consulta)
+    else:
+        construtor_html = ConstrutorHTML(tarefa.html, CAMINHO_TEMPLATE, ValidadorConsulta(esquema_bd), construtor_consulta)
+
+    return construtor_html.gerar_html()
+
+def _registrar_erro(tarefa, erro):
+    tarefa.status = TarefaPDF.ERRO
+    tarefa.erro = str(erro)
+    tarefa.concluido_em = timezone.now()
+    tarefa.save(update_fields=['status', 'erro', 'concluido_em'])
+
+def _registrar_pdf(tarefa, pdf):
+    tarefa.status = TarefaPDF.CONCLUIDA
+    tarefa.pdf = pdf
+    tarefa.concluido_em = timezone.now()
+    tarefa.save(update_fields=['status', 'pdf', 'concluido_em'])
+
+def processar_tarefas(num_processos=None, intervalo=None, uma_vez=False):
+    """
+    Consome a fila de tarefas continuamente.
+    :param num_processos: Número de processos que renderizam PDFs ao mesmo tempo
+    :param intervalo: Tempo de espera, em segundos, quando não há tarefas
+    :param uma_vez: Se True, termina quando não houver mais tarefas pendentes nem em andamento
+    """
+    configuracao = obter_configuracao('TAREFAS_PDF')
+    num_processos = num_processos or configuracao['PROCESSOS'] or os.cpu_count()
+    intervalo = intervalo or configuracao['INTERVALO']
+    em_andamento = {} # futuro -> (tarefa, chave do PDF)
+    cache_pdf = obter_cache_pdf()
+
+    with ProcessPoolExecutor(max_workers=num_processos) as executor:
+        while True:
+            close_old_connections()
+            liberar_tarefas_presas(configuracao['TEMPO_MAXIMO'])
+
+            if configuracao['RETENCAO'] is not None:
+                remover_tarefas_antigas(configuracao['RETENCAO'])
+
+            vagas = num_processos - len(em_andamento)
+            
+            for tarefa in reservar_tarefas(vagas) if vagas > 0 else []:
+                try:
+                    html_final = gerar_html_tarefa(tarefa)
+                except ConsultasOcupadas:
+                    # a tarefa volta para a fila e é tentada novamente quando houver vagas para as consultas pesadas
+                    TarefaPDF.objects.filter(id=tarefa.id).update(status=TarefaPDF.PENDENTE, iniciado_em=None)
+                    continue
+                except (FieldError, ValidationError, ValueError, TempoLimiteExcedido, ConsultaRecusada, TempoConsultaExcedido) as e:
+                    _registrar_erro(tarefa, e)
+                    continue
+                except BancoIndisponivel as e:
+                    # sem o fallback, a tarefa não volta para a fila: seria reservada novamente a cada rodada enquanto
+                    # o banco estiver indisponível; o erro informa o motivo e a geração pode ser solicitada novamente
+                    logger.warning("Tarefa %s não processada: %s", tarefa.id, e)
+                    _registrar_erro(tarefa, e)
+                    continue
+                except Exception as e:
+                    # qualquer outro erro (ex: configuração salva malformada ou falha do banco) encerra apenas esta tarefa;
+                    # se interrompesse o processo, a tarefa seria devolvida à fila e o interromperia novamente
+                    logger.exception("Erro ao gerar o HTML da tarefa %s", tarefa.id)
+                    _registrar_erro(tarefa, e)
+                    continue
+
+                chave = gerar_chave_pdf(html_final, tarefa.base_url)
+                pdf = cache_pdf.obter(chave) if cache_pdf else None
+
+                if pdf is not None:
+                    _registrar_pdf(tarefa, pdf)
+                else:
+                    em_andamento[executor.submit(renderizar_pdf, html_final, tarefa.base_url)] = (tarefa, chave)
+
+            if not em_andamento:
+                if uma_vez:
+                    return
+                
+                time.sleep(intervalo)
+                continue
+
+            concluidos, _ = wait(em_andamento, timeout=intervalo, return_when=FIRST_COMPLETED)
+
+            for futuro in concluidos:
+                tarefa, chave = em_andamento.pop(futuro)
+
+                try:
+                    pdf = futuro.result()
+
+                    if cache_pdf:
+                        cache_pdf.armazenar(chave, pdf)
+
+                    _registrar_pdf(tarefa, pdf)
+                except Exception as e:
+                    logger.exception("Erro ao renderizar o PDF da tarefa %s", tarefa.id)
+                    _registrar_erro(tarefa, e)
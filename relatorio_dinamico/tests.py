@@ -1,8 +1,57 @@
-from django.test import TestCase
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.exceptions import ValidationError
-from .construtores import ValidadorConsulta, ConstrutorConsulta
-from setup.esquema import esquema_bd
+from .construtores import ValidadorConsulta, ConstrutorConsulta, ConstrutorHTML, IndiceEsquema, TempoLimiteExcedido, obter_executor_consultas, obter_indice_esquema
+from .cache import CacheResultados, BackendMemoria, obter_cache_planos, obter_esquema_serializado, obter_plano_relatorio
+from .models import Relatorio, TarefaPDF, ResumoChamado, MarcoSincronizacao
+from .tarefas import enfileirar_tarefa, processar_tarefas, remover_tarefas_antigas, reservar_tarefas
+from .pdf import CachePDF, gerar_chave_pdf, obter_cache_pdf
+from .metricas import medir_etapa, medir_requisicao, obter_registro_metricas
+from .roteamento import BancoIndisponivel, limpar_verificacoes, registrar_sincronizacao
+from .conexoes import obter_pragmas
+from .assincrono import RequisicaoCancelada, cancelamento_solicitado, executar_em_thread, obter_vagas, _cancelamento
+from .protecao import ConsultaRecusada, ConsultasOcupadas, TempoConsultaExcedido, aguardar_vaga, avaliar_caminhos, estimar_custo_plano, limitar_tempo, limpar_estimativas
+from .gerador_esquema import gerar_esquema, obter_esquema, verificar_sobreposicao
+from .benchmarks.html import preencher_com_beautifulsoup, renderizar_com_esqueleto, criar_tabela
+from setup.esquema import SOBREPOSICAO_ESQUEMA, esquema_bd
+from base.models import Base
+from chamado.models import Chamado, AtendimentoPessoa, UnidadeChamado
+from unidade.models import Unidade
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, OperationalError
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet, Sum
+from django.db.utils import ConnectionHandler
+from django.utils import timezone
+from asgiref.sync import ThreadSensitiveContext, async_to_sync
+from unittest.mock import patch
 from copy import deepcopy
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+def setUpModule():
+    # os PDFs gerados durante os testes são armazenados em um diretório temporário
+    diretorio = tempfile.TemporaryDirectory()
+    configuracoes = override_settings(RELATORIO_DINAMICO={
+        **settings.RELATORIO_DINAMICO, 
+        'CACHE_PDF': {'DIRETORIO': diretorio.name},
+    })
+    configuracoes.enable()
+    obter_cache_pdf.cache_clear()
+    unittest.addModuleCleanup(obter_cache_pdf.cache_clear)
+    unittest.addModuleCleanup(configuracoes.disable)
+    unittest.addModuleCleanup(diretorio.cleanup)
 
 consulta1 = {
     "fonte_principal": "Base",
@@ -84,6 +133,1350 @@ class ConstrutorConsultaTestCase(TestCase):
         ordenacoes = self.construtor._construir_ordenacao()
         self.assertEqual(ordenacoes, ['unidades_operacionais__id'])
 
-    
-    
-    
\ No newline at end of file
+
+class IndiceEsquemaTestCase(TestCase):
+    def test_indice_construido_uma_vez(self):
+        self.assertIs(obter_indice_esquema(esquema_bd), obter_indice_esquema(esquema_bd))
+        self.assertIs(ValidadorConsulta(esquema_bd)._indice, obter_indice_esquema(esquema_bd))
+
+    def test_resolver_caminho(self):
+        indice = IndiceEsquema(esquema_bd)
+        self.assertEqual(indice.resolver_caminho('Chamado', 'base__responsavel__email'), 'email')
+        self.assertEqual(indice.resolver_caminho('Base', 'nome'), 'string')
+        # o mesmo caminho pode ser válido a partir de uma raiz e inválido a partir de outra
+        with self.assertRaises(ValidationError):
+            indice.resolver_caminho('Pessoa', 'status')
+        self.assertEqual(indice.resolver_caminho('Chamado', 'status'), 'string')
+
+    def test_relacao_invalida(self):
+        indice = IndiceEsquema(esquema_bd)
+        with self.assertRaises(ValidationError):
+            indice.resolver_caminho('Chamado', 'inexistente__nome')
+
+
+class CacheResultadosTestCase(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create(username='teste')
+        Base.objects.create(nome='Base 1', cidade='Natal', criado_por=self.usuario)
+        self.cache = CacheResultados(BackendMemoria(max_entradas=10), ttl=60)
+        consulta = {
+            "fonte_principal": "Base",
+            "colunas": [{"campo": "nome", "rotulo": "Nome da base"}],
+        }
+        self.consulta_valida = ValidadorConsulta(esquema_bd).validar(consulta)
+
+    def test_backend_memoria_lru(self):
+        backend = BackendMemoria(max_entradas=2)
+        backend.definir('a', 1)
+        backend.definir('b', 2)
+        backend.obter('a') # 'b' passa a ser o item usado há mais tempo
+        backend.definir('c', 3)
+        self.assertEqual(backend.obter('a'), 1)
+        self.assertIsNone(backend.obter('b'))
+        self.assertEqual(backend.obter('c'), 3)
+
+    def test_backend_memoria_ttl(self):
+        backend = BackendMemoria()
+        backend.definir('a', 1, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(backend.obter('a'))
+
+    def test_chave_independe_da_ordem(self):
+        consulta = {"colunas": [], "fonte_principal": "Base", "app_model": "base.Base"}
+        consulta_reordenada = {"app_model": "base.Base", "fonte_principal": "Base", "colunas": []}
+        self.assertEqual(self.cache.gerar_chave(consulta), self.cache.gerar_chave(consulta_reordenada))
+
+    def test_resultado_reaproveitado(self):
+        dados = ConstrutorConsulta(self.consulta_valida, self.cache).executar()
+        
+        with self.assertNumQueries(0):
+            dados_cache = ConstrutorConsulta(self.consulta_valida, self.cache).executar()
+
+        self.assertEqual(dados, dados_cache)
+
+    def test_invalidacao_ao_salvar_modelo(self):
+        with patch('relatorio_dinamico.cache.obter_cache_resultados', return_value=self.cache):
+            ConstrutorConsulta(self.consulta_valida, self.cache).executar()
+            Base.objects.create(nome='Base 2', cidade='Mossoró', criado_por=self.usuario)
+            dados = ConstrutorConsulta(self.consulta_valida, self.cache).executar()
+
+        self.assertEqual(len(dados), 2)
+
+
+def criar_html_tabela(configuracao_consulta):
+    return (
+        f"<table data-config-consulta='{json.dumps(configuracao_consulta)}'>"
+        "<thead><tr><th>{}</th></tr></thead><tbody><tr><td>{}</td></tr></tbody></table>"
+    )
+
+
+class ConstrutorHTMLParaleloTestCase(TransactionTestCase):
+    def setUp(self):
+        usuario = User.objects.create(username='teste')
+        for i in range(3):
+            Base.objects.create(nome=f'Base {i}', cidade=f'Cidade {i}', criado_por=usuario)
+        
+        consultas = [
+            {"fonte_principal": "Base", "colunas": [{"campo": "nome", "rotulo": "Nome"}]},
+            {"fonte_principal": "Base", "colunas": [{"campo": "cidade", "rotulo": "Cidade"}]},
+            {"fonte_principal": "Base", "colunas": [{"campo": "id", "rotulo": "Total", "agregacao": "count"}]},
+        ]
+        self.html = "".join(criar_html_tabela(consulta) for consulta in consultas)
+
+    def gerar_html(self, **kwargs):
+        construtor_html = ConstrutorHTML(
+            self.html, "_pdf_dinamico.html", ValidadorConsulta(esquema_bd), ConstrutorConsulta(), **kwargs
+        )
+        return construtor_html.gerar_html()
+
+    def test_resultado_igual_ao_sequencial(self):
+        html_paralelo = self.gerar_html(max_trabalhadores=3)
+        self.assertIn("<td>Base 2</td>", html_paralelo)
+        self.assertEqual(self.gerar_html(max_trabalhadores=1), html_paralelo)
+
+    def test_medicao_inclui_consultas_paralelas(self):
+        with medir_requisicao() as medicao:
+            self.gerar_html(max_trabalhadores=3)
+
+        execucoes = [etapa for etapa in medicao.etapas if etapa.nome == 'execucao_banco']
+        self.assertEqual(len(execucoes), 3)
+        self.assertTrue(all(len(etapa.consultas) == 1 for etapa in execucoes))
+        self.assertEqual(sorted(etapa.linhas for etapa in execucoes), [1, 3, 3])
+        self.assertTrue({'analise_html', 'validacao', 'consultas', 'formatacao', 'montagem_html'} <= set(medicao.totais()))
+
+    def test_conexoes_reaproveitadas_entre_relatorios(self):
+        conexoes_criadas = []
+        receptor = lambda sender, connection, **kwargs: conexoes_criadas.append(connection.alias)
+        connection_created.connect(receptor)
+        self.addCleanup(connection_created.disconnect, receptor)
+
+        # as threads do executor mantêm suas conexões entre os relatórios
+        with patch.dict(connections.settings['default'], CONN_MAX_AGE=60):
+            for _ in range(3):
+                self.gerar_html(max_trabalhadores=3)
+
+        # sem o reaproveitamento, seriam 9 conexões (uma por consulta)
+        self.assertLessEqual(len(conexoes_criadas), 3)
+        self.assertIs(obter_executor_consultas(3), obter_executor_consultas(3))
+
+    def test_tempo_limite(self):
+        with patch.object(ConstrutorConsulta, 'executar', side_effect=lambda: time.sleep(0.5)):
+            with self.assertRaises(TempoLimiteExcedido):
+                self.gerar_html(max_trabalhadores=3, tempo_limite=0.05)
+
+    def test_tempo_na_fila_nao_conta_para_o_limite(self):
+        executar = ConstrutorConsulta.executar
+
+        def executar_lento(construtor):
+            time.sleep(0.3)
+            return executar(construtor)
+
+        # outro relatório ocupa as threads do executor compartilhado por 0,4 s; as 3 consultas levam mais 0,6 s
+        ocupadas = [obter_executor_consultas(2).submit(time.sleep, 0.4) for _ in range(2)]
+
+        with patch.object(ConstrutorConsulta, 'executar', executar_lento):
+            html = self.gerar_html(max_trabalhadores=2, tempo_limite=0.8)
+
+        self.assertIn("<td>Base 2</td>", html)
+        self.assertTrue(all(futuro.done() for futuro in ocupadas))
+
+    def test_consultas_interrompidas_apos_tempo_limite(self):
+        interrompidas = []
+
+        def executar_ate_cancelamento():
+            fim = time.monotonic() + 2
+            while time.monotonic() < fim and not cancelamento_solicitado():
+                time.sleep(0.01)
+            interrompidas.append(cancelamento_solicitado())
+
+        with patch.object(ConstrutorConsulta, 'executar', side_effect=executar_ate_cancelamento):
+            with self.assertRaises(TempoLimiteExcedido):
+                self.gerar_html(max_trabalhadores=3, tempo_limite=0.1)
+
+            # as consultas em execução são avisadas e liberam as threads compartilhadas
+            obter_executor_consultas(3).submit(lambda: None).result(timeout=1)
+            fim = time.monotonic() + 1
+            while len(interrompidas) < 3 and time.monotonic() < fim:
+                time.sleep(0.01)
+
+        self.assertEqual(interrompidas, [True] * 3)
+
+
+class ExportacaoTestCase(TestCase):
+    def setUp(self):
+        usuario = User.objects.create(username='teste')
+        for i in range(5):
+            Base.objects.create(nome=f'Base {i}', cidade='Natal', criado_por=usuario)
+        
+        self.consulta = {
+            "fonte_principal": "Base",
+            "colunas": [{"campo": "nome", "rotulo": "Nome"}, {"campo": "cidade", "rotulo": "Cidade"}],
+            "ordenacoes": [{"campo": "nome", "ordem": "ASC"}],
+            "limite": 2
+        }
+
+    def test_iterar_ignora_limite(self):
+        consulta_valida = ValidadorConsulta(esquema_bd).validar(deepcopy(self.consulta))
+        construtor = ConstrutorConsulta(consulta_valida)
+        linhas = list(construtor.iterar(tamanho_bloco=2))
+        self.assertEqual(len(linhas), 5)
+        self.assertEqual(linhas[0], ('Base 0', 'Natal'))
+        self.assertEqual(len(construtor.executar()), 2)
+
+    def test_exportar_csv(self):
+        resposta = self.client.post('/exportar/csv/', json.dumps(self.consulta), content_type='application/json')
+        self.assertEqual(resposta.status_code, 200)
+        conteudo = b''.join(resposta.streaming_content).decode('utf-8-sig')
+        linhas = conteudo.splitlines()
+        self.assertEqual(linhas[0], 'Nome,Cidade')
+        self.assertEqual(len(linhas), 6)
+
+    def test_exportar_formato_invalido(self):
+        resposta = self.client.post('/exportar/pdf/', json.dumps(self.consulta), content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_exportar_operador_invalido(self):
+        consulta = {**self.consulta, "filtros": [{"campo": "nome", "operador": "inexistente", "valor": "Base"}]}
+        resposta = self.client.post('/exportar/csv/', json.dumps(consulta), content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(resposta.streaming)
+
+
+class EsqueletoHTMLTestCase(TestCase):
+    def test_mesmo_html_do_beautifulsoup(self):
+        config = json.dumps({"fonte_principal": "Base", "colunas": []})
+        html = (
+            "<header><h1 class='titulo'>Relatório &amp; teste</h1></header><main>"
+            f"<table data-config-consulta='{config}' class='tabela'><thead><tr><th>{{}}</th><th>{{}}</th><th>Extra</th></tr></thead>"
+            "<tbody><tr><td>{}</td><td>{}</td></tr></tbody></table>"
+            "<p>Entre tabelas</p>"
+            f"<table data-config-consulta='{config}'><thead><tr><th>{{}}</th></tr></thead>"
+            "<tbody><tr><td>{}</td></tr></tbody></table>"
+            "</main>"
+        )
+        resultados = [
+            [{'Nome <b>': 'A & B', 'Valor': None}, {'Nome <b>': 3, 'Valor': '<script>'}],
+            [], # tabela sem dados permanece como está
+        ]
+        self.assertEqual(
+            renderizar_com_esqueleto(html, '_pdf_dinamico.html', resultados),
+            preencher_com_beautifulsoup(html, '_pdf_dinamico.html', resultados)
+        )
+
+    def test_benchmark_dados_sinteticos(self):
+        html, dados = criar_tabela(50)
+        self.assertEqual(
+            renderizar_com_esqueleto(html, '_pdf_dinamico.html', [dados]),
+            preencher_com_beautifulsoup(html, '_pdf_dinamico.html', [dados])
+        )
+
+
+class PlanoRelatorioTestCase(TestCase):
+    def setUp(self):
+        usuario = User.objects.create(username='teste')
+        Base.objects.create(nome='Base 1', cidade='Natal', criado_por=usuario)
+        consulta = {"fonte_principal": "Base", "colunas": [{"campo": "nome", "rotulo": "Nome"}]}
+        self.relatorio = Relatorio.objects.create(nome='Bases', html=criar_html_tabela(consulta))
+        obter_cache_planos().limpar()
+
+    def test_plano_reaproveitado(self):
+        plano = obter_plano_relatorio(self.relatorio, esquema_bd, '_pdf_dinamico.html')
+        
+        with patch.object(ValidadorConsulta, 'validar') as validar:
+            self.assertIs(obter_plano_relatorio(self.relatorio, esquema_bd, '_pdf_dinamico.html'), plano)
+            html = ConstrutorHTML.a_partir_do_plano(plano, ConstrutorConsulta()).gerar_html()
+            validar.assert_not_called()
+
+        self.assertIn('<td>Base 1</td>', html)
+
+    def test_plano_atualizado_ao_alterar_html(self):
+        plano = obter_plano_relatorio(self.relatorio, esquema_bd, '_pdf_dinamico.html')
+        self.relatorio.html = "<p>Sem tabelas</p>"
+        self.assertIsNot(obter_plano_relatorio(self.relatorio, esquema_bd, '_pdf_dinamico.html'), plano)
+
+    def test_gerar_pdf_relatorio(self):
+        resposta = self.client.get(f'/gerar_pdf/{self.relatorio.id}')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'application/pdf')
+
+
+class TarefaPDFTestCase(TestCase):
+    def setUp(self):
+        consulta = {"fonte_principal": "Base", "colunas": [{"campo": "nome", "rotulo": "Nome"}]}
+        self.relatorio = Relatorio.objects.create(nome='Bases', html=criar_html_tabela(consulta))
+
+    def test_fluxo_da_tarefa(self):
+        resposta = self.client.post('/tarefas_pdf/', json.dumps({'id': self.relatorio.id}), content_type='application/json')
+        self.assertEqual(resposta.status_code, 202)
+        dados = resposta.json()
+        self.assertEqual(dados['status'], TarefaPDF.PENDENTE)
+        self.assertEqual(self.client.get(f"/tarefas_pdf/{dados['id']}/pdf").status_code, 409)
+
+        processar_tarefas(num_processos=1, uma_vez=True)
+
+        dados = self.client.get(dados['url_status']).json()
+        self.assertEqual(dados['status'], TarefaPDF.CONCLUIDA)
+        resposta = self.client.get(dados['url_pdf'])
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'application/pdf')
+
+    def test_tarefa_com_consulta_invalida(self):
+        html = criar_html_tabela({"fonte_principal": "Inexistente", "colunas": []})
+        tarefa = enfileirar_tarefa('http://testserver/', html=html)
+        processar_tarefas(num_processos=1, uma_vez=True)
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, TarefaPDF.ERRO)
+        self.assertIn('Inexistente', tarefa.erro)
+
+    def test_erro_inesperado_nao_interrompe_a_fila(self):
+        # uma coluna sem "campo" lança KeyError na validação
+        defeituosa = enfileirar_tarefa('http://testserver/', html=criar_html_tabela({"fonte_principal": "Base", "colunas": [{"rotulo": "Nome"}]}))
+        seguinte = enfileirar_tarefa('http://testserver/', relatorio=self.relatorio)
+
+        # as duas tarefas são reservadas na mesma rodada; a segunda é processada depois do erro da primeira
+        with self.assertLogs('relatorio_dinamico.tarefas', 'ERROR'):
+            processar_tarefas(num_processos=2, uma_vez=True)
+
+        defeituosa.refresh_from_db()
+        seguinte.refresh_from_db()
+        self.assertEqual(defeituosa.status, TarefaPDF.ERRO)
+        self.assertEqual(seguinte.status, TarefaPDF.CONCLUIDA)
+
+    def test_remover_tarefas_antigas(self):
+        agora = timezone.now()
+        antiga = TarefaPDF.objects.create(base_url='http://testserver/', status=TarefaPDF.CONCLUIDA, pdf=b'%PDF', concluido_em=agora - timedelta(days=2))
+        com_erro = TarefaPDF.objects.create(base_url='http://testserver/', status=TarefaPDF.ERRO, concluido_em=agora - timedelta(days=2))
+        recente = TarefaPDF.objects.create(base_url='http://testserver/', status=TarefaPDF.CONCLUIDA, pdf=b'%PDF', concluido_em=agora)
+        pendente = enfileirar_tarefa('http://testserver/', html='<p></p>')
+
+        self.assertEqual(remover_tarefas_antigas(24 * 60 * 60), 2)
+        self.assertEqual(set(TarefaPDF.objects.values_list('id', flat=True)), {recente.id, pendente.id})
+        self.assertEqual(self.client.get(f'/tarefas_pdf/{antiga.id}').status_code, 404)
+        self.assertFalse(TarefaPDF.objects.filter(id=com_erro.id).exists())
+
+    def test_reserva_unica(self):
+        enfileirar_tarefa('http://testserver/', html='<p></p>')
+        self.assertEqual(len(reservar_tarefas(5)), 1)
+        self.assertEqual(reservar_tarefas(5), [])
+
+
+class CachePDFTestCase(TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+
+    def test_chave_depende_do_conteudo(self):
+        chave = gerar_chave_pdf('<p>a</p>', 'http://testserver/')
+        self.assertEqual(chave, gerar_chave_pdf('<p>a</p>', 'http://testserver/'))
+        self.assertNotEqual(chave, gerar_chave_pdf('<p>b</p>', 'http://testserver/'))
+        self.assertNotEqual(chave, gerar_chave_pdf('<p>a</p>', 'http://outro/'))
+
+    def test_remove_arquivos_usados_ha_mais_tempo(self):
+        cache_pdf = CachePDF(self.diretorio.name, tamanho_maximo=25)
+        cache_pdf.armazenar('aa01', b'1' * 10)
+        cache_pdf.armazenar('bb02', b'2' * 10)
+        # o arquivo 'aa01' passa a ser o usado mais recentemente
+        os.utime(Path(self.diretorio.name) / 'bb02'[:2] / 'bb02.pdf', (0, 0))
+        cache_pdf.armazenar('cc03', b'3' * 10)
+        self.assertEqual(cache_pdf.obter('aa01'), b'1' * 10)
+        self.assertIsNone(cache_pdf.obter('bb02'))
+        self.assertEqual(cache_pdf.obter('cc03'), b'3' * 10)
+
+    def test_etag(self):
+        cache_pdf = CachePDF(self.diretorio.name, tamanho_maximo=1024 * 1024)
+        relatorio = Relatorio.objects.create(nome='Vazio', html='<p>Sem tabelas</p>')
+
+        with patch('relatorio_dinamico.pdf.obter_cache_pdf', return_value=cache_pdf):
+            resposta = self.client.get(f'/gerar_pdf/{relatorio.id}')
+            etag = resposta['ETag']
+
+            with patch('relatorio_dinamico.pdf.renderizar_pdf') as renderizar:
+                self.assertEqual(self.client.get(f'/gerar_pdf/{relatorio.id}').content, resposta.content)
+                resposta_condicional = self.client.get(f'/gerar_pdf/{relatorio.id}', HTTP_IF_NONE_MATCH=etag)
+                renderizar.assert_not_called()
+
+        self.assertEqual(resposta_condicional.status_code, 304)
+        self.assertEqual(resposta_condicional['ETag'], etag)
+
+
+class PaginacaoTestCase(TestCase):
+    def setUp(self):
+        usuario = User.objects.create(username='teste')
+        bairros = ['Centro', None, 'Tirol', 'Centro', None, 'Alecrim', 'Tirol']
+        for i, bairro in enumerate(bairros):
+            Base.objects.create(nome=f'Base {i}', cidade='Natal' if i % 2 else 'Mossoró', bairro=bairro, criado_por=usuario)
+
+        self.validador = ValidadorConsulta(esquema_bd)
+
+    def _percorrer(self, consulta, tamanho):
+        construtor = ConstrutorConsulta(self.validador.validar(deepcopy(consulta)))
+        linhas, cursor, paginas = [], None, 0
+
+        while True:
+            pagina = construtor.paginar(cursor, tamanho)
+            linhas.extend(pagina['linhas'])
+            paginas += 1
+            cursor = pagina['proximo_cursor']
+            if not cursor:
+                return linhas, paginas
+            # um cursor que repete linhas poderia paginar indefinidamente
+            self.assertLess(paginas, 20)
+
+    def test_paginas_cobrem_o_resultado(self):
+        for ordem in ('ASC', 'DESC'):
+            consulta = {
+                "fonte_principal": "Base",
+                "colunas": [{"campo": "bairro", "rotulo": "Bairro"}, {"campo": "nome", "rotulo": "Nome"}],
+                "ordenacoes": [{"campo": "bairro", "ordem": ordem}],
+            }
+            linhas, paginas = self._percorrer(consulta, 2)
+            self.assertEqual(paginas, 4)
+            self.assertEqual(len(linhas), 7)
+            self.assertEqual(len({tuple(linha) for linha in linhas}), 7)
+
+            bairros = [linha[0] for linha in linhas]
+            nao_nulos = [bairro for bairro in bairros if bairro is not None]
+            self.assertEqual(nao_nulos, sorted(nao_nulos, reverse=(ordem == 'DESC')))
+            # nulos primeiro na ordem crescente e por último na decrescente
+            self.assertEqual(bairros[:2] if ordem == 'ASC' else bairros[-2:], [None, None])
+
+    def test_paginar_com_agregacao(self):
+        consulta = {
+            "fonte_principal": "Base",
+            "colunas": [{"campo": "cidade", "rotulo": "Cidade"}, {"campo": "id", "rotulo": "Bases", "agregacao": "count"}],
+            "ordenacoes": [{"campo": "id", "agregacao": "count", "ordem": "DESC"}],
+        }
+        linhas, paginas = self._percorrer(consulta, 1)
+        self.assertEqual(linhas, [['Mossoró', 4], ['Natal', 3]])
+        self.assertEqual(paginas, 2)
+
+    def test_paginar_por_data_com_microssegundos(self):
+        base = Base.objects.first()
+        inicio = datetime(2025, 3, 9, 14, 30, 0, 123456, tzinfo=dt_timezone.utc)
+        for i in range(6):
+            chamado = Chamado.objects.create(base=base, uf='RN', cidade='Natal')
+            Chamado.objects.filter(id=chamado.id).update(criado_em=inicio + timedelta(microseconds=i * 250))
+
+        consulta = {
+            "fonte_principal": "Chamado",
+            "colunas": [{"campo": "criado_em", "rotulo": "Data"}, {"campo": "id", "rotulo": "ID"}],
+            "ordenacoes": [{"campo": "criado_em", "ordem": "ASC"}],
+        }
+        # o cursor mantém os microssegundos, então a última linha de cada página não se repete na seguinte
+        linhas, paginas = self._percorrer(consulta, 2)
+        self.assertEqual(paginas, 3)
+        self.assertEqual(sorted(linha[1] for linha in linhas), sorted(Chamado.objects.values_list('id', flat=True)))
+
+    def test_endpoint_dados(self):
+        consulta = {"fonte_principal": "Base", "colunas": [{"campo": "nome", "rotulo": "Nome"}], "limite": 2}
+        resposta = self.client.post('/dados/', json.dumps({'configuracao': consulta, 'tamanho': 5}), content_type='application/json')
+        self.assertEqual(resposta.status_code, 200)
+        pagina = resposta.json()
+        self.assertEqual(pagina['cabecalhos'], ['Nome'])
+        # o limite da configuração não se aplica à paginação
+        self.assertEqual(len(pagina['linhas']), 5)
+
+        resposta = self.client.post('/dados/', json.dumps({'configuracao': consulta, 'cursor': pagina['proximo_cursor']}), content_type='application/json')
+        self.assertEqual([linha[0] for linha in resposta.json()['linhas']], ['Base 5', 'Base 6'])
+        self.assertIsNone(resposta.json()['proximo_cursor'])
+
+        resposta = self.client.post('/dados/', json.dumps({'configuracao': consulta, 'cursor': 'invalido'}), content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+
+
+class PlanoExecucaoTestCase(TestCase):
+    def setUp(self):
+        self.validador = ValidadorConsulta(esquema_bd)
+
+    def test_sugere_indice_para_filtro_sem_indice(self):
+        consulta = self.validador.validar({
+            "fonte_principal": "Chamado",
+            "colunas": [{"campo": "motivo"}],
+            "filtros": [{"campo": "motivo", "operador": "exact", "valor": "Queda"}],
+        })
+        plano = ConstrutorConsulta(consulta).explicar()
+        self.assertEqual(plano['banco'], 'sqlite')
+        self.assertIn('SCAN', plano['plano'])
+        self.assertEqual([(alerta['tabela'], alerta['coluna'], alerta['uso']) for alerta in plano['alertas']], [('chamado_chamado', 'motivo', 'filtro')])
+        self.assertIn('CREATE INDEX', plano['alertas'][0]['sugestao_sql'])
+
+    def test_juncao_com_indice_nao_gera_alerta(self):
+        # a chave estrangeira chamado_id já possui índice
+        resposta = self.client.post('/obter_plano/', json.dumps({
+            "fonte_principal": "Chamado",
+            "colunas": [{"campo": "id"}, {"campo": "atendimento_chamado__risco"}],
+        }), content_type='application/json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['alertas'], [])
+
+
+class PropostaIndicesTestCase(TestCase):
+    def setUp(self):
+        consultas = [
+            {
+                "fonte_principal": "Chamado",
+                "colunas": [{"campo": "origem"}, {"campo": "id", "agregacao": "count"}],
+                "filtros": [{"campo": "gravidade", "operador": "exact", "valor": "Alta"}],
+            },
+            {
+                "fonte_principal": "Chamado",
+                "colunas": [{"campo": "status"}],
+                "filtros": [{"campo": "criado_em", "operador": "gte", "valor": "2025-01-01T00:00:00-03:00"}],
+            },
+        ]
+        html = ''.join(f"<table data-config-consulta='{json.dumps(consulta)}'><tbody></tbody></table>" for consulta in consultas)
+        self.relatorio = Relatorio.objects.create(nome='Painel', html=html)
+
+    def test_propoe_apenas_indices_que_faltam(self):
+        from .indices import propor_indices
+
+        esquema = deepcopy(esquema_bd)
+        esquema['Chamado']['campos'] += [
+            {"rotulo": "Gravidade", "valor": "gravidade", "tipo": "string"},
+            {"rotulo": "Origem", "valor": "origem", "tipo": "string"},
+        ]
+        propostas = propor_indices([self.relatorio], esquema)
+
+        # filtro por igualdade antes do agrupamento; o índice de criado_em em Meta.indexes não atende o agrupamento por status
+        self.assertEqual(
+            sorted((p['modelo']._meta.label, p['indice'].fields) for p in propostas), 
+            [('chamado.Chamado', ['criado_em', 'status']), ('chamado.Chamado', ['gravidade', 'origem'])]
+        )
+        self.assertTrue(all(p['indice'].name.endswith('_idx') for p in propostas))
+
+    def test_gerar_migracoes_apos_a_ultima_migracao(self):
+        from .indices import gerar_migracoes, propor_indices
+
+        esquema = deepcopy(esquema_bd)
+        esquema['Chamado']['campos'] += [
+            {"rotulo": "Gravidade", "valor": "gravidade", "tipo": "string"},
+            {"rotulo": "Origem", "valor": "origem", "tipo": "string"},
+        ]
+        caminhos = gerar_migracoes(propor_indices([self.relatorio], esquema), nome='indices_teste')
+        for caminho in caminhos:
+            self.addCleanup(os.remove, caminho)
+
+        self.assertEqual([Path(caminho).name for caminho in caminhos], ['0004_indices_teste.py'])
+        conteudo = Path(caminhos[0]).read_text(encoding='utf-8')
+        self.assertIn("('chamado', '0003_indices_relatorios')", conteudo)
+        self.assertEqual(conteudo.count('migrations.AddIndex('), 2)
+
+    def test_benchmark_indices(self):
+        from .benchmarks import indices
+
+        with patch.object(indices, 'NUM_CHAMADOS', 50):
+            resultados = indices.benchmark_indices(repeticoes=1)
+
+        self.assertEqual({r['caso'] for r in resultados}, {'sem_indices', 'com_indices'})
+        self.assertFalse(Chamado.objects.exists())
+
+
+class ResumoChamadoTestCase(TestCase):
+    def setUp(self):
+        usuario = User.objects.create(username='teste')
+        self.bases = [Base.objects.create(nome=f'Base {i}', cidade='Natal', criado_por=usuario) for i in range(2)]
+        self.ativar = override_settings(RELATORIO_DINAMICO={**settings.RELATORIO_DINAMICO, 'RESUMOS': {'ATIVO': True}})
+        self.validador = ValidadorConsulta(esquema_bd)
+
+        agora = timezone.now()
+        for i in range(12):
+            chamado = Chamado.objects.create(
+                base=self.bases[i % 2], uf='RN', cidade='Natal' if i % 3 else 'Mossoró', 
+                status='PENDENTE' if i % 4 else 'FINALIZADO', numero_vitimas=i if i % 5 else None,
+            )
+            # update() não dispara sinais: os resumos são preenchidos pelo comando atualizar_resumos
+            Chamado.objects.filter(pk=chamado.pk).update(criado_em=agora - timedelta(days=i * 10))
+
+        self.consulta = {
+            "fonte_principal": "Chamado",
+            "colunas": [
+                {"campo": "criado_em", "truncamento": "truncmonth", "rotulo": "Mês"},
+                {"campo": "status", "rotulo": "Status"},
+                {"campo": "base__nome", "rotulo": "Base"},
+                {"campo": "id", "agregacao": "count", "rotulo": "Chamados"},
+                {"campo": "numero_vitimas", "agregacao": "max", "rotulo": "Máximo de vítimas"},
+            ],
+            "filtros": [{"campo": "cidade", "operador": "exact", "valor": "Natal"}],
+            "ordenacoes": [{"campo": "criado_em", "truncamento": "truncmonth", "ordem": "DESC"}, {"campo": "base__nome", "ordem": "ASC"}],
+        }
+
+    def _executar(self, consulta):
+        construtor = ConstrutorConsulta(self.validador.validar(deepcopy(consulta)))
+        return construtor, construtor.executar()
+
+    def test_resultado_igual_ao_da_tabela_original(self):
+        _, esperado = self._executar(self.consulta)
+
+        with self.ativar:
+            call_command('atualizar_resumos', stdout=StringIO())
+            construtor, resultado = self._executar(self.consulta)
+
+        self.assertIs(construtor._modelo_classe, ResumoChamado)
+        self.assertEqual(resultado, esperado)
+
+    def test_resumo_atualizado_ao_salvar_chamado(self):
+        with self.ativar:
+            call_command('atualizar_resumos', stdout=StringIO())
+            Chamado.objects.create(base=self.bases[0], uf='RN', cidade='Natal', status='PENDENTE', numero_vitimas=40)
+            _, resultado = self._executar(self.consulta)
+
+        _, esperado = self._executar(self.consulta)
+        self.assertEqual(resultado, esperado)
+        self.assertEqual(resultado.como_dicionarios()[0]['Máximo de vítimas'], 40)
+
+    def test_chamado_movido_para_outro_dia(self):
+        chamado = Chamado.objects.order_by('criado_em').first()
+
+        with self.ativar:
+            call_command('atualizar_resumos', stdout=StringIO())
+            chamado.criado_em = timezone.now() - timedelta(days=400)
+            chamado.save()
+            _, resultado = self._executar(self.consulta)
+
+        # o resumo do dia anterior deixa de contar o chamado
+        _, esperado = self._executar(self.consulta)
+        self.assertEqual(resultado, esperado)
+        self.assertEqual(ResumoChamado.objects.aggregate(total=Sum('quantidade'))['total'], Chamado.objects.count())
+
+    def test_recalculo_do_dia_bloqueia_os_chamados(self):
+        chamado = Chamado.objects.order_by('criado_em').first()
+        select_for_update = QuerySet.select_for_update
+
+        with self.ativar, CaptureQueriesContext(connection) as consultas:
+            with patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=select_for_update) as travar:
+                chamado.save()
+
+        # os chamados do dia são bloqueados antes de os resumos serem apagados
+        self.assertEqual(travar.call_args.args[0].model, Chamado)
+        sql = [consulta['sql'] for consulta in consultas.captured_queries]
+        leitura = next(i for i, texto in enumerate(sql) if texto.startswith('SELECT "chamado_chamado"."id"'))
+        exclusao = next(i for i, texto in enumerate(sql) if texto.startswith('DELETE FROM "relatorio_dinamico_resumochamado"'))
+        self.assertLess(leitura, exclusao)
+
+    def test_atualizar_resumos_invalida_cache(self):
+        cache_resultados = CacheResultados(BackendMemoria(), ttl=60)
+        consulta = self.validador.validar(deepcopy(self.consulta))
+
+        with self.ativar, patch('relatorio_dinamico.cache.obter_cache_resultados', return_value=cache_resultados):
+            call_command('atualizar_resumos', stdout=StringIO())
+            antes = ConstrutorConsulta(consulta, cache_resultados=cache_resultados).executar()
+            # update() não dispara sinais; o comando recalcula os resumos e descarta o resultado em cache
+            Chamado.objects.update(status='FINALIZADO')
+            call_command('atualizar_resumos', stdout=StringIO())
+            depois = ConstrutorConsulta(consulta, cache_resultados=cache_resultados).executar()
+
+        self.assertNotEqual(antes, depois)
+        self.assertEqual({linha['Status'] for linha in depois.como_dicionarios()}, {'FINALIZADO'})
+
+    def test_consulta_incompativel_usa_tabela_original(self):
+        consulta = deepcopy(self.consulta)
+        consulta['colunas'][3]['agregacao'] = 'sum'
+
+        with self.ativar:
+            construtor, _ = self._executar(consulta)
+            self.assertIs(construtor._modelo_classe, Chamado)
+
+
+class MetricasTestCase(TestCase):
+    def setUp(self):
+        usuario = User.objects.create(username='teste')
+        Base.objects.create(nome='Base 1', cidade='Natal', criado_por=usuario)
+        consulta = {"fonte_principal": "Base", "colunas": [{"campo": "nome", "rotulo": "Nome"}]}
+        self.relatorio = Relatorio.objects.create(nome='Bases', html=criar_html_tabela(consulta))
+        obter_registro_metricas().limpar()
+
+    def test_server_timing_e_percentis(self):
+        respostas = [self.client.get(f'/gerar_pdf/{self.relatorio.id}') for _ in range(3)]
+        self.assertEqual([resposta.status_code for resposta in respostas], [200] * 3)
+        # as requisições seguintes usam os resultados e o PDF em cache
+        self.assertIn('execucao_banco;dur=', respostas[0]['Server-Timing'])
+        self.assertIn('cache_pdf;dur=', respostas[0]['Server-Timing'])
+        self.assertIn('total;dur=', respostas[-1]['Server-Timing'])
+
+        relatorios = self.client.get('/metricas').json()['relatorios']
+        self.assertEqual([(r['id'], r['nome']) for r in relatorios], [(self.relatorio.id, 'Bases')])
+        total = relatorios[0]['etapas']['total']
+        self.assertEqual(total['amostras'], 3)
+        self.assertLessEqual(total['p50'], total['p99'])
+        self.assertEqual(sum(total['histograma'].values()), 3)
+
+    def test_sql_registrado_somente_na_etapa_mais_interna(self):
+        with medir_requisicao() as medicao:
+            with medir_etapa('externa'):
+                Base.objects.count()
+                with medir_etapa('interna'):
+                    Base.objects.count()
+
+        etapas = {etapa.nome: etapa for etapa in medicao.etapas}
+        self.assertEqual(len(etapas['externa'].consultas), 1)
+        self.assertEqual(len(etapas['interna'].consultas), 1)
+        self.assertEqual(medicao.como_dicionario()['consultas'], 2)
+        self.assertGreaterEqual(etapas['externa'].duracao, etapas['interna'].duracao)
+
+    @override_settings(DEBUG=True)
+    def test_payload_de_depuracao(self):
+        resposta = self.client.get(f'/gerar_pdf/{self.relatorio.id}?metricas=1')
+        etapas = {etapa['etapa']: etapa for etapa in resposta.json()['etapas']}
+        self.assertEqual(etapas['execucao_banco']['linhas'], 1)
+        self.assertIn('SELECT', etapas['execucao_banco']['sql'][0])
+
+
+class DadosSinteticosTestCase(TestCase):
+    def test_gera_dados_relacionados_e_limpa(self):
+        from .dados_sinteticos import gerar_dados_sinteticos, limpar_dados_sinteticos
+        from chamado.models import AtendimentoPessoa
+
+        contagem = gerar_dados_sinteticos(30, tamanho_lote=20)
+        self.assertEqual(contagem['Chamado'], 30)
+        self.assertEqual(Chamado.objects.count(), 30)
+        self.assertEqual(AtendimentoPessoa.objects.count(), contagem['AtendimentoPessoa'])
+        # as datas são distribuídas ao longo do período, e não iguais à data de inserção
+        self.assertGreater(Chamado.objects.filter(criado_em__lt=timezone.now() - timedelta(days=1)).count(), 0)
+
+        limpar_dados_sinteticos()
+        self.assertFalse(Chamado.objects.exists())
+        self.assertFalse(User.objects.filter(username='dados_sinteticos').exists())
+
+    def test_benchmark_motor_em_json(self):
+        saida = StringIO()
+        call_command('benchmark', 'motor', repeticoes=1, tamanhos=[20], saida='json', stdout=saida)
+        dados = json.loads(saida.getvalue())
+
+        self.assertEqual(dados['metadados']['banco'], 'sqlite')
+        self.assertEqual(
+            [r['etapa'] for r in dados['resultados']], 
+            ['validar', 'executar', 'gerar_html', 'renderizar_pdf']
+        )
+        self.assertFalse(Chamado.objects.exists())
+
+
+class FormatacaoTestCase(TestCase):
+    def setUp(self):
+        usuario = User.objects.create(username='teste')
+        base = Base.objects.create(nome='Base 1', cidade='Natal', criado_por=usuario)
+        chamado = Chamado.objects.create(base=base, uf='RN', cidade='Natal', incidente='Sim')
+        Chamado.objects.filter(id=chamado.id).update(criado_em=datetime(2025, 3, 9, 14, 30, tzinfo=dt_timezone.utc))
+        Chamado.objects.create(base=base, uf='RN', cidade='Natal', incidente='')
+        # incidente é texto no modelo; declarado como bool, é formatado como Verdadeiro/Falso
+        esquema = deepcopy(esquema_bd)
+        next(campo for campo in esquema['Chamado']['campos'] if campo['valor'] == 'incidente')['tipo'] = 'bool'
+        self.validador = ValidadorConsulta(esquema)
+
+    def test_formatadores_por_coluna(self):
+        consulta = {
+            "fonte_principal": "Chamado",
+            "colunas": [
+                {"campo": "criado_em", "rotulo": "Data"},
+                {"campo": "criado_em", "truncamento": "truncmonth", "rotulo": "Mês"},
+                {"campo": "incidente", "rotulo": "Incidente"},
+                {"campo": "cidade", "rotulo": "Cidade"},
+                {"campo": "cidade", "rotulo": "Cidade (repetida)"},
+            ],
+            "ordenacoes": [{"campo": "criado_em", "ordem": "ASC"}],
+        }
+        construtor = ConstrutorConsulta(self.validador.validar(consulta))
+        resultado = construtor.executar()
+
+        self.assertEqual(resultado.cabecalhos, ['Data', 'Mês', 'Incidente', 'Cidade', 'Cidade (repetida)'])
+        self.assertEqual(resultado[0], ('09/03/2025 14:30', '03/2025', 'Verdadeiro', 'Natal', 'Natal'))
+        self.assertEqual(resultado[1][2:], ('Falso', 'Natal', 'Natal'))
+        self.assertEqual([list(linha) for linha in construtor.iterar(tamanho_bloco=1)], [list(linha) for linha in resultado])
+
+    def test_somente_agregacao(self):
+        consulta = {"fonte_principal": "Chamado", "colunas": [{"campo": "id", "agregacao": "count", "rotulo": "Total"}]}
+        resultado = ConstrutorConsulta(self.validador.validar(consulta)).executar()
+        self.assertEqual(resultado.como_dicionarios(), [{'Total': 2}])
+
+    def test_mesmo_resultado_da_formatacao_por_linha(self):
+        from .benchmarks.formatacao import COLUNAS, criar_linhas, formatar_por_linha, formatar_por_coluna
+
+        dicionarios, tuplas = criar_linhas(500)
+        self.assertEqual(formatar_por_coluna(tuplas, COLUNAS).como_dicionarios(), formatar_por_linha(dicionarios, COLUNAS))
+
+    def test_formatacao_no_banco(self):
+        # mesmo minuto com segundos diferentes e nulo/vazio: textos iguais, mas linhas diferentes para o DISTINCT
+        chamado = Chamado.objects.create(base=Base.objects.first(), uf='RN', cidade='Natal', incidente=None)
+        Chamado.objects.filter(id=chamado.id).update(criado_em=datetime(2025, 3, 9, 14, 30, 45, tzinfo=dt_timezone.utc))
+        consulta = self.validador.validar({
+            "fonte_principal": "Chamado",
+            "colunas": [
+                {"campo": "criado_em"}, {"campo": "criado_em", "truncamento": "truncday"},
+                {"campo": "criado_em", "truncamento": "truncyear"}, {"campo": "incidente"},
+            ],
+            "ordenacoes": [{"campo": "criado_em", "ordem": "ASC"}],
+        })
+        no_banco = ConstrutorConsulta(consulta, formatar_no_banco=True)
+
+        self.assertEqual(no_banco.executar(), ConstrutorConsulta(consulta).executar())
+        self.assertEqual(list(no_banco.iterar()), list(ConstrutorConsulta(consulta).iterar()))
+        self.assertEqual(list(no_banco.iterar())[:2], [
+            ('09/03/2025 14:30', '09/03/2025', '2025', 'Verdadeiro'), ('09/03/2025 14:30', '09/03/2025', '2025', 'Falso'),
+        ])
+
+
+class OtimizacaoTestCase(TestCase):
+    def setUp(self):
+        usuario = User.objects.create(username='teste')
+        bases = [Base.objects.create(nome=f'Base {i}', cidade='Natal', criado_por=usuario) for i in range(2)]
+        unidade = Unidade.objects.create(nome='USA 1', base=bases[0])
+
+        for i in range(12):
+            chamado = Chamado.objects.create(base=bases[i % 2], uf='RN', cidade=['Natal', 'Caicó', 'Macaíba'][i % 3], numero_vitimas=i % 2 + 1)
+            # alguns chamados com vários atendimentos, para que as junções multipliquem as linhas
+            for risco in ['Vermelho', 'Azul', 'Vermelho'][:i % 4]:
+                AtendimentoPessoa.objects.create(chamado=chamado, risco=risco)
+            for _ in range(i % 3):
+                UnidadeChamado.objects.create(chamado=chamado, unidade=unidade)
+
+        self.validador = ValidadorConsulta(esquema_bd)
+        self.consultas = [
+            {"fonte_principal": "Chamado", "colunas": [{"campo": "id"}, {"campo": "cidade"}, {"campo": "base__nome"}]},
+            {"fonte_principal": "Chamado", "colunas": [{"campo": "cidade"}, {"campo": "base__nome"}]},
+            {
+                "fonte_principal": "Chamado",
+                "colunas": [{"campo": "cidade"}, {"campo": "id", "agregacao": "count"}, {"campo": "numero_vitimas", "agregacao": "max"}],
+                "filtros": [{"campo": "atendimento_chamado__risco", "operador": "exact", "valor": "Vermelho"}],
+            },
+            {
+                "fonte_principal": "Chamado",
+                "colunas": [{"campo": "id"}, {"campo": "cidade"}],
+                "filtros": [
+                    {"campo": "atendimento_chamado__risco", "operador": "in", "valor": ["Vermelho", "Azul"]},
+                    {"campo": "atendimento_chamado__risco", "operador": "exact", "valor": "Azul"},
+                ],
+            },
+            {
+                "fonte_principal": "Chamado",
+                "colunas": [{"campo": "atendimento_chamado__risco"}, {"campo": "id", "agregacao": "count"}],
+                "filtros": [{"campo": "atendimento_chamado__risco", "operador": "isnull", "valor": False}],
+            },
+            {
+                "fonte_principal": "Chamado",
+                "colunas": [{"campo": "id", "agregacao": "count"}, {"campo": "numero_vitimas", "agregacao": "min"}],
+                "filtros": [{"campo": "atendimento_chamado__risco", "operador": "exact", "valor": "Azul"}],
+            },
+            {
+                "fonte_principal": "Chamado",
+                "colunas": [
+                    {"campo": "base__nome"}, {"campo": "atendimento_chamado__id", "agregacao": "count"},
+                    {"campo": "unidade_chamado__id", "agregacao": "count"}, {"campo": "unidade_chamado__id", "agregacao": "max"},
+                ],
+            },
+        ]
+
+    def _executar(self, consulta, ativo):
+        with override_settings(RELATORIO_DINAMICO={**settings.RELATORIO_DINAMICO, 'OTIMIZACAO': {'ATIVO': ativo}}):
+            construtor = ConstrutorConsulta(self.validador.validar(deepcopy(consulta)))
+            return construtor.get_sql(), sorted(construtor.executar()), sorted(construtor.iterar())
+
+    def test_filtro_que_aceita_nulo_mantem_a_juncao(self):
+        # os chamados sem nenhum atendimento também atendem isnull=True no LEFT JOIN
+        for operador, valor in [("isnull", True), ("exact", None)]:
+            consulta = {
+                "fonte_principal": "Chamado",
+                "colunas": [{"campo": "id"}, {"campo": "cidade"}],
+                "filtros": [{"campo": "atendimento_chamado__risco", "operador": operador, "valor": valor}],
+            }
+            with self.subTest(operador=operador):
+                _, resultado, _ = self._executar(consulta, True)
+                _, resultado_original, _ = self._executar(consulta, False)
+                self.assertEqual(resultado, resultado_original)
+                self.assertEqual(len(resultado), 3)
+
+    def test_filtro_que_aceita_nulo_com_varios_relacionados(self):
+        # um chamado com vários atendimentos sem risco aparece várias vezes na junção
+        chamado = Chamado.objects.create(base=Base.objects.first(), uf='RN', cidade='Natal', numero_vitimas=3)
+        AtendimentoPessoa.objects.create(chamado=chamado)
+        AtendimentoPessoa.objects.create(chamado=chamado)
+        filtros = [{"campo": "atendimento_chamado__risco", "operador": "isnull", "valor": True}]
+        selecionados = Chamado.objects.filter(atendimento_chamado__risco__isnull=True).distinct()
+
+        listagem = {"fonte_principal": "Chamado", "colunas": [{"campo": "id"}, {"campo": "cidade"}], "filtros": filtros}
+        agregada = {
+            "fonte_principal": "Chamado",
+            "colunas": [{"campo": "id", "agregacao": "count"}, {"campo": "numero_vitimas", "agregacao": "sum"}],
+            "filtros": filtros,
+        }
+
+        for consulta in (listagem, agregada):
+            with self.subTest(consulta=consulta):
+                _, resultado, _ = self._executar(consulta, True)
+                _, resultado_original, _ = self._executar(consulta, False)
+                self.assertEqual(resultado, resultado_original)
+
+        _, linhas, _ = self._executar(listagem, True)
+        _, totais, _ = self._executar(agregada, True)
+        self.assertEqual(len(linhas), selecionados.count())
+        self.assertEqual(totais[0][0], selecionados.count())
+        # a soma não repete o número de vítimas do chamado para cada atendimento
+        self.assertLess(totais[0][1], sum(numero for (numero,) in Chamado.objects.filter(atendimento_chamado__risco__isnull=True).values_list('numero_vitimas')))
+
+    def test_mesmo_resultado_sem_otimizacao(self):
+        for consulta in self.consultas:
+            with self.subTest(consulta=consulta):
+                _, resultado, linhas = self._executar(consulta, True)
+                _, resultado_original, linhas_originais = self._executar(consulta, False)
+                self.assertEqual(resultado, resultado_original)
+                self.assertEqual(linhas, linhas_originais)
+                self.assertTrue(resultado)
+
+    def test_consulta_minima(self):
+        sql_listagem, _, _ = self._executar(self.consultas[0], True)
+        sql_agrupada, _, _ = self._executar(self.consultas[2], True)
+        sql_juncao, _, _ = self._executar(self.consultas[4], True)
+
+        # a chave primária e o GROUP BY já garantem linhas únicas
+        self.assertNotIn('DISTINCT', sql_listagem)
+        self.assertNotIn('COUNT(DISTINCT', sql_agrupada)
+        # o filtro sobre os atendimentos é uma subconsulta, sem junção na consulta principal
+        self.assertNotIn('JOIN', sql_agrupada)
+        self.assertIn('IN (SELECT', sql_agrupada)
+        # a relação usada por uma coluna continua como junção, com COUNT(DISTINCT)
+        self.assertIn('JOIN', sql_juncao)
+        self.assertIn('COUNT(DISTINCT', sql_juncao)
+
+    def test_agregacoes_sobre_relacoes_inversas(self):
+        consulta = self.validador.validar({
+            "fonte_principal": "Chamado",
+            "colunas": [
+                {"campo": "cidade"}, {"campo": "atendimento_chamado__id", "agregacao": "count"},
+                {"campo": "unidade_chamado__id", "agregacao": "count"}, {"campo": "numero_vitimas", "agregacao": "sum"},
+                {"campo": "numero_vitimas", "agregacao": "avg"},
+            ],
+            "ordenacoes": [{"campo": "cidade", "ordem": "ASC"}],
+        })
+        construtor = ConstrutorConsulta(consulta)
+        sql = construtor.get_sql()
+
+        # sem junções com as relações: cada chamado é considerado uma única vez, e cada valor é somado
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('DISTINCT', sql)
+        esperado = []
+
+        for cidade in ['Caicó', 'Macaíba', 'Natal']:
+            chamados = Chamado.objects.filter(cidade=cidade)
+            vitimas = [chamado.numero_vitimas for chamado in chamados]
+            esperado.append((
+                cidade,
+                AtendimentoPessoa.objects.filter(chamado__in=chamados).count(),
+                UnidadeChamado.objects.filter(chamado__in=chamados).count(),
+                sum(vitimas),
+                sum(vitimas) / len(vitimas),
+            ))
+
+        self.assertEqual(list(construtor.executar()), esperado)
+
+
+class BancoRelatoriosTestCase(TestCase):
+    databases = {'default', 'relatorios'}
+
+    def setUp(self):
+        # o banco dos relatórios tem dados diferentes do principal, para identificar onde cada consulta foi executada
+        for alias, nome in [('default', 'Base principal'), ('relatorios', 'Base réplica')]:
+            usuario = User.objects.using(alias).create(username='teste')
+            Base.objects.using(alias).create(nome=nome, cidade='Natal', criado_por=usuario)
+
+        self.consulta = ValidadorConsulta(esquema_bd).validar({"fonte_principal": "Base", "colunas": [{"campo": "nome"}]})
+        limpar_verificacoes()
+        self.addCleanup(limpar_verificacoes)
+
+    def configurar(self, **banco_relatorios):
+        configuracao = {'ALIAS': 'relatorios', 'INTERVALO_VERIFICACAO': 0, **banco_relatorios}
+        return override_settings(RELATORIO_DINAMICO={**settings.RELATORIO_DINAMICO, 'BANCO_RELATORIOS': configuracao})
+
+    def executar(self, banco=None):
+        return [linha[0] for linha in ConstrutorConsulta(self.consulta, banco=banco).executar()]
+
+    def test_roteamento_das_consultas(self):
+        self.assertEqual(self.executar(), ['Base principal'])
+        self.assertEqual(self.executar(banco='relatorios'), ['Base réplica'])
+
+        with self.configurar():
+            self.assertEqual(self.executar(), ['Base réplica'])
+            self.assertEqual(list(ConstrutorConsulta(self.consulta).iterar()), [('Base réplica',)])
+            # o banco do relatório prevalece sobre o padrão
+            self.assertEqual(self.executar(banco='default'), ['Base principal'])
+            # as demais leituras continuam no banco principal
+            self.assertEqual(list(Base.objects.values_list('nome', flat=True)), ['Base principal'])
+
+    def test_cache_separado_por_banco(self):
+        cache_resultados = CacheResultados(BackendMemoria(), ttl=60)
+
+        def executar():
+            return [linha[0] for linha in ConstrutorConsulta(self.consulta, cache_resultados).executar()]
+
+        self.assertEqual(executar(), ['Base principal'])
+
+        with self.configurar():
+            self.assertEqual(executar(), ['Base réplica'])
+
+            # no fallback, o resultado do banco principal já armazenado é reaproveitado
+            with self.configurar(ALIAS='inexistente'), self.assertLogs('relatorio_dinamico.roteamento', 'WARNING'):
+                with self.assertNumQueries(0):
+                    self.assertEqual(executar(), ['Base principal'])
+
+    def test_fallback_e_atraso_maximo(self):
+        with self.assertLogs('relatorio_dinamico.roteamento', 'WARNING'):
+            with self.configurar(ALIAS='inexistente'):
+                self.assertEqual(self.executar(), ['Base principal'])
+
+            with self.configurar(ATRASO_MAXIMO=60):
+                # sem sincronização registrada, o atraso é desconhecido
+                self.assertEqual(self.executar(), ['Base principal'])
+                registrar_sincronizacao('relatorios')
+                self.assertEqual(self.executar(), ['Base réplica'])
+                MarcoSincronizacao.objects.using('relatorios').update(sincronizado_em=timezone.now() - timedelta(minutes=5))
+                self.assertEqual(self.executar(), ['Base principal'])
+
+            with self.configurar(ATRASO_MAXIMO=60, FALLBACK=False):
+                with self.assertRaises(BancoIndisponivel):
+                    self.executar()
+
+    def test_banco_indisponivel_sem_fallback(self):
+        consulta = {"fonte_principal": "Base", "colunas": [{"campo": "nome"}]}
+        relatorio = Relatorio.objects.create(nome='Bases', html=criar_html_tabela(consulta))
+        tarefa = enfileirar_tarefa('http://testserver/', relatorio=relatorio)
+
+        with self.configurar(ALIAS='inexistente', FALLBACK=False):
+            respostas = [
+                self.client.post('/dados/', json.dumps({'configuracao': consulta}), content_type='application/json'),
+                self.client.post('/exportar/csv/', json.dumps(consulta), content_type='application/json'),
+                self.client.get(f'/gerar_pdf/{relatorio.id}'),
+            ]
+            self.assertEqual([resposta.status_code for resposta in respostas], [503] * 3)
+            self.assertIn('inexistente', respostas[0].json()['detail'])
+
+            # na fila de PDFs, a tarefa termina com erro, sem interromper o processamento
+            with self.assertLogs('relatorio_dinamico.tarefas', 'WARNING'):
+                processar_tarefas(num_processos=1, uma_vez=True)
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, TarefaPDF.ERRO)
+        self.assertIn('inexistente', tarefa.erro)
+
+    def test_relatorio_salvo_com_banco(self):
+        def salvar(banco):
+            dados = {'nome': 'Teste', 'html': '<p>Teste</p>', 'banco': banco}
+            return self.client.post('/salvar_relatorio/', json.dumps(dados), content_type='application/json')
+
+        self.assertEqual(salvar('inexistente').status_code, 400)
+        resposta = salvar('relatorios')
+        self.assertEqual(Relatorio.objects.get(id=resposta.json()['id']).banco, 'relatorios')
+
+
+class ProtecaoConsultasTestCase(TestCase):
+    def setUp(self):
+        usuario = User.objects.create(username='teste')
+        base = Base.objects.create(nome='Base 1', cidade='Natal', criado_por=usuario)
+
+        for i in range(30):
+            chamado = Chamado.objects.create(base=base, uf='RN', cidade='Natal')
+            AtendimentoPessoa.objects.create(chamado=chamado, risco='Azul')
+
+        self.validador = ValidadorConsulta(esquema_bd)
+        self.listagem = self.validador.validar({"fonte_principal": "Chamado", "colunas": [{"campo": "id"}, {"campo": "cidade"}]})
+        limpar_estimativas()
+        self.addCleanup(limpar_estimativas)
+
+    def configurar(self, **protecao):
+        return override_settings(RELATORIO_DINAMICO={**settings.RELATORIO_DINAMICO, 'PROTECAO_CONSULTAS': protecao})
+
+    def test_avaliacao_dos_caminhos(self):
+        consulta = self.validador.validar({
+            "fonte_principal": "Chamado",
+            "colunas": [
+                {"campo": "cidade"}, {"campo": "base__central__nome"},
+                {"campo": "atendimento_chamado__risco"}, {"campo": "unidade_chamado__unidade__nome"},
+            ],
+            "filtros": [{"campo": "base__nome", "operador": "exact", "valor": "Base 1"}],
+        })
+        avaliacao = avaliar_caminhos(consulta)
+
+        self.assertEqual(avaliacao.profundidade, 2)
+        # base, base__central, atendimento_chamado, unidade_chamado e unidade_chamado__unidade
+        self.assertEqual(avaliacao.juncoes, 5)
+        self.assertEqual(avaliacao.relacoes_para_muitos, 2)
+
+    def test_consultas_acima_dos_limites_sao_recusadas(self):
+        consulta = self.validador.validar({"fonte_principal": "Chamado", "colunas": [{"campo": "base__central__nome"}]})
+
+        with self.configurar(PROFUNDIDADE_MAXIMA=1):
+            with self.assertRaises(ConsultaRecusada):
+                ConstrutorConsulta(consulta).executar()
+            self.assertEqual(len(ConstrutorConsulta(self.listagem).executar()), 30)
+
+        # a listagem lê a tabela de chamados por completo: o custo estimado é a quantidade de chamados
+        with self.configurar(CUSTO_MAXIMO=10):
+            with self.assertRaises(ConsultaRecusada):
+                ConstrutorConsulta(self.listagem).executar()
+
+            resposta = self.client.post('/dados/', json.dumps({'configuracao': self.listagem}), content_type='application/json')
+            self.assertEqual(resposta.status_code, 422)
+
+    def test_erros_mapeados_nas_views(self):
+        consulta = {"fonte_principal": "Chamado", "colunas": [{"campo": "id"}]}
+        relatorio = Relatorio.objects.create(nome='Chamados', html=criar_html_tabela(consulta))
+        erros = [(ConsultaRecusada('custo'), 422), (ConsultasOcupadas('ocupado'), 503), (TempoConsultaExcedido('tempo'), 504)]
+
+        for erro, status in erros:
+            with self.subTest(erro=type(erro).__name__), patch.object(ConstrutorConsulta, 'executar', side_effect=erro), patch.object(ConstrutorConsulta, 'paginar', side_effect=erro):
+                respostas = [
+                    self.client.get(f'/gerar_pdf/{relatorio.id}'),
+                    self.client.post('/gerar_pdf/', json.dumps({'html': relatorio.html}), content_type='application/json'),
+                    self.client.post('/dados/', json.dumps({'configuracao': consulta}), content_type='application/json'),
+                ]
+                self.assertEqual([resposta.status_code for resposta in respostas], [status] * 3)
+                self.assertEqual(respostas[0].json()['detail'], str(erro))
+
+    def test_custo_estimado_pelo_plano(self):
+        # filtro sobre os atendimentos em subconsulta: a tabela de atendimentos é lida por completo uma vez
+        consulta = self.validador.validar({
+            "fonte_principal": "Chamado", "colunas": [{"campo": "id"}],
+            "filtros": [{"campo": "atendimento_chamado__risco", "operador": "exact", "valor": "Azul"}],
+        })
+        self.assertEqual(estimar_custo_plano(ConstrutorConsulta(consulta)._criar_queryset()), 30)
+        self.assertEqual(estimar_custo_plano(ConstrutorConsulta(self.listagem)._criar_queryset()), 30)
+
+    def test_fila_de_consultas_pesadas(self):
+        with self.configurar(CUSTO_FILA=0, CONSULTAS_PESADAS_SIMULTANEAS=1, ESPERA_MAXIMA=0.01):
+            with aguardar_vaga():
+                with self.assertRaises(ConsultasOcupadas):
+                    ConstrutorConsulta(self.listagem).executar()
+
+            # com a vaga liberada, a consulta é executada
+            self.assertEqual(len(ConstrutorConsulta(self.listagem).executar()), 30)
+
+    def test_tempo_limite_das_instrucoes(self):
+        sql = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1000000000) SELECT COUNT(*) FROM n"
+
+        with self.assertRaises(TempoConsultaExcedido):
+            with limitar_tempo('default', 0.05), connection.cursor() as cursor:
+                cursor.execute(sql)
+
+        # fora do bloco, as instruções não são mais interrompidas
+        with connection.cursor() as cursor:
+            cursor.execute("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 100000) SELECT COUNT(*) FROM n")
+            self.assertEqual(cursor.fetchone()[0], 100000)
+
+
+class ConexoesSQLiteTestCase(SimpleTestCase):
+    # as conexões são com um arquivo temporário, não com os bancos de teste
+    databases = {'default', 'leitura'}
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        caminho = Path(diretorio.name) / 'teste.sqlite3'
+        self.conexoes = ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(caminho)},
+            'leitura': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'file:{caminho}?mode=ro'},
+        })
+        self.addCleanup(self.conexoes.close_all)
+
+    def configurar(self, ativo):
+        sqlite = {**settings.RELATORIO_DINAMICO.get('SQLITE', {}), 'ATIVO': ativo}
+        return override_settings(RELATORIO_DINAMICO={**settings.RELATORIO_DINAMICO, 'SQLITE': sqlite})
+
+    def consultar(self, alias, sql):
+        with self.conexoes[alias].cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+
+    def test_pragmas_das_novas_conexoes(self):
+        with self.configurar(False):
+            self.assertEqual(obter_pragmas(self.conexoes['default']), {})
+
+        with self.configurar(True):
+            self.assertEqual(self.consultar('default', 'PRAGMA journal_mode'), 'wal')
+            self.assertEqual(self.consultar('default', 'PRAGMA busy_timeout'), 5000)
+            self.assertEqual(self.consultar('default', 'PRAGMA temp_store'), 2)
+            self.assertEqual(self.consultar('leitura', 'PRAGMA query_only'), 1)
+            self.assertNotIn('journal_mode', obter_pragmas(self.conexoes['leitura']))
+
+    def test_conexao_somente_leitura(self):
+        with self.configurar(True):
+            with self.conexoes['default'].cursor() as cursor:
+                cursor.execute('CREATE TABLE teste (valor INTEGER)')
+                cursor.execute('INSERT INTO teste VALUES (1)')
+
+            self.assertEqual(self.consultar('leitura', 'SELECT COUNT(*) FROM teste'), 1)
+
+            with self.assertRaises(OperationalError):
+                self.consultar('leitura', 'INSERT INTO teste VALUES (2)')
+
+
+class ViewsAssincronasTestCase(TestCase):
+    def configurar(self, execucoes_simultaneas):
+        obter_vagas.cache_clear()
+        self.addCleanup(obter_vagas.cache_clear)
+        return override_settings(RELATORIO_DINAMICO={**settings.RELATORIO_DINAMICO, 'ASSINCRONO': {'EXECUCOES_SIMULTANEAS': execucoes_simultaneas}})
+
+    async def test_vagas_e_cancelamento(self):
+        cancelada = threading.Event()
+        executadas = []
+
+        def aguardar_cancelamento():
+            while not cancelamento_solicitado():
+                time.sleep(0.01)
+            cancelada.set()
+
+        async def executar_na_requisicao(funcao):
+            # no servidor ASGI, cada requisição tem a sua thread
+            async with ThreadSensitiveContext():
+                return await executar_em_thread(funcao)
+
+        with self.configurar(1):
+            primeira = asyncio.create_task(executar_na_requisicao(aguardar_cancelamento))
+            segunda = asyncio.create_task(executar_na_requisicao(lambda: 'executada'))
+            desistente = asyncio.create_task(executar_na_requisicao(lambda: executadas.append('desistente')))
+            await asyncio.sleep(0.1)
+            # com uma vaga, as demais esperam pela primeira
+            self.assertFalse(segunda.done())
+
+            # a requisição cancelada enquanto espera desiste da vaga
+            desistente.cancel()
+            primeira.cancel()
+            for tarefa in (primeira, desistente):
+                with self.assertRaises(asyncio.CancelledError):
+                    await tarefa
+
+            # a etapa em andamento é avisada, e a vaga é liberada quando ela termina
+            self.assertEqual(await asyncio.wait_for(segunda, 5), 'executada')
+            self.assertTrue(cancelada.is_set())
+            await asyncio.sleep(0.2)
+            self.assertEqual(executadas, [])
+
+    def test_vagas_compartilhadas_entre_loops(self):
+        # no servidor WSGI, cada requisição assíncrona é executada em um loop próprio, em sua thread
+        liberar = threading.Event()
+        trava = threading.Lock()
+        em_execucao = []
+        maximo = []
+
+        def etapa():
+            with trava:
+                em_execucao.append(1)
+                maximo.append(len(em_execucao))
+            liberar.wait(1)
+            with trava:
+                em_execucao.pop()
+
+        with self.configurar(1):
+            threads = [threading.Thread(target=async_to_sync(executar_em_thread), args=(etapa,)) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.2)
+            liberar.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(len(maximo), 3)
+        self.assertEqual(max(maximo), 1)
+
+    async def test_views_assincronas(self):
+        consulta = {"fonte_principal": "Base", "colunas": [{"campo": "nome"}]}
+        resposta = await self.async_client.post('/obter_sql/', json.dumps(consulta), content_type='application/json')
+        self.assertIn('base_base', resposta.json()['sql'])
+
+    def test_instrucao_interrompida_pelo_cancelamento(self):
+        cancelamento = threading.Event()
+        cancelamento.set()
+        token = _cancelamento.set(cancelamento)
+        self.addCleanup(_cancelamento.reset, token)
+        sql = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1000000000) SELECT COUNT(*) FROM n"
+
+        with self.assertRaises(RequisicaoCancelada):
+            with limitar_tempo('default', 60), connection.cursor() as cursor:
+                cursor.execute(sql)
+
+        with self.assertRaises(RequisicaoCancelada):
+            ConstrutorConsulta(ValidadorConsulta(esquema_bd).validar({"fonte_principal": "Base", "colunas": [{"campo": "nome"}]})).executar()
+
+
+class EsquemaHTTPTestCase(TestCase):
+    def setUp(self):
+        self.esquema = obter_esquema_serializado(esquema_bd)
+
+    def test_esquema_comprimido_e_versionado(self):
+        resposta = self.client.get('/esquema', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(resposta['Content-Encoding'], 'gzip')
+        self.assertEqual(resposta['ETag'], f'"{self.esquema.versao}-gzip"')
+        self.assertEqual(resposta['Cache-Control'], 'no-cache')
+        self.assertEqual(json.loads(gzip.decompress(resposta.content)), esquema_bd)
+
+        resposta = self.client.get('/esquema')
+        self.assertFalse(resposta.has_header('Content-Encoding'))
+        self.assertEqual(resposta.json(), esquema_bd)
+
+        # na URL com a versão, o navegador pode manter a resposta sem revalidá-la
+        resposta = self.client.get(f'/esquema?v={self.esquema.versao}')
+        self.assertIn('immutable', resposta['Cache-Control'])
+        # a versão é informada à página do editor
+        self.assertContains(self.client.get('/novo/'), f'data-versao-esquema="{self.esquema.versao}"')
+
+    def test_revalidacao_com_etag(self):
+        for etag in [f'"{self.esquema.versao}"', f'W/"{self.esquema.versao}-gzip"']:
+            resposta = self.client.get('/esquema', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 304)
+            self.assertEqual(resposta.content, b'')
+
+        self.assertEqual(self.client.get('/esquema', HTTP_IF_NONE_MATCH='"versao-antiga"').status_code, 200)
+
+class GeradorEsquemaTestCase(SimpleTestCase):
+    def test_tipos_e_relacoes_vindos_dos_modelos(self):
+        esquema, divergencias = gerar_esquema(SOBREPOSICAO_ESQUEMA)
+        self.assertEqual(divergencias, [])
+        self.assertEqual(esquema, esquema_bd)
+
+        tipos = {campo['valor']: campo['tipo'] for campo in esquema['Chamado']['campos']}
+        self.assertEqual(tipos['id'], 'int')
+        self.assertEqual(tipos['numero_vitimas'], 'number')
+        self.assertEqual(tipos['incidente'], 'string')
+        self.assertEqual(tipos['criado_em'], 'datetime')
+        self.assertEqual(esquema['Usuário']['app_model'], 'auth.User')
+        self.assertIn({'nome_amigavel': 'Chamado', 'campo_relacao': 'chamado', 'model_destino': 'Chamado'}, esquema['Pessoa']['conexoes'])
+
+    def test_divergencias_ficam_fora_do_esquema(self):
+        sobreposicao = deepcopy(SOBREPOSICAO_ESQUEMA)
+        sobreposicao['Setor']['campos']['descricao'] = "Descrição"
+        sobreposicao['Pessoa']['conexoes']['chamado_set'] = "Chamado"
+        sobreposicao['Base']['campos']['central'] = "Base central"
+
+        divergencias = verificar_sobreposicao(sobreposicao)
+        self.assertEqual(len(divergencias), 3)
+        self.assertTrue(divergencias[0].startswith('Pessoa.chamado_set:'))
+
+        with self.assertLogs('relatorio_dinamico.gerador_esquema', 'WARNING'), override_settings(RELATORIO_DINAMICO={**settings.RELATORIO_DINAMICO, 'ESQUEMA': {'ARQUIVO_CACHE': None}}):
+            esquema = obter_esquema(sobreposicao)
+        self.assertEqual(esquema, esquema_bd)
+
+    def test_comando_verificar_esquema(self):
+        saida = StringIO()
+        call_command('verificar_esquema', stdout=saida)
+        self.assertIn('corresponde', saida.getvalue())
+
+        sobreposicao = deepcopy(SOBREPOSICAO_ESQUEMA)
+        sobreposicao['Chamado']['campos']['inexistente'] = "Inexistente"
+
+        with patch('relatorio_dinamico.management.commands.verificar_esquema.SOBREPOSICAO_ESQUEMA', sobreposicao):
+            with self.assertRaises(CommandError):
+                call_command('verificar_esquema', stdout=StringIO(), stderr=StringIO())
+
+    def test_esquema_armazenado_em_disco(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = Path(diretorio) / 'esquema.json'
+
+            with override_settings(RELATORIO_DINAMICO={**settings.RELATORIO_DINAMICO, 'ESQUEMA': {'ARQUIVO_CACHE': arquivo}}):
+                self.assertEqual(obter_esquema(SOBREPOSICAO_ESQUEMA), esquema_bd)
+                armazenado = json.loads(arquivo.read_text(encoding='utf-8'))
+
+                # com a mesma chave, o esquema é lido do arquivo, sem ser gerado
+                with patch('relatorio_dinamico.gerador_esquema.gerar_esquema') as gerar:
+                    self.assertEqual(obter_esquema(SOBREPOSICAO_ESQUEMA), esquema_bd)
+                gerar.assert_not_called()
+
+                # com outra sobreposição, o esquema é gerado novamente
+                sobreposicao = deepcopy(SOBREPOSICAO_ESQUEMA)
+                sobreposicao['Setor']['campos']['name'] = "Setor"
+                self.assertEqual(obter_esquema(sobreposicao)['Setor']['campos'][1]['rotulo'], "Setor")
+                self.assertNotEqual(json.loads(arquivo.read_text(encoding='utf-8'))['chave'], armazenado['chave'])
@@ -5,9 +5,17 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('novo/', views.novo, name='novo'),
     path('gerar_pdf/', views.gerar_pdf, name='gerar_pdf'),
+    path('gerar_pdf/<int:id>', views.gerar_pdf_relatorio, name='gerar_pdf_relatorio'),
+    path('tarefas_pdf/', views.criar_tarefa_pdf, name='criar_tarefa_pdf'),
+    path('tarefas_pdf/<uuid:id>', views.status_tarefa_pdf, name='status_tarefa_pdf'),
+    path('tarefas_pdf/<uuid:id>/pdf', views.baixar_tarefa_pdf, name='baixar_tarefa_pdf'),
     path('esquema', views.retornar_esquema),
     path('salvar_relatorio/', views.salvar_relatorio, name='salvar_relatorio'),
     path('obter_sql/', views.gerar_sql),
+    path('obter_plano/', views.obter_plano, name='obter_plano'),
+    path('dados/', views.obter_dados, name='obter_dados'),
+    path('exportar/<str:formato>/', views.exportar_dados, name='exportar_dados'),
+    path('metricas', views.metricas, name='metricas'),
     path('listar/', views.listar, name="listar_relatorio"),
     path('editar/<int:id>', views.editar, name="editar_relatorio"),
     path('excluir/<int:id>', views.excluir, name="excluir_relatorio"),
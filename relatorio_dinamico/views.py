@@ -1,44 +1,107 @@
+import csv
 import json
-from django.http import HttpResponse, JsonResponse
-from django.views.decorators.http import require_POST
-from django.shortcuts import render
-from .construtores import ConstrutorHTML, ConstrutorConsulta, ValidadorConsulta
-from .models import Relatorio
+import tempfile
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse, FileResponse
+from django.views.decorators.http import require_POST, require_GET
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags, quote_etag
+from django.shortcuts import render, get_object_or_404
+from .construtores import ConstrutorHTML, ConstrutorConsulta, ValidadorConsulta, TempoLimiteExcedido
+from .models import Relatorio, TarefaPDF
+from .tarefas import enfileirar_tarefa
+from .cache import obter_cache_resultados, obter_esquema_serializado, obter_plano_relatorio
+from .configuracoes import obter_configuracao
+from .pdf import gerar_chave_pdf, obter_pdf
+from .protecao import ConsultaRecusada, ConsultasOcupadas, TempoConsultaExcedido
+from .roteamento import BancoIndisponivel
+from .assincrono import executar_em_thread
+from .metricas import medir_view, obter_registro_metricas, CHAVE_EDITOR
 from django.utils.encoding import force_str
+from django.conf import settings
 from setup.esquema import esquema_bd
-from weasyprint import HTML
 from django.core.exceptions import FieldError, ValidationError
 import nh3
 
+# exceções da geração dos relatórios -> (mensagem, status HTTP) das respostas de erro
+ERROS_RELATORIO = {
+    FieldError: ('Erro na construção da consulta', 400),
+    ValidationError: ('Erro na construção da consulta', 400),
+    ValueError: ('Erro na construção da consulta', 400),
+    ConsultaRecusada: ('Consulta recusada', 422),
+    ConsultasOcupadas: ('Servidor ocupado', 503),
+    # o banco dos relatórios não pode ser usado e o fallback para o banco principal está desativado
+    BancoIndisponivel: ('Banco dos relatórios indisponível', 503),
+    TempoLimiteExcedido: ('Tempo limite excedido', 504),
+    TempoConsultaExcedido: ('Tempo limite excedido', 504),
+}
+EXCECOES_RELATORIO = tuple(ERROS_RELATORIO)
+
+def _responder_erro_relatorio(erro):
+    """Retorna a resposta JSON de uma das exceções de EXCECOES_RELATORIO"""
+    mensagem, status = next(ERROS_RELATORIO[classe] for classe in type(erro).__mro__ if classe in ERROS_RELATORIO)
+    return JsonResponse({'error': mensagem, 'detail': str(erro)}, status=status)
+
 def index(request):
     return render(request, 'links.html')
 
 def novo(request):
-    return render(request, 'index.html')
+    return render(request, 'index.html', {"versao_esquema": obter_esquema_serializado(esquema_bd).versao})
 
 def editar(request, id):
     relatorio = Relatorio.objects.get(id=id)
-    return render(request, "index.html", {"relatorio": relatorio})
+    return render(request, "index.html", {"relatorio": relatorio, "versao_esquema": obter_esquema_serializado(esquema_bd).versao})
 
 def listar(request):
     relatorios = Relatorio.objects.all()
     return render(request, 'listar.html', {'relatorios': relatorios})
 
-def retornar_esquema(request):
-    return JsonResponse(esquema_bd)
+async def retornar_esquema(request):
+    """
+    Retorna o esquema já serializado (e comprimido com gzip, se o navegador aceitar), com um ETag da sua versão.
+    Com ?v=<versão>, a resposta pode ser mantida pelo navegador indefinidamente, pois uma nova versão muda a URL.
+    """
+    esquema = obter_esquema_serializado(esquema_bd)
+    comprimido = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = esquema.etag(comprimido)
+
+    if request.GET.get('v') == esquema.versao:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'no-cache'
+
+    # If-None-Match usa a comparação fraca; as duas codificações têm o mesmo conteúdo, então qualquer um dos ETags 
+    # da versão atual dispensa o envio
+    etags_recebidos = {etag_recebido.removeprefix('W/') for etag_recebido in parse_etags(request.headers.get('If-None-Match', ''))}
+
+    if '*' in etags_recebidos or etags_recebidos & {esquema.etag(), esquema.etag(True)}:
+        response = HttpResponseNotModified()
+    elif comprimido:
+        response = HttpResponse(esquema.conteudo_gzip, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(esquema.conteudo, content_type='application/json')
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+def _gerar_sql(configuracao_consulta):
+    validador_consulta = ValidadorConsulta(esquema_bd)
+    config_consulta_valida = validador_consulta.validar(configuracao_consulta)
+    construtor_consulta = ConstrutorConsulta(config_consulta_valida)
+    return construtor_consulta.get_sql()
 
 @require_POST
-def gerar_sql(request):
+async def gerar_sql(request):
     try:
         configuracao_consulta = json.loads(request.body.decode('utf-8'))
     except Exception as e:
         return JsonResponse({'error': 'JSON inválido', 'detail': str(e)}, status=400)
     
     try:
-        validador_consulta = ValidadorConsulta(esquema_bd)
-        config_consulta_valida = validador_consulta.validar(configuracao_consulta)
-        construtor_consulta = ConstrutorConsulta(config_consulta_valida)
-        sql = construtor_consulta.get_sql()
+        sql = await executar_em_thread(_gerar_sql, configuracao_consulta)
         return JsonResponse({'sql': sql})
 
     except (FieldError, ValidationError, ValueError) as e:
@@ -46,31 +109,286 @@ def gerar_sql(request):
         raise e
 
 @require_POST
-def gerar_pdf(request):
+def obter_plano(request):
     try:
-        dados_recebidos = json.loads(request.body.decode('utf-8'))
+        configuracao_consulta = json.loads(request.body.decode('utf-8'))
     except Exception as e:
         return JsonResponse({'error': 'JSON inválido', 'detail': str(e)}, status=400)
+    
+    try:
+        validador_consulta = ValidadorConsulta(esquema_bd)
+        config_consulta_valida = validador_consulta.validar(configuracao_consulta)
+        construtor_consulta = ConstrutorConsulta(config_consulta_valida)
+        return JsonResponse(construtor_consulta.explicar())
+    except EXCECOES_RELATORIO as e:
+        return _responder_erro_relatorio(e)
 
-    html = dados_recebidos.get('html')
+class _Eco:
+    """Objeto com a interface de arquivo usada pelo csv.writer, que apenas retorna o que seria escrito"""
+    def write(self, valor):
+        return valor
+
+def _gerar_csv(cabecalhos, linhas, linhas_por_parte=500):
+    escritor = csv.writer(_Eco())
+    # o BOM permite que planilhas reconheçam o arquivo como UTF-8
+    parte = ['\ufeff', escritor.writerow(cabecalhos)]
+
+    for linha in linhas:
+        parte.append(escritor.writerow(linha))
+
+        if len(parte) >= linhas_por_parte:
+            yield ''.join(parte)
+            parte = []
+
+    yield ''.join(parte)
+
+def _gerar_xlsx(cabecalhos, linhas):
+    # no modo write_only, as linhas são gravadas em disco à medida que são adicionadas
+    from openpyxl import Workbook
+
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet('Dados')
+    aba.append(cabecalhos)
+
+    for linha in linhas:
+        aba.append(linha)
+    
+    arquivo = tempfile.TemporaryFile()
+    planilha.save(arquivo)
+    arquivo.seek(0)
+    return arquivo
+
+@require_POST
+def exportar_dados(request, formato):
+    if formato not in ('csv', 'xlsx'):
+        return JsonResponse({'error': 'Formato de exportação inválido', 'detail': formato}, status=400)
+
+    try:
+        configuracao_consulta = json.loads(request.body.decode('utf-8'))
+    except Exception as e:
+        return JsonResponse({'error': 'JSON inválido', 'detail': str(e)}, status=400)
     
     try:
         validador_consulta = ValidadorConsulta(esquema_bd)
-        construtor_consulta = ConstrutorConsulta()
-        construtor_html = ConstrutorHTML(html, "_pdf_dinamico.html", validador_consulta, construtor_consulta)
-        html_final = construtor_html.gerar_html()
-    except (FieldError, ValidationError) as e:
-        return JsonResponse({'error': 'Erro na construção da consulta', 'detail': str(e)}, status=400)
+        config_consulta_valida = validador_consulta.validar(configuracao_consulta)
+        configuracao_exportacao = obter_configuracao('EXPORTACAO')
+        construtor_consulta = ConstrutorConsulta(config_consulta_valida, formatar_no_banco=configuracao_exportacao['FORMATAR_NO_BANCO'])
+        cabecalhos = construtor_consulta.obter_cabecalhos()
+        # a consulta é montada aqui, antes do início da resposta; as linhas são lidas durante o envio
+        linhas = construtor_consulta.iterar(configuracao_exportacao['TAMANHO_BLOCO'])
+    except EXCECOES_RELATORIO as e:
+        return _responder_erro_relatorio(e)
+
+    if formato == 'xlsx':
+        try:
+            arquivo = _gerar_xlsx(cabecalhos, linhas)
+        except ImportError:
+            return JsonResponse({'error': 'Exportação em XLSX indisponível', 'detail': 'O pacote openpyxl não está instalado.'}, status=501)
+
+        return FileResponse(
+            arquivo, 
+            as_attachment=True, 
+            filename='dados.xlsx', 
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    response = StreamingHttpResponse(_gerar_csv(cabecalhos, linhas), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="dados.csv"'
+    return response
+
+@require_POST
+def obter_dados(request):
+    """
+    Retorna uma página dos dados de uma consulta em JSON, usando paginação por chave (keyset).
+    Corpo da requisição: {"configuracao": {...}, "cursor": "..." (opcional), "tamanho": 100 (opcional)}
+    """
+    try:
+        corpo = json.loads(request.body.decode('utf-8'))
+        configuracao_consulta = corpo['configuracao']
+        cursor = corpo.get('cursor')
+        tamanho = int(corpo.get('tamanho', 100))
+    except Exception as e:
+        return JsonResponse({'error': 'JSON inválido', 'detail': str(e)}, status=400)
+
+    if cursor is not None and not isinstance(cursor, str):
+        return JsonResponse({'error': 'Cursor de paginação inválido'}, status=400)
+
+    try:
+        validador_consulta = ValidadorConsulta(esquema_bd)
+        config_consulta_valida = validador_consulta.validar(configuracao_consulta)
+        construtor_consulta = ConstrutorConsulta(config_consulta_valida)
+        pagina = construtor_consulta.paginar(cursor, tamanho)
+    except EXCECOES_RELATORIO as e:
+        return _responder_erro_relatorio(e)
+
+    return JsonResponse(pagina)
+
+def _preparar_resposta_pdf(request, html_final):
+    """
+    Retorna a URL base, a chave do PDF, o ETag e, se o navegador já tiver o PDF, a resposta 304.
+    O ETag é o hash do HTML final; requisições GET com If-None-Match correspondente recebem 304 sem renderização.
+    """
+    base_url = request.build_absolute_uri('/')
+    chave = gerar_chave_pdf(html_final, base_url)
+    etag = quote_etag(chave)
+    resposta_condicional = get_conditional_response(request, etag=etag)
+
+    if resposta_condicional is not None and resposta_condicional.status_code == 304:
+        resposta_condicional['ETag'] = etag
+        return base_url, chave, etag, resposta_condicional
+
+    return base_url, chave, etag, None
+
+def _criar_resposta_pdf(pdf, disposicao, etag):
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = disposicao
+    response['ETag'] = etag
+    # os dados do relatório podem mudar, então o navegador deve sempre revalidar o PDF com o ETag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def _responder_pdf(request, html_final, disposicao):
+    """Retorna o PDF do HTML final, usando o cache de PDFs"""
+    base_url, chave, etag, nao_modificado = _preparar_resposta_pdf(request, html_final)
+
+    if nao_modificado is not None:
+        return nao_modificado
+
+    try:
+        pdf = obter_pdf(html_final, base_url, chave=chave)
+    except Exception as e:
+        return JsonResponse({'error': 'Erro ao gerar PDF', 'detail': str(e)}, status=500)
+
+    return _criar_resposta_pdf(pdf, disposicao, etag)
+
+async def _responder_pdf_assincrono(request, html_final, disposicao):
+    """Versão de _responder_pdf para as views assíncronas, com a renderização do PDF executada em uma thread"""
+    base_url, chave, etag, nao_modificado = _preparar_resposta_pdf(request, html_final)
+
+    if nao_modificado is not None:
+        return nao_modificado
+
+    try:
+        pdf = await executar_em_thread(obter_pdf, html_final, base_url, chave=chave)
+    except Exception as e:
+        return JsonResponse({'error': 'Erro ao gerar PDF', 'detail': str(e)}, status=500)
+
+    return _criar_resposta_pdf(pdf, disposicao, etag)
+
+def _gerar_html_editor(html):
+    validador_consulta = ValidadorConsulta(esquema_bd)
+    construtor_consulta = ConstrutorConsulta(cache_resultados=obter_cache_resultados())
+    construtor_html = ConstrutorHTML(html, "_pdf_dinamico.html", validador_consulta, construtor_consulta)
+    html_final = construtor_html.gerar_html()
 
     with open('templates/teste.html', 'w', encoding='utf-8') as arquivo:
         arquivo.write(html_final)
 
+    return html_final
+
+@require_POST
+@medir_view()
+async def gerar_pdf(request):
     try:
-        pdf = HTML(string=html_final, base_url=request.build_absolute_uri('/')).write_pdf()
+        dados_recebidos = json.loads(request.body.decode('utf-8'))
     except Exception as e:
-        return JsonResponse({'error': 'Erro ao gerar PDF', 'detail': str(e)}, status=500)
+        return JsonResponse({'error': 'JSON inválido', 'detail': str(e)}, status=400)
 
-    response = HttpResponse(pdf, content_type='application/pdf')
+    html = dados_recebidos.get('html')
+    
+    try:
+        # as consultas e a montagem do HTML são executadas em uma thread; a view espera sem bloquear o loop do servidor
+        html_final = await executar_em_thread(_gerar_html_editor, html)
+    except EXCECOES_RELATORIO as e:
+        return _responder_erro_relatorio(e)
+
+    return await _responder_pdf_assincrono(request, html_final, 'attachment; filename="relatorio.pdf"')
+
+def _gerar_html_relatorio(id):
+    relatorio = get_object_or_404(Relatorio, id=id)
+    plano = obter_plano_relatorio(relatorio, esquema_bd, "_pdf_dinamico.html")
+    construtor_consulta = ConstrutorConsulta(cache_resultados=obter_cache_resultados(), banco=relatorio.banco or None)
+    return ConstrutorHTML.a_partir_do_plano(plano, construtor_consulta).gerar_html()
+
+@medir_view(parametro_id='id')
+async def gerar_pdf_relatorio(request, id):
+    """Gera o PDF de um relatório salvo, reaproveitando o plano (HTML analisado e consultas validadas) em cache"""
+    try:
+        html_final = await executar_em_thread(_gerar_html_relatorio, id)
+    except EXCECOES_RELATORIO as e:
+        return _responder_erro_relatorio(e)
+
+    return await _responder_pdf_assincrono(request, html_final, 'inline; filename="relatorio.pdf"')
+
+@require_GET
+def metricas(request):
+    """Percentis e histogramas da duração de cada etapa da geração dos relatórios, medidos por este processo"""
+    resumo = obter_registro_metricas().resumo()
+    ids = [chave for chave in resumo if chave != CHAVE_EDITOR]
+    nomes = dict(Relatorio.objects.filter(id__in=ids).values_list('id', 'nome'))
+
+    relatorios = [
+        {
+            'id': None if chave == CHAVE_EDITOR else int(chave),
+            'nome': 'Editor' if chave == CHAVE_EDITOR else nomes.get(int(chave)),
+            'etapas': etapas,
+        }
+        for chave, etapas in resumo.items()
+    ]
+    # os relatórios mais lentos primeiro
+    relatorios.sort(key=lambda relatorio: relatorio['etapas']['total']['p90'], reverse=True)
+
+    return JsonResponse({'relatorios': relatorios})
+
+@require_POST
+def criar_tarefa_pdf(request):
+    """Enfileira a geração de um PDF; o JSON recebido contém o 'html' do editor ou o 'id' de um relatório salvo"""
+    try:
+        dados_recebidos = json.loads(request.body.decode('utf-8'))
+    except Exception as e:
+        return JsonResponse({'error': 'JSON inválido', 'detail': str(e)}, status=400)
+
+    id_relatorio = dados_recebidos.get('id')
+    html = dados_recebidos.get('html')
+    base_url = request.build_absolute_uri('/')
+
+    if id_relatorio:
+        relatorio = get_object_or_404(Relatorio, id=id_relatorio)
+        tarefa = enfileirar_tarefa(base_url, relatorio=relatorio)
+    elif html:
+        tarefa = enfileirar_tarefa(base_url, html=html)
+    else:
+        return JsonResponse({'error': 'Campos obrigatórios ausentes: html ou id'}, status=400)
+
+    return JsonResponse(_serializar_tarefa(tarefa), status=202)
+
+def _serializar_tarefa(tarefa):
+    dados = {
+        'id': str(tarefa.id),
+        'status': tarefa.status,
+        'url_status': reverse('status_tarefa_pdf', args=[tarefa.id]),
+    }
+
+    if tarefa.status == TarefaPDF.CONCLUIDA:
+        dados['url_pdf'] = reverse('baixar_tarefa_pdf', args=[tarefa.id])
+    elif tarefa.status == TarefaPDF.ERRO:
+        dados['erro'] = tarefa.erro
+
+    return dados
+
+@require_GET
+def status_tarefa_pdf(request, id):
+    tarefa = get_object_or_404(TarefaPDF.objects.defer('pdf', 'html'), id=id)
+    return JsonResponse(_serializar_tarefa(tarefa))
+
+@require_GET
+def baixar_tarefa_pdf(request, id):
+    tarefa = get_object_or_404(TarefaPDF, id=id)
+
+    if tarefa.status != TarefaPDF.CONCLUIDA:
+        return JsonResponse({'error': 'O PDF ainda não está disponível', **_serializar_tarefa(tarefa)}, status=409)
+
+    response = HttpResponse(bytes(tarefa.pdf), content_type='application/pdf')
     response['Content-Disposition'] = 'attachment; filename="relatorio.pdf"'
     return response
 
@@ -80,6 +398,7 @@ def salvar_relatorio(request):
     nome = data.get('nome')
     html = data.get('html')
     id =  data.get('id')
+    banco = data.get('banco') or ''
 
     if not nome or not html:
         return JsonResponse(
@@ -87,6 +406,9 @@ def salvar_relatorio(request):
             status=400
         )
 
+    if banco and banco not in settings.DATABASES:
+        return JsonResponse({'error': f'Banco de dados não encontrado: {banco}'}, status=400)
+
     tags = {"div", "h1", "h2", "img", "table", "thead", "tbody", "tr", "th", "td", "header", "main", "footer", "p"}
     atributos = {"class", "id", "style", "data-config-consulta", "data-x", "data-y", "data-tipo", "src"}
     tags_e_atributos = {}
@@ -101,16 +423,24 @@ def salvar_relatorio(request):
             modelo = Relatorio.objects.get(id=id)
             modelo.nome = nome
             modelo.html = html_limpo
+            modelo.banco = banco
             modelo.save()
         except Relatorio.DoesNotExist:
             return JsonResponse({'error': 'Relatório não encontrado'}, status=404)
     else:
-        modelo = Relatorio.objects.create(nome=nome, html=html_limpo)
+        modelo = Relatorio.objects.create(nome=nome, html=html_limpo, banco=banco)
+
+    try:
+        # compila o plano do relatório com antecedência, para que a primeira renderização não precise fazê-lo
+        obter_plano_relatorio(modelo, esquema_bd, "_pdf_dinamico.html")
+    except (FieldError, ValidationError, ValueError):
+        # consultas inválidas são informadas quando o relatório for gerado
+        pass
 
     return JsonResponse({'success': True, 'id': modelo.id})
 
 def excluir(request, id):
-    from django.shortcuts import get_object_or_404, redirect
+    from django.shortcuts import redirect
 
     relatorio = get_object_or_404(Relatorio, id=id)
     relatorio.delete()
@@ -129,7 +459,4 @@ def testar_html(request):
 def testar_pdf(request):
     from django.template.loader import render_to_string
     html = render_to_string('teste.html')
-    pdf = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf()
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = 'inline; filename="teste.pdf"'
-    return response
\ No newline at end of file
+    return _responder_pdf(request, html, 'inline; filename="teste.pdf"')
\ No newline at end of file
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:05
+
+import django.contrib.auth.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('base', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Setor',
+            fields=[
+                ('group_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='auth.group')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='base_setor', to='base.base', verbose_name='Base')),
+                ('criado_por', models.ForeignKey(blank=True, on_delete=django.db.models.deletion.CASCADE, related_name='setor_criador', to=settings.AUTH_USER_MODEL, verbose_name='Criado por')),
+                ('membro', models.ManyToManyField(blank=True, related_name='membro_setor', to=settings.AUTH_USER_MODEL, verbose_name='Membros')),
+            ],
+            options={
+                'permissions': (('detail_setor', 'Pode ver os detalhes do setor'),),
+            },
+            bases=('auth.group',),
+            managers=[
+                ('objects', django.contrib.auth.models.GroupManager()),
+            ],
+        ),
+    ]
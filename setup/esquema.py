@@ -4,216 +4,136 @@ Esquema do banco de dados para construção dinâmica de consultas e relatórios
 Cada modelo possui campos e conexões com outros modelos.
 Os campos incluem "rótulo" (nome que aparece para o usuário), "valor" (nome do campo no modelo) e "tipo" de dado (que não necessariamente é um tipo de dado do Python); o tipo de dado é utilizado para definir filtros e exibições apropriadas.
 As conexões representam as associações entre modelos, permitindo navegação e junção de dados relacionados. O "nome_amigavel" é usado na interface para representar a conexão, "campo_relacao" é o campo no modelo atual que referencia o modelo de destino, e "model_destino" é o modelo relacionado. O nome do "model_destino" deve corresponder a uma chave neste dicionário.
+
+O esquema_bd é gerado a partir dos modelos (relatorio_dinamico/gerador_esquema.py): SOBREPOSICAO_ESQUEMA define apenas
+os campos e as conexões permitidos, na ordem em que são exibidos, com seus rótulos (ou nomes amigáveis); os tipos dos
+campos e os modelos de destino das conexões vêm dos modelos. Após alterar os modelos ou esta sobreposição, execute
+"python manage.py verificar_esquema".
 """
+from relatorio_dinamico.gerador_esquema import obter_esquema
 
-esquema_bd = {
-  "Chamado": { 
+SOBREPOSICAO_ESQUEMA = {
+  "Chamado": {
     "app_model": "chamado.Chamado",
-    "campos": [
-      { "rotulo": "ID", "valor": "id", "tipo": "int"},
-      { "rotulo": "Motivo", "valor": "motivo", "tipo": "string" },
-      { "rotulo": "Status", "valor": "status", "tipo": "string" },
-      { "rotulo": "Número de vítimas", "valor": "numero_vitimas", "tipo": "number" },
-      { "rotulo": "É incidente?", "valor": "incidente", "tipo": "bool" },
-      { "rotulo": "Cidade (Ocorrência)", "valor": "cidade", "tipo": "string" },
-      { "rotulo": "Bairro (Ocorrência)", "valor": "bairro", "tipo": "string" }
-    ],
-    "conexoes": [
-      {
-        "nome_amigavel": "Pessoa",
-        "campo_relacao": "pessoa",
-        "model_destino": "Pessoa"
-      },
-      {
-        "nome_amigavel": "Base",
-        "campo_relacao": "base",
-        "model_destino": "Base"
-      },
-      {
-        "nome_amigavel": "Atendimentos",
-        "campo_relacao": "atendimento_chamado",
-        "model_destino": "AtendimentoPessoa"
-      },
-      {
-        "nome_amigavel": "UnidadeChamado",
-        "campo_relacao": "unidade_chamado",
-        "model_destino": "UnidadeChamado"
-      }
-    ]
+    "campos": {
+      "id": "ID",
+      "motivo": "Motivo",
+      "status": "Status",
+      "numero_vitimas": "Número de vítimas",
+      "incidente": "É incidente?",
+      "cidade": "Cidade (Ocorrência)",
+      "bairro": "Bairro (Ocorrência)",
+      "criado_em": "Data e hora do chamado",
+    },
+    "conexoes": {
+      "pessoa": "Pessoa",
+      "base": "Base",
+      "atendimento_chamado": "Atendimentos",
+      "unidade_chamado": "UnidadeChamado",
+    },
   },
   "Pessoa": {
     "app_model": "pessoa.Pessoa",
-    "campos": [
-      { "rotulo": "ID", "valor": "id", "tipo": "int"},
-      { "rotulo": "Nome completo", "valor": "nome", "tipo": "string" },
-      { "rotulo": "Data de nascimento", "valor": "dataNascimentoReal", "tipo": "date" },
-      { "rotulo": "Sexo", "valor": "sexo", "tipo": "string" },
-      { "rotulo": "Telefone celular", "valor": "telefoneCelular", "tipo": "string" }
-    ],
-    "conexoes": [
-      {
-        "nome_amigavel": "AtendimentoPessoa",
-        "campo_relacao": "pessoa_atendimento",
-        "model_destino": "AtendimentoPessoa"
-      },
-      {
-        "nome_amigavel": "Base",
-        "campo_relacao": "base_cadastro",
-        "model_destino": "Base"
-      },
-      {
-        "nome_amigavel": "Chamado",
-        "campo_relacao": "chamado_set",
-        "model_destino": "Chamado"
-      },
-      {
-        "nome_amigavel": "Usuário",
-        "campo_relacao": "usuario",
-        "model_destino": "Usuário"
-      }
-    ]
+    "campos": {
+      "id": "ID",
+      "nome": "Nome completo",
+      "dataNascimentoReal": "Data de nascimento",
+      "sexo": "Sexo",
+      "telefoneCelular": "Telefone celular",
+    },
+    "conexoes": {
+      "pessoa_atendimento": "AtendimentoPessoa",
+      "base_cadastro": "Base",
+      "chamado": "Chamado",
+      "usuario": "Usuário",
+    },
   },
   "AtendimentoPessoa": {
     "app_model": "chamado.AtendimentoPessoa",
-    "campos": [
-      { "rotulo": "ID", "valor": "id", "tipo": "int"},
-      { "rotulo": "Queixa principal", "valor": "queixa", "tipo": "string" },
-      { "rotulo": "Risco classificado", "valor": "risco", "tipo": "string" },
-      { "rotulo": "Pressão arterial (PA)", "valor": "pa", "tipo": "string" },
-      { "rotulo": "Pulso", "valor": "pulso", "tipo": "string" },
-      { "rotulo": "Saturação O2", "valor": "so2", "tipo": "string" },
-      { "rotulo": "Glicemia", "valor": "glicemia", "tipo": "string" },
-      { "rotulo": "Glasgow", "valor": "glasgow", "tipo": "string" },
-      { "rotulo": "Destino do paciente", "valor": "destinoPaciente", "tipo": "string" },
-      { "rotulo": "Diagnóstico médico", "valor": "diagnosticoMedico", "tipo": "string" },
-      { "rotulo": "Houve lesão traumática?", "valor": "lesaoTraumatica", "tipo": "bool" }
-    ],
-    "conexoes": [
-      {
-        "nome_amigavel": "Chamado",
-        "campo_relacao": "chamado",
-        "model_destino": "Chamado"
-      },
-      {
-        "nome_amigavel": "Pessoa",
-        "campo_relacao": "pessoa",
-        "model_destino": "Pessoa"
-      }
-    ]
+    "campos": {
+      "id": "ID",
+      "queixa": "Queixa principal",
+      "risco": "Risco classificado",
+      "pa": "Pressão arterial (PA)",
+      "pulso": "Pulso",
+      "so2": "Saturação O2",
+      "glicemia": "Glicemia",
+      "glasgow": "Glasgow",
+      "destinoPaciente": "Destino do paciente",
+      "diagnosticoMedico": "Diagnóstico médico",
+      "lesaoTraumatica": "Houve lesão traumática?",
+    },
+    "conexoes": {
+      "chamado": "Chamado",
+      "pessoa": "Pessoa",
+    },
   },
   "Base": {
     "app_model": "base.Base",
-    "campos": [
-      { "rotulo": "ID", "valor": "id", "tipo": "int"},
-      { "rotulo": "Nome da base", "valor": "nome", "tipo": "string" },
-      { "rotulo": "Cidade", "valor": "cidade", "tipo": "string" },
-      { "rotulo": "Estado (UF)", "valor": "uf", "tipo": "string" },
-      { "rotulo": "Bairro", "valor": "bairro", "tipo": "string" }
-    ],
-    "conexoes": [
-      {
-        "nome_amigavel": "Base central",
-        "campo_relacao": "central",
-        "model_destino": "Base"
-      },
-      {
-        "nome_amigavel": "Responsável",
-        "campo_relacao": "responsavel",
-        "model_destino": "Usuário"
-      },
-      {
-        "nome_amigavel": "Setor",
-        "campo_relacao": "base_setor",
-        "model_destino": "Setor"
-      },
-      {
-        "nome_amigavel": "Unidade",
-        "campo_relacao": "unidades_operacionais",
-        "model_destino": "Unidade"
-      }
-    ]
+    "campos": {
+      "id": "ID",
+      "nome": "Nome da base",
+      "cidade": "Cidade",
+      "uf": "Estado (UF)",
+      "bairro": "Bairro",
+    },
+    "conexoes": {
+      "central": "Base central",
+      "responsavel": "Responsável",
+      "base_setor": "Setor",
+      "unidades_operacionais": "Unidade",
+    },
   },
   "Setor": {
     "app_model": "setor.Setor",
-    "campos": [
-      { "rotulo": "ID", "valor": "id", "tipo": "int"},
-      { "rotulo": "Nome do setor", "valor": "name", "tipo": "string" },
-      { "rotulo": "Descrição", "valor": "descricao", "tipo": "string" }
-    ],
-    "conexoes": [
-      {
-        "nome_amigavel": "Base",
-        "campo_relacao": "base",
-        "model_destino": "Base"
-      },
-      {
-        "nome_amigavel": "Membro",
-        "campo_relacao": "membro",
-        "model_destino": "Usuário"
-      }
-    ]
+    "campos": {
+      "id": "ID",
+      "name": "Nome do setor",
+    },
+    "conexoes": {
+      "base": "Base",
+      "membro": "Membro",
+    },
   },
   "Unidade": {
     "app_model": "unidade.Unidade",
-    "campos": [
-      { "rotulo": "ID", "valor": "id", "tipo": "int"},
-      { "rotulo": "Nome da unidade", "valor": "nome", "tipo": "string" },
-      { "rotulo": "Tipo", "valor": "tipo", "tipo": "string" },
-      { "rotulo": "Placa", "valor": "placa", "tipo": "string" },
-      { "rotulo": "Modelo", "valor": "modelo", "tipo": "string" },
-      { "rotulo": "Status Atual", "valor": "status", "tipo": "string" }
-    ],
-    "conexoes": [
-      {
-        "nome_amigavel": "Base",
-        "campo_relacao": "base",
-        "model_destino": "Base"
-      },
-      {
-        "nome_amigavel": "UnidadeChamado",
-        "campo_relacao": "chamado_unidade",
-        "model_destino": "UnidadeChamado"
-      }
-    ]
+    "campos": {
+      "id": "ID",
+      "nome": "Nome da unidade",
+      "tipo": "Tipo",
+      "placa": "Placa",
+      "modelo": "Modelo",
+      "status": "Status Atual",
+    },
+    "conexoes": {
+      "base": "Base",
+      "chamado_unidade": "UnidadeChamado",
+    },
   },
   "UnidadeChamado": {
     "app_model": "chamado.UnidadeChamado",
-    "campos": [
-      { "rotulo": "ID", "valor": "id", "tipo": "int"},
-      { "rotulo": "Status no chamado", "valor": "status", "tipo": "string" },
-      { "rotulo": "Data de alocação", "valor": "alocado_em", "tipo": "datetime" }
-    ],
-    "conexoes": [
-      {
-        "nome_amigavel": "Chamado",
-        "campo_relacao": "chamado",
-        "model_destino": "Chamado"
-      },
-      {
-        "nome_amigavel": "Unidade",
-        "campo_relacao": "unidade",
-        "model_destino": "Unidade"
-      }
-    ]
+    "campos": {
+      "id": "ID",
+      "status": "Status no chamado",
+      "alocado_em": "Data de alocação",
+    },
+    "conexoes": {
+      "chamado": "Chamado",
+      "unidade": "Unidade",
+    },
   },
   "Usuário": {
-    "app_model": "django.contrib.auth.models.User",
-    "campos": [
-      { "rotulo": "Username", "valor": "username", "tipo": "string" },
-      { "rotulo": "E-mail", "valor": "email", "tipo": "email" },
-      { "rotulo": "Está ativo?", "valor": "is_active", "tipo": "bool" },
-    ],
-    "conexoes": [
-        {
-            "nome_amigavel": "Base",
-            "campo_relacao": "resposavel_base",
-            "model_destino": "Base"
-        },
-        {
-            "nome_amigavel": "Pessoa",
-            "campo_relacao": "pessoa",
-            "model_destino": "Pessoa"
-        }
-    ]
-  }
-}
\ No newline at end of file
+    "app_model": "auth.User",
+    "campos": {
+      "username": "Username",
+      "email": "E-mail",
+      "is_active": "Está ativo?",
+    },
+    "conexoes": {
+      "resposavel_base": "Base",
+      "pessoa": "Pessoa",
+    },
+  },
+}
+
+esquema_bd = obter_esquema(SOBREPOSICAO_ESQUEMA)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -79,13 +80,68 @@ WSGI_APPLICATION = 'setup.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# reaproveitamento das conexões entre as requisições e entre as consultas paralelas dos relatórios: cada conexão 
+# é mantida por até CONN_MAX_AGE segundos (DB_CONN_MAX_AGE; 0 fecha ao final de cada requisição) e verificada
+# antes de ser reutilizada
+CONEXOES_PERSISTENTES = {
+    'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+    'CONN_HEALTH_CHECKS': True,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        **CONEXOES_PERSISTENTES,
+    },
+    # conexão somente leitura ao banco principal, para as consultas dos relatórios (BANCO_RELATORIOS['ALIAS']);
+    # no modo WAL (RELATORIO_DINAMICO['SQLITE']), as leituras não bloqueiam as gravações nem são bloqueadas por elas
+    'leitura': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'TEST': {'MIRROR': 'default'},
+        **CONEXOES_PERSISTENTES,
+    },
+    # banco opcional das consultas dos relatórios (ver RELATORIO_DINAMICO['BANCO_RELATORIOS']); localmente,
+    # uma cópia do db.sqlite3 mantida pelo comando sincronizar_banco_relatorios
+    'relatorios': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('RELATORIOS_DB_NAME', BASE_DIR / 'relatorios.sqlite3'),
+        **CONEXOES_PERSISTENTES,
+    },
 }
 
+# implantação com PostgreSQL (requer psycopg[pool]): as conexões vêm do pool do psycopg, compartilhado pelas threads 
+# do processo; com o pool, CONN_MAX_AGE deve ser 0, pois cada conexão é devolvida ao pool em vez de fechada.
+# POSTGRES_POOL_MAX deve comportar as threads das requisições mais RELATORIO_DINAMICO['CONSULTAS_PARALELAS']['MAX_TRABALHADORES']
+if os.environ.get('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ['POSTGRES_DB'],
+        'USER': os.environ.get('POSTGRES_USER', ''),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('POSTGRES_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('POSTGRES_POOL_MAX', 20)),
+                'timeout': 10,
+            },
+        },
+    }
+    # as transações da conexão de leitura são somente leitura, como o mode=ro do SQLite
+    DATABASES['leitura'] = {
+        **DATABASES['default'],
+        'OPTIONS': {**DATABASES['default']['OPTIONS'], 'options': '-c default_transaction_read_only=on'},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# leituras das consultas dos relatórios no banco escolhido por relatorio_dinamico.roteamento
+DATABASE_ROUTERS = ['relatorio_dinamico.roteamento.RoteadorRelatorios']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,3 +189,19 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Relatórios dinâmicos (valores padrão em relatorio_dinamico/configuracoes.py)
+
+RELATORIO_DINAMICO = {
+    'CACHE_RESULTADOS': {
+        'BACKEND': 'memoria',
+        'TTL': 300,
+    },
+    'CONSULTAS_PARALELAS': {
+        'MAX_TRABALHADORES': 4,
+        'TEMPO_LIMITE': 60,
+    },
+    'SQLITE': {
+        'ATIVO': True,
+    },
+}
@@ -15,6 +15,8 @@ import { getElementoSelecionado, atualizarPainelPropriedades, tornarCabecalhosDa
  */
 
 const URL_ESQUEMA_DB = '/esquema';
+// chave do localStorage onde o esquema é mantido, junto com a sua versão
+const CHAVE_ESQUEMA_LOCAL = 'relatorio_dinamico:esquema';
 
 let ESQUEMA_DB = {};
 
@@ -28,14 +30,46 @@ const estadoGlobal = {
     limite: null
 };
 
-export async function iniciarAplicacao() {
+/**
+ * Retorna o esquema do BD. A versão atual vem na página (data-versao-esquema);
+ * se o localStorage tiver o esquema dessa versão, o servidor não é consultado.
+ * Caso contrário, o esquema é obtido da URL com a versão (que o navegador também mantém em cache) e armazenado.
+ */
+async function carregarEsquema() {
+    const versao = document.body.dataset.versaoEsquema;
+
     try {
-        const resposta = await fetch(URL_ESQUEMA_DB);
-        if (!resposta.ok) {
-            throw new Error('Falha na rede');
+        const armazenado = JSON.parse(localStorage.getItem(CHAVE_ESQUEMA_LOCAL));
+
+        if (versao && armazenado && armazenado.versao === versao) {
+            return armazenado.esquema;
+        }
+    } catch (erro) {
+        // localStorage indisponível ou com conteúdo inválido: o esquema é obtido do servidor
+    }
+
+    const url = versao ? `${URL_ESQUEMA_DB}?v=${encodeURIComponent(versao)}` : URL_ESQUEMA_DB;
+    const resposta = await fetch(url);
+    if (!resposta.ok) {
+        throw new Error('Falha na rede');
+    }
+
+    const esquema = await resposta.json();
+
+    if (versao) {
+        try {
+            localStorage.setItem(CHAVE_ESQUEMA_LOCAL, JSON.stringify({ versao, esquema }));
+        } catch (erro) {
+            // sem espaço no localStorage: o esquema continua no cache HTTP do navegador
         }
+    }
 
-        ESQUEMA_DB = await resposta.json();
+    return esquema;
+}
+
+export async function iniciarAplicacao() {
+    try {
+        ESQUEMA_DB = await carregarEsquema();
         const sel = document.getElementById('select-raiz');
         sel.innerHTML = '<option value="" selected disabled>Selecione...</option>';
         Object.keys(ESQUEMA_DB).forEach(key => {
@@ -7,6 +7,8 @@ import { fontes, tiposDeDadosEntrada, formatarSQL } from './uteis.js';
 const URL_SALVAR_RELATORIO = '/salvar_relatorio/';
 const URL_GERAR_PDF = '/gerar_pdf/';
 const URL_OBTER_SQL = '/obter_sql/';
+const URL_OBTER_DADOS = '/dados/';
+const URL_OBTER_PLANO = '/obter_plano/';
 
 inicializarOuvintesPropriedades();
 CC.iniciarAplicacao();
@@ -129,6 +131,13 @@ document.getElementById('input-limite-valor').addEventListener('input', (e) => {
 
 document.getElementById('btn-obter-sql').addEventListener('click', obterSQL);
 
+document.getElementById('btn-visualizar-dados').addEventListener('click', () => {
+    // carrega a primeira página sempre que a pré-visualização é aberta, pois a consulta pode ter mudado
+    if (!document.getElementById('collapseDados').classList.contains('show'))
+        obterDados();
+});
+document.getElementById('btn-carregar-mais-dados').addEventListener('click', () => obterDados(true));
+
 Array.from(document.getElementsByClassName("item-arrastavel")).forEach(e => {
     e.addEventListener("dragstart", iniciarArrasto);
 });
@@ -356,7 +365,119 @@ async function obterSQL(){
 
     const json = await res.json();
     const sql = json['sql'];
-    containerSQL.innerHTML = `<code>${formatarSQL(sql)}</code>`;
+    containerSQL.innerHTML = `<code>${formatarSQL(sql)}</code><div id="plano-execucao" class="mt-3"></div>`;
+    exibirPlanoExecucao(cargaUtil);
+}
+
+// mostra os alertas do plano de execução (leituras completas de tabelas sem índice) abaixo do código SQL
+async function exibirPlanoExecucao(cargaUtil){
+    const res = await fetch(URL_OBTER_PLANO, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken()
+        },
+        body: JSON.stringify(cargaUtil)
+    });
+    const containerPlano = document.querySelector("#plano-execucao");
+
+    if(!res.ok || !containerPlano) return;
+
+    const plano = await res.json();
+
+    if(plano.alertas.length === 0){
+        containerPlano.innerHTML = `<p class="small text-success mb-0">Nenhuma leitura completa de tabela em colunas filtradas ou de junção foi encontrada no plano de execução.</p>`;
+        return;
+    }
+
+    containerPlano.innerHTML = `
+        <p class="small text-warning font-weight-bold mb-1">Possíveis gargalos no plano de execução (${escaparHTML(plano.banco)}):</p>
+        <ul class="small mb-0">
+            ${plano.alertas.map(alerta => `
+                <li>
+                    ${escaparHTML(alerta.modelo || alerta.tabela)}.${escaparHTML(alerta.coluna)} (${escaparHTML(alerta.uso)}): ${escaparHTML(alerta.detalhe)}<br>
+                    <code>${escaparHTML(alerta.sugestao_sql)}</code>
+                </li>
+            `).join('')}
+        </ul>
+    `;
+}
+
+let cursorDados = null;
+
+function escaparHTML(valor) {
+    const div = document.createElement('div');
+    div.textContent = valor ?? '-';
+    return div.innerHTML;
+}
+
+// busca uma página dos dados da consulta; as páginas seguintes usam o cursor retornado pela anterior
+async function obterDados(continuar = false){
+    const containerDados = document.querySelector("#container-dados");
+    const btnCarregarMais = document.querySelector("#btn-carregar-mais-dados");
+    const cargaUtil = CC.gerarCargaUtil();
+
+    if(cargaUtil.colunas.length === 0){
+        containerDados.innerHTML = `<p class="px-3 py-4 mb-0 text-center text-danger">Nenhuma coluna foi especificada para a consulta.</p>`;
+        btnCarregarMais.classList.add('d-none');
+        return;
+    }
+
+    if(!continuar){
+        cursorDados = null;
+        containerDados.innerHTML = `
+            <div class="d-flex justify-content-center">
+                <div class="spinner-border" role="status">
+                    <span class="sr-only">Carregando...</span>
+                </div>
+            </div>
+        `;
+    }
+
+    btnCarregarMais.disabled = true;
+
+    const res = await fetch(URL_OBTER_DADOS, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken()
+        },
+        body: JSON.stringify({ configuracao: cargaUtil, cursor: cursorDados })
+    });
+
+    btnCarregarMais.disabled = false;
+
+    if(!res.ok){
+        const ct = res.headers.get('content-type') || '';
+        let msgErro = '';
+        let detalheErro = '';
+
+        if(ct.includes('application/json')){
+            const data = await res.json();
+            msgErro = data.error;
+            detalheErro = data.detail || '';
+        }
+        containerDados.innerHTML = `<p class="px-3 py-4 mb-0 text-center text-danger">Houve um erro ao obter os dados. ${escaparHTML(msgErro)}: ${escaparHTML(detalheErro)}</p>`;
+        btnCarregarMais.classList.add('d-none');
+        return;
+    }
+
+    const pagina = await res.json();
+    const linhas = pagina.linhas.map(linha => `<tr>${linha.map(valor => `<td>${escaparHTML(valor)}</td>`).join('')}</tr>`).join('');
+
+    if(continuar){
+        containerDados.querySelector('tbody').insertAdjacentHTML('beforeend', linhas);
+    } else {
+        containerDados.innerHTML = `
+            <table class="table table-sm table-bordered mb-0">
+                <thead><tr>${pagina.cabecalhos.map(c => `<th>${escaparHTML(c)}</th>`).join('')}</tr></thead>
+                <tbody>${linhas}</tbody>
+            </table>
+        `;
+    }
+
+    cursorDados = pagina.proximo_cursor;
+    btnCarregarMais.classList.toggle('d-none', !cursorDados);
 }
 
 // prepara os elementos já existentes no HTML para serem arrastáveis e manipuláveis
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:05
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('base', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Unidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, verbose_name='Nome da Unidade')),
+                ('tipo', models.CharField(blank=True, max_length=255, null=True, verbose_name='Tipo')),
+                ('fabricante', models.CharField(blank=True, max_length=255, null=True, verbose_name='Fabricante')),
+                ('modelo', models.CharField(blank=True, max_length=255, null=True, verbose_name='Modelo')),
+                ('cor', models.CharField(blank=True, max_length=255, null=True, verbose_name='Cor')),
+                ('chassi', models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='Chassi')),
+                ('renavam', models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='Renavam')),
+                ('placa', models.CharField(blank=True, help_text='Ex: XXX-9X99', max_length=255, null=True, unique=True, verbose_name='Placa')),
+                ('status', models.CharField(blank=True, default='DISPONIVEL', max_length=20, null=True, verbose_name='Status')),
+                ('lotacao', models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Lotação')),
+                ('ano', models.IntegerField(blank=True, null=True, verbose_name='Ano de fabricação')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='unidades_operacionais', to='base.base', verbose_name='Base Operacional')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unidades_criadas', to=settings.AUTH_USER_MODEL, verbose_name='Criado por')),
+            ],
+            options={
+                'permissions': (('detail_unidade', 'Pode ver os detalhes da unidade'),),
+            },
+        ),
+    ]